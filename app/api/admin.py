@@ -0,0 +1,170 @@
+from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import List, Dict, Any, Optional
+
+from app.models.admin import (
+    CacheWarmupRequest, CacheWarmupResponse, CacheInvalidationResponse, SemanticCacheReview
+)
+from app.services.cache_service import explanation_cache, normalize_concept
+from app.services.coalescing import llm_coalescer, index_load_coalescer
+from app.services.history_service import chat_history_manager
+from app.services.http_pool import llm_http_pool
+from app.services.session_service import session_store
+from app.services.llm_metrics import llm_metrics
+from app.services.llm_policy import llm_call_policy
+from app.services.llm_scheduler import llm_scheduler
+from app.services.model_router import model_router
+from app.services.question_bank import question_bank
+from app.services.quiz_pipeline import quiz_pipeline
+from app.services.quiz_cache import quiz_cache
+from app.services.bulk_grading import bulk_grader
+from app.services.quiz_analytics import quiz_analytics
+from app.services.result_store import result_store
+from app.services.semantic_cache import qa_semantic_cache, explanation_semantic_cache
+from app.services.llm_service import llm_service
+from app.services.worker_lifecycle import worker_lifecycle
+from app.services.compression import response_compressor
+
+router = APIRouter()
+
+SEMANTIC_CACHES = {
+    "qa": qa_semantic_cache,
+    "explanation": explanation_semantic_cache
+}
+
+def _get_semantic_cache(namespace: str):
+    """Resolve a semantic cache by name or raise a 404."""
+    cache = SEMANTIC_CACHES.get(namespace)
+    if cache is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown semantic cache '{namespace}'. Available: {', '.join(SEMANTIC_CACHES)}"
+        )
+    return cache
+
+@router.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics():
+    """
+    Get per-call LLM usage, model routing, upstream connection pool, quiz pipeline, question bank, result store, quiz cache, bulk grading, quiz analytics, cache, coalescing, scheduling, retry, chat history, response compression and worker process metrics.
+    """
+    return {
+        "llm_calls": llm_metrics.stats(),
+        "routing": model_router.stats(),
+        "http_pool": llm_http_pool.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "call_policy": llm_call_policy.stats(),
+        "chat_history": chat_history_manager.stats(),
+        "chat_sessions": session_store.stats(),
+        "quiz_pipeline": quiz_pipeline.stats(),
+        "question_bank": question_bank.stats(),
+        "quiz_results": result_store.stats(),
+        "quiz_cache": quiz_cache.stats(),
+        "bulk_grading": bulk_grader.stats(),
+        "quiz_analytics": quiz_analytics.stats(),
+        "compression": response_compressor.stats(),
+        "worker": worker_lifecycle.stats(),
+        "explanation_cache": explanation_cache.stats(),
+        "semantic_cache": {
+            namespace: cache.stats() for namespace, cache in SEMANTIC_CACHES.items()
+        },
+        "coalescing": {
+            "llm": llm_coalescer.stats(),
+            "index_load": index_load_coalescer.stats()
+        }
+    }
+
+@router.get("/metrics/llm", response_model=Dict[str, Any])
+async def get_llm_call_metrics():
+    """
+    Get latency, token and cost metrics for upstream LLM calls, by feature and model.
+    """
+    return llm_metrics.stats()
+
+@router.get("/metrics/routing", response_model=Dict[str, Any])
+async def get_routing_metrics():
+    """
+    Get the model routing rules and per-route call, fallback and latency metrics.
+    """
+    return model_router.stats()
+
+@router.get("/cache/explanations", response_model=Dict[str, Any])
+async def get_explanation_cache_stats():
+    """
+    Get size and hit-rate statistics for the explanation cache.
+    """
+    return explanation_cache.stats()
+
+@router.delete("/cache/explanations", response_model=CacheInvalidationResponse)
+async def invalidate_explanation_cache(concept: Optional[str] = None):
+    """
+    Invalidate cached explanations.
+    
+    - **concept**: Optional concept to invalidate; clears the whole cache if omitted
+    """
+    try:
+        invalidated = explanation_cache.invalidate(concept)
+        if concept:
+            explanation_semantic_cache.remove(concept)
+        else:
+            explanation_semantic_cache.clear()
+        
+        return {"invalidated": invalidated, "concept": concept}
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to invalidate explanation cache: {str(e)}"
+        )
+
+@router.post("/cache/explanations/warmup", response_model=CacheWarmupResponse, status_code=202)
+async def warm_explanation_cache(warmup_request: CacheWarmupRequest, background_tasks: BackgroundTasks):
+    """
+    Pre-generate explanations for a list of concepts in the background.
+    
+    - **concepts**: The legal concepts to warm; concepts already cached are skipped
+    """
+    concepts = []
+    seen = set()
+    for concept in warmup_request.concepts:
+        # Deduplicate on the cache key, so variants of one concept are warmed once
+        key = normalize_concept(concept)
+        if key and key not in seen:
+            seen.add(key)
+            concepts.append(concept)
+    
+    missing = [concept for concept in concepts if not llm_service.is_explanation_cached(concept)]
+    
+    if missing:
+        background_tasks.add_task(llm_service.warm_explanation_cache, missing)
+    
+    return {
+        "queued": len(missing),
+        "already_cached": len(concepts) - len(missing)
+    }
+
+
+@router.get("/cache/semantic/{namespace}/samples", response_model=List[Dict[str, Any]])
+async def get_semantic_cache_samples(namespace: str):
+    """
+    Get sampled semantic cache hits for false-hit review.
+    
+    - **namespace**: The semantic cache (qa or explanation)
+    """
+    return _get_semantic_cache(namespace).samples()
+
+@router.post("/cache/semantic/{namespace}/samples/{sample_id}", response_model=Dict[str, str])
+async def review_semantic_cache_sample(namespace: str, sample_id: str, review: SemanticCacheReview):
+    """
+    Label a sampled semantic cache hit as a true or false hit.
+    
+    - **namespace**: The semantic cache (qa or explanation)
+    - **sample_id**: The sample to label
+    - **false_hit**: Whether the cached answer did not fit the question
+    """
+    cache = _get_semantic_cache(namespace)
+    if not cache.review_sample(sample_id, review.false_hit):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sample with ID {sample_id} not found"
+        )
+    
+    return {"status": "success"}
@@ -1,23 +1,32 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks, Query, Header
 from fastapi.responses import JSONResponse
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 import uuid
 import os
 
 from app.models.document import DocumentResponse, DocumentList
 from app.services.document_service import document_service
 from app.services.index_service import index_service
+from app.services.question_bank import question_bank
+from app.services.document_catalog import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.pagination import InvalidCursorError, InvalidListQueryError
+from app.services.conditional import strong_etag, matching_etag, not_modified, validator_headers
 
 router = APIRouter()
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     description: Optional[str] = Form(None)
 ):
     """
     Upload a document file (PDF, DOCX, TXT) for processing.
     
+    The document's question bank is filled in the background once the
+    upload has been processed.
+    
     - **file**: The document file to upload
     - **description**: Optional description of the document
     """
@@ -48,6 +57,10 @@ async def upload_document(
         # Create document index
         await index_service.create_document_index(document_id, text_content)
         
+        # Pre-generate quiz questions so quizzes can be served without waiting for the LLM
+        if question_bank.enabled:
+            background_tasks.add_task(question_bank.fill, document_id)
+        
         return {
             "document_id": document_id,
             "filename": filename,
@@ -62,17 +75,41 @@ async def upload_document(
             detail=f"Failed to process document: {str(e)}"
         )
 
-@router.get("/list", response_model=DocumentList)
-async def list_documents():
+@router.get("/list", response_model=DocumentList, response_model_exclude_unset=True)
+async def list_documents(limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), 
+                         cursor: Optional[str] = None, 
+                         extracted_from: Optional[datetime] = None, 
+                         extracted_to: Optional[datetime] = None, 
+                         sort: str = Query(default="extraction_date", pattern="^(extraction_date|content_length)$"), 
+                         order: str = Query(default="desc", pattern="^(asc|desc)$"), 
+                         fields: Optional[str] = None):
     """
-    Get a list of all uploaded and processed documents.
+    Get a page of uploaded and processed documents, newest first by default.
+    
+    - **limit**: Maximum number of documents to return (default: 50)
+    - **cursor**: The `next_cursor` of the previous page
+    - **extracted_from**: Only documents processed at or after this date or time
+    - **extracted_to**: Only documents processed before this date or time
+    - **sort**: Sort key, `extraction_date` or `content_length` (default: extraction_date)
+    - **order**: Sort order, `asc` or `desc` (default: desc)
+    - **fields**: Comma-separated fields to return, e.g. `file_id,extraction_date` (default: all)
     """
     try:
-        # Get all documents
-        documents = await document_service.get_all_documents()
-        
-        return {"documents": documents}
+        return await document_service.list_documents(
+            limit,
+            cursor,
+            extracted_from.isoformat() if extracted_from else None,
+            extracted_to.isoformat() if extracted_to else None,
+            sort,
+            order,
+            fields
+        )
     
+    except (InvalidCursorError, InvalidListQueryError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -80,14 +117,25 @@ async def list_documents():
         )
 
 @router.get("/{document_id}", response_model=Dict[str, Any])
-async def get_document(document_id: str, include_content: bool = False):
+async def get_document(document_id: str, 
+                       include_content: bool = False, 
+                       if_none_match: Optional[str] = Header(default=None)):
     """
     Get details of a specific document by ID.
     
+    Responses carry an `ETag`; send it back in `If-None-Match` to get a
+    `304 Not Modified` instead of the document again.
+    
     - **document_id**: The unique identifier of the document
     - **include_content**: Whether to include the full document content in the response
     """
     try:
+        # Answer conditional requests from the catalog, without reading the document
+        etag = document_service.get_document_etag(document_id, include_content)
+        matched = matching_etag(if_none_match, etag) if etag else None
+        if matched:
+            return not_modified(matched)
+        
         # Get document content
         content = await document_service.get_document_content(document_id)
         
@@ -105,7 +153,14 @@ async def get_document(document_id: str, include_content: bool = False):
         if include_content:
             response["content"] = content
         
-        return response
+        if etag is None:
+            # Documents missing from the catalog are tagged by their content
+            etag = strong_etag(document_id, content, include_content)
+            matched = matching_etag(if_none_match, etag)
+            if matched:
+                return not_modified(matched)
+        
+        return JSONResponse(content=response, headers=validator_headers(etag))
     
     except HTTPException:
         raise
@@ -144,6 +199,9 @@ async def delete_document(document_id: str):
         # Also delete any index for this document
         await index_service.delete_document_index(document_id)
         
+        # And its question bank
+        question_bank.delete(document_id)
+        
         return {
             "status": "success",
             "message": f"Document with ID {document_id} has been deleted"
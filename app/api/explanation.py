@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Body
 from typing import Dict, Any
 
-from app.models.explanation import ExplanationRequest, ExplanationResponse
+from app.api.sse import sse_response
+from app.models.explanation import ExplanationRequest, ExplanationResponse, BatchExplanationRequest
 from app.services.llm_service import llm_service
 
 router = APIRouter()
@@ -28,4 +29,53 @@ async def explain_legal_concept(explanation_request: ExplanationRequest):
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate explanation: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/concept/stream")
+async def explain_legal_concept_stream(explanation_request: ExplanationRequest):
+    """
+    Get an explanation for a legal concept as server-sent events.
+    
+    Emits one `token` event per chunk of generated text and a final `done`
+    event carrying the full explanation. Failures after the stream has
+    started are sent as an `error` event instead of `done`.
+    
+    - **concept**: The legal concept to explain
+    """
+    async def events():
+        explanation = ""
+        async for chunk in llm_service.stream_legal_explanation(explanation_request.concept):
+            explanation += chunk
+            yield "token", {"text": chunk}
+        
+        yield "done", {"concept": explanation_request.concept, "explanation": explanation}
+    
+    return sse_response(events())
+
+@router.post("/batch")
+async def explain_legal_concepts_batch(batch_request: BatchExplanationRequest):
+    """
+    Explain a list of legal concepts, streaming each result as server-sent events.
+    
+    Cached explanations are sent first; the rest are generated concurrently and
+    sent as they complete, so results are not in request order. Each concept
+    produces one `result` event carrying either `explanation` or `error`, and a
+    final `done` event summarises the batch.
+    
+    - **concepts**: The legal concepts to explain (up to 100)
+    """
+    async def events():
+        summary = {"total": 0, "succeeded": 0, "failed": 0, "cached": 0}
+        async for result in llm_service.explain_legal_concepts(batch_request.concepts):
+            summary["total"] += 1
+            if "error" in result:
+                summary["failed"] += 1
+            else:
+                summary["succeeded"] += 1
+                if result["cached"]:
+                    summary["cached"] += 1
+            yield "result", result
+        
+        yield "done", summary
+    
+    return sse_response(events())
@@ -1,12 +1,46 @@
 from fastapi import APIRouter, HTTPException, Query, Body
 from typing import List, Dict, Any, Optional
 
-from app.models.qa import QuestionRequest, QuestionResponse
+from app.api.sse import sse_response
+from app.models.qa import QuestionRequest, QuestionResponse, ChatSession
 from app.services.index_service import index_service
-from app.services.llm_service import llm_service
+from app.services.llm_service import llm_service, LLMUnavailableError
+from app.services.session_service import session_store
 
 router = APIRouter()
 
+def _history_as_dicts(question_request: QuestionRequest) -> Optional[List[Dict[str, str]]]:
+    """
+    Resolve the chat history for a request as the plain dicts the LLM service expects.
+    
+    A session_id takes precedence over an inline chat_history.
+    """
+    if question_request.session_id:
+        messages = session_store.messages(question_request.session_id)
+        if messages is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Chat session {question_request.session_id} not found or expired"
+            )
+        return messages or None
+    
+    if not question_request.chat_history:
+        return None
+    return [message.model_dump() for message in question_request.chat_history]
+
+def _record_turn(question_request: QuestionRequest, answer: str):
+    """
+    Append the question and its answer to the request's chat session, if any.
+    
+    Only called once an answer has been generated; failed generations raise
+    or end the stream first, so they never become assistant turns.
+    """
+    if question_request.session_id:
+        session_store.append(question_request.session_id, [
+            {"role": "user", "content": question_request.question},
+            {"role": "assistant", "content": answer}
+        ])
+
 @router.post("/ask", response_model=QuestionResponse)
 async def ask_question(question_request: QuestionRequest):
     """
@@ -15,8 +49,11 @@ async def ask_question(question_request: QuestionRequest):
     - **question**: The question to ask
     - **document_id**: Optional document ID to query against
     - **chat_history**: Optional chat history for context
+    - **session_id**: Optional chat session; replaces chat_history and records this turn
     """
     try:
+        chat_history = _history_as_dicts(question_request)
+        
         # Check if document_id is provided
         if question_request.document_id:
             # Query against the document
@@ -31,6 +68,8 @@ async def ask_question(question_request: QuestionRequest):
                     detail=result["error"]
                 )
             
+            _record_turn(question_request, result["answer"])
+            
             return {
                 "answer": result["answer"],
                 "sources": result.get("sources", []),
@@ -40,9 +79,11 @@ async def ask_question(question_request: QuestionRequest):
             # General legal question - use LLM service directly
             answer = await llm_service.answer_legal_question(
                 question_request.question,
-                question_request.chat_history
+                chat_history
             )
             
+            _record_turn(question_request, answer)
+            
             return {
                 "answer": answer,
                 "sources": [],
@@ -51,6 +92,11 @@ async def ask_question(question_request: QuestionRequest):
     
     except HTTPException:
         raise
+    except LLMUnavailableError:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM service is unavailable. Please check your configuration and API keys."
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -66,6 +112,7 @@ async def chat_interaction(
     
     - **question**: The current question or message
     - **chat_history**: List of previous messages in the conversation
+    - **session_id**: Optional chat session created with POST /sessions; send it instead of chat_history
     - **document_id**: Optional document ID to ground responses in
     """
     try:
@@ -78,4 +125,126 @@ async def chat_interaction(
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process chat: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+async def _stream_answer(question_request: QuestionRequest, chat_history: Optional[List[Dict[str, str]]]):
+    """Produce (event, data) pairs for a streamed answer."""
+    answer = ""
+    
+    if question_request.document_id:
+        # Document QA: sources arrive first, then the answer tokens
+        async for event in index_service.stream_query_document(
+            question_request.document_id,
+            question_request.question
+        ):
+            if event["type"] == "sources":
+                yield "sources", {"sources": event["sources"]}
+            elif event["type"] == "token":
+                answer += event["text"]
+                yield "token", {"text": event["text"]}
+            else:
+                yield "error", {"error": event["error"]}
+                return
+    else:
+        async for chunk in llm_service.stream_legal_question(
+            question_request.question,
+            chat_history
+        ):
+            answer += chunk
+            yield "token", {"text": chunk}
+    
+    _record_turn(question_request, answer)
+    yield "done", {"answer": answer, "document_id": question_request.document_id}
+
+@router.post("/ask/stream")
+async def ask_question_stream(question_request: QuestionRequest):
+    """
+    Ask a question and receive the answer as server-sent events.
+    
+    Emits a `sources` event first for document questions, then one `token`
+    event per chunk of generated text, and finally a `done` event carrying the
+    full answer. Failures after the stream has started are sent as an `error` event.
+    
+    - **question**: The question to ask
+    - **document_id**: Optional document ID to query against
+    - **chat_history**: Optional chat history for context
+    - **session_id**: Optional chat session; replaces chat_history and records this turn
+    """
+    # Resolve the session before the stream starts so an unknown one is a 404
+    chat_history = _history_as_dicts(question_request)
+    
+    if question_request.document_id:
+        # Fail fast with a proper status code before the stream starts
+        index = await index_service.load_index(question_request.document_id)
+        if not index:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No index found for document {question_request.document_id}"
+            )
+    
+    return sse_response(_stream_answer(question_request, chat_history))
+
+@router.post("/chat/stream")
+async def chat_interaction_stream(question_request: QuestionRequest):
+    """
+    Streaming variant of /chat; see /ask/stream for the event format.
+    
+    - **question**: The current question or message
+    - **chat_history**: List of previous messages in the conversation
+    - **session_id**: Optional chat session created with POST /sessions; send it instead of chat_history
+    - **document_id**: Optional document ID to ground responses in
+    """
+    return await ask_question_stream(question_request)
+
+@router.post("/sessions", response_model=ChatSession)
+async def create_chat_session():
+    """
+    Start a server-side chat session.
+    
+    Pass the returned session_id to /chat or /chat/stream and send only the new
+    question; the conversation is kept on the server. Sessions expire after a
+    period of inactivity.
+    """
+    try:
+        return session_store.create()
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create chat session: {str(e)}"
+        )
+
+@router.get("/sessions/{session_id}", response_model=ChatSession)
+async def get_chat_session(session_id: str):
+    """
+    Get a chat session and its messages.
+    
+    - **session_id**: The session ID
+    """
+    session = session_store.get(session_id)
+    
+    if not session:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Chat session {session_id} not found or expired"
+        )
+    
+    return session
+
+@router.delete("/sessions/{session_id}", response_model=Dict[str, str])
+async def delete_chat_session(session_id: str):
+    """
+    Delete a chat session.
+    
+    - **session_id**: The session ID
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Chat session {session_id} not found"
+        )
+    
+    return {
+        "status": "success",
+        "message": f"Chat session {session_id} has been deleted"
+    }
@@ -1,20 +1,30 @@
-from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi import APIRouter, HTTPException, Body, Query, Header
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 
-from app.models.quiz import QuizRequest, QuizResponse, QuizList, QuizSubmission, QuizResult
+from app.api.sse import sse_response
+from app.models.quiz import QuizRequest, QuizResponse, QuizList, QuizSubmission, QuizResult, BulkSubmission, BulkGradingResult
 from app.services.quiz_service import quiz_service
 from app.services.document_service import document_service
+from app.services.question_bank import question_bank
+from app.services.bulk_grading import bulk_grader
+from app.services.quiz_catalog import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.result_store import result_store, EXPORT_FORMATS, MAX_PAGE_SIZE as MAX_RESULTS_PAGE_SIZE
+from app.services.conditional import matching_etag, not_modified, validator_headers
+from app.services.pagination import InvalidCursorError, InvalidListQueryError
 
 router = APIRouter()
 
 @router.post("/generate", response_model=QuizResponse)
-async def generate_quiz(quiz_request: QuizRequest):
+async def generate_quiz(quiz_request: QuizRequest, stream: bool = False):
     """
     Generate a quiz based on a document.
     
     - **document_id**: The unique identifier of the document
     - **num_questions**: Number of questions to generate (default: 5)
     - **difficulty**: Difficulty level (easy, medium, hard) (default: medium)
+    - **stream**: Send each question as a server-sent event as soon as it is generated
     """
     try:
         # Check if document exists
@@ -25,6 +35,9 @@ async def generate_quiz(quiz_request: QuizRequest):
                 detail=f"Document with ID {quiz_request.document_id} not found"
             )
         
+        if stream:
+            return sse_response(_stream_quiz(quiz_request))
+        
         # Generate quiz
         quiz = await quiz_service.generate_quiz(
             quiz_request.document_id,
@@ -48,40 +61,167 @@ async def generate_quiz(quiz_request: QuizRequest):
             detail=f"Failed to generate quiz: {str(e)}"
         )
 
-@router.get("/list", response_model=QuizList)
-async def list_quizzes(document_id: Optional[str] = None):
+async def _stream_quiz(quiz_request: QuizRequest):
+    """Produce (event, data) pairs for a streamed quiz generation."""
+    async for event in quiz_service.stream_quiz(
+        quiz_request.document_id,
+        quiz_request.num_questions,
+        quiz_request.difficulty
+    ):
+        if event["type"] == "question":
+            yield "question", {"index": event["index"], "question": event["question"]}
+        elif event["type"] == "quiz":
+            yield "done", event["quiz"]
+        else:
+            yield "error", {"error": event["error"]}
+
+@router.get("/list", response_model=QuizList, response_model_exclude_unset=True)
+async def list_quizzes(document_id: Optional[str] = None, 
+                       limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), 
+                       cursor: Optional[str] = None, 
+                       difficulty: Optional[str] = Query(default=None, pattern="^(easy|medium|hard)$"), 
+                       generated_from: Optional[datetime] = None, 
+                       generated_to: Optional[datetime] = None, 
+                       sort: str = Query(default="generated_at", pattern="^(generated_at|num_questions)$"), 
+                       order: str = Query(default="desc", pattern="^(asc|desc)$"), 
+                       fields: Optional[str] = None):
     """
-    Get a list of all generated quizzes, optionally filtered by document ID.
+    Get a page of generated quizzes, newest first by default.
     
     - **document_id**: Optional document ID to filter quizzes
+    - **limit**: Maximum number of quizzes to return (default: 50)
+    - **cursor**: The `next_cursor` of the previous page
+    - **difficulty**: Optional difficulty (easy, medium, hard) to filter quizzes
+    - **generated_from**: Only quizzes generated at or after this date or time
+    - **generated_to**: Only quizzes generated before this date or time
+    - **sort**: Sort key, `generated_at` or `num_questions` (default: generated_at)
+    - **order**: Sort order, `asc` or `desc` (default: desc)
+    - **fields**: Comma-separated fields to return, e.g. `quiz_id,difficulty` (default: all)
     """
     try:
-        if document_id:
-            # Get quizzes for a specific document
-            quizzes = await quiz_service.get_quizzes_for_document(document_id)
-        else:
-            # Get all quizzes
-            quizzes = await quiz_service.get_all_quizzes()
-        
-        return {"quizzes": quizzes}
+        return await quiz_service.list_quizzes(
+            document_id,
+            limit,
+            cursor,
+            difficulty,
+            generated_from.isoformat() if generated_from else None,
+            generated_to.isoformat() if generated_to else None,
+            sort,
+            order,
+            fields
+        )
     
+    except (InvalidCursorError, InvalidListQueryError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve quizzes: {str(e)}"
         )
 
+@router.get("/bank/{document_id}", response_model=Dict[str, Any])
+async def get_question_bank(document_id: str):
+    """
+    Get the number of banked questions per difficulty for a document.
+    
+    - **document_id**: The unique identifier of the document
+    """
+    try:
+        return question_bank.document_stats(document_id)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve question bank: {str(e)}"
+        )
+
+@router.post("/bank/{document_id}/fill", response_model=Dict[str, Any])
+async def fill_question_bank(document_id: str):
+    """
+    Top up a document's question bank and wait for the new questions.
+    
+    - **document_id**: The unique identifier of the document
+    """
+    try:
+        # Check if document exists
+        content = await document_service.get_document_content(document_id)
+        if not content:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Document with ID {document_id} not found"
+            )
+        
+        added = await question_bank.fill(document_id)
+        
+        return {"added": added, **question_bank.document_stats(document_id)}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fill question bank: {str(e)}"
+        )
+
+@router.get("/results", response_model=Dict[str, Any])
+async def list_results(quiz_id: Optional[str] = None, 
+                       student_id: Optional[str] = None, 
+                       limit: int = Query(default=100, ge=1, le=MAX_RESULTS_PAGE_SIZE), 
+                       cursor: Optional[int] = None):
+    """
+    Get a page of quiz results in submission order, for a quiz and/or a student.
+    
+    - **quiz_id**: Optional quiz ID to filter results
+    - **student_id**: Optional student ID to filter results
+    - **limit**: Maximum number of results to return (default: 100)
+    - **cursor**: The `next_cursor` of the previous page
+    """
+    try:
+        return await quiz_service.get_quiz_results(quiz_id, student_id, limit, cursor)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve results: {str(e)}"
+        )
+
+@router.get("/results/export")
+async def export_results(format: str = Query(default="csv", pattern="^(csv|ndjson)$"), 
+                         quiz_id: Optional[str] = None, 
+                         student_id: Optional[str] = None):
+    """
+    Stream quiz results as CSV or NDJSON.
+    
+    - **format**: Export format (csv, ndjson) (default: csv)
+    - **quiz_id**: Optional quiz ID to filter results
+    - **student_id**: Optional student ID to filter results
+    """
+    filename = f"quiz_results_{quiz_id or student_id or 'all'}.{format}"
+    return StreamingResponse(
+        result_store.export(format, quiz_id, student_id),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{quiz_id}", response_model=Dict[str, Any])
-async def get_quiz(quiz_id: str, include_answers: bool = False):
+async def get_quiz(quiz_id: str, 
+                   include_answers: bool = False, 
+                   if_none_match: Optional[str] = Header(default=None)):
     """
     Get a specific quiz by ID.
     
+    Responses carry an `ETag`; send it back in `If-None-Match` to get a
+    `304 Not Modified` instead of the quiz again.
+    
     - **quiz_id**: The unique identifier of the quiz
     - **include_answers**: Whether to include correct answers in the response
     """
     try:
         # Get quiz
-        quiz = await quiz_service.get_quiz(quiz_id)
+        quiz = await quiz_service.get_cached_quiz(quiz_id)
         
         if not quiz:
             raise HTTPException(
@@ -89,15 +229,18 @@ async def get_quiz(quiz_id: str, include_answers: bool = False):
                 detail=f"Quiz with ID {quiz_id} not found"
             )
         
-        # Remove correct answers if not requested
-        if not include_answers and "questions" in quiz:
-            for question in quiz["questions"]:
-                if "correct_answer" in question:
-                    del question["correct_answer"]
-                if "explanation" in question:
-                    del question["explanation"]
+        # The entity tags are computed once, when the quiz is cached
+        etag = quiz.full_etag if include_answers else quiz.public_etag
+        matched = matching_etag(if_none_match, etag)
+        if matched:
+            return not_modified(matched)
         
-        return quiz
+        # Send the pre-encoded view, with correct answers only if requested
+        return Response(
+            content=quiz.full_json if include_answers else quiz.public_json,
+            media_type="application/json",
+            headers=validator_headers(etag)
+        )
     
     except HTTPException:
         raise
@@ -113,11 +256,11 @@ async def submit_quiz(quiz_id: str, submission: QuizSubmission):
     Submit a completed quiz for evaluation.
     
     - **quiz_id**: The unique identifier of the quiz
-    - **submission**: The user's answers to the quiz questions
+    - **submission**: The user's answers to the quiz questions, and optionally their student ID
     """
     try:
         # Validate quiz ID
-        quiz = await quiz_service.get_quiz(quiz_id)
+        quiz = await quiz_service.get_cached_quiz(quiz_id)
         if not quiz:
             raise HTTPException(
                 status_code=404,
@@ -125,14 +268,14 @@ async def submit_quiz(quiz_id: str, submission: QuizSubmission):
             )
         
         # Check if number of answers matches number of questions
-        if len(submission.answers) != len(quiz.get("questions", [])):
+        if len(submission.answers) != quiz.num_questions:
             raise HTTPException(
                 status_code=400,
-                detail=f"Number of answers ({len(submission.answers)}) does not match number of questions ({len(quiz.get('questions', []))})"
+                detail=f"Number of answers ({len(submission.answers)}) does not match number of questions ({quiz.num_questions})"
             )
         
-        # Evaluate answers
-        result = await quiz_service.evaluate_quiz_answers(quiz_id, submission.answers)
+        # Evaluate answers against the quiz already looked up
+        result = await quiz_service.evaluate_quiz_answers(quiz_id, submission.answers, submission.student_id, quiz)
         
         if "error" in result:
             raise HTTPException(
@@ -148,4 +291,98 @@ async def submit_quiz(quiz_id: str, submission: QuizSubmission):
         raise HTTPException(
             status_code=500,
             detail=f"Failed to submit quiz: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/{quiz_id}/grade", response_model=BulkGradingResult)
+async def grade_submissions(quiz_id: str, bulk: BulkSubmission):
+    """
+    Grade many submissions to a quiz at once, e.g. a whole exam.
+    
+    - **quiz_id**: The unique identifier of the quiz
+    - **submissions**: Each student's answers to the quiz questions, and optionally their student ID
+    
+    Returns every student's score, summary score statistics and per-question
+    difficulty and discrimination statistics. All results are saved together.
+    """
+    try:
+        # Validate quiz ID
+        quiz = await quiz_service.get_cached_quiz(quiz_id)
+        if not quiz:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Quiz with ID {quiz_id} not found"
+            )
+        
+        if len(bulk.submissions) > bulk_grader.max_submissions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many submissions ({len(bulk.submissions)}), the maximum is {bulk_grader.max_submissions}"
+            )
+        
+        # Check that every submission answers every question
+        mismatched = [
+            i for i, submission in enumerate(bulk.submissions)
+            if len(submission.answers) != quiz.num_questions
+        ]
+        if mismatched:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Submissions {mismatched[:10]} do not have one answer for each of the {quiz.num_questions} questions"
+            )
+        
+        result = await quiz_service.grade_submissions(
+            quiz_id,
+            [submission.model_dump() for submission in bulk.submissions],
+            quiz
+        )
+        
+        if "error" in result:
+            raise HTTPException(
+                status_code=500,
+                detail=result["error"]
+            )
+        
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to grade submissions: {str(e)}"
+        )
+
+@router.get("/{quiz_id}/analytics", response_model=Dict[str, Any])
+async def get_quiz_analytics(quiz_id: str):
+    """
+    Get running score statistics for a quiz.
+    
+    - **quiz_id**: The unique identifier of the quiz
+    
+    Returns the number of results, mean, variance, a score histogram, and
+    each question's correct rate and option selection counts.
+    """
+    try:
+        return await quiz_service.get_quiz_analytics(quiz_id)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve quiz analytics: {str(e)}"
+        )
+
+@router.get("/documents/{document_id}/analytics", response_model=Dict[str, Any])
+async def get_document_analytics(document_id: str):
+    """
+    Get running score statistics across every quiz on a document.
+    
+    - **document_id**: The unique identifier of the document
+    """
+    try:
+        return await quiz_service.get_document_analytics(document_id)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve document analytics: {str(e)}"
+        )
\ No newline at end of file
@@ -0,0 +1,47 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """
+    Format a payload as a single server-sent event.
+    
+    Args:
+        data: JSON-serialisable payload for the event
+        event: Optional event name
+    
+    Returns:
+        The encoded event, terminated by a blank line
+    """
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    message += f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return message
+
+
+def sse_response(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> StreamingResponse:
+    """
+    Wrap an async iterator of (event, data) pairs in a text/event-stream response.
+    
+    Once the stream has started the status code can no longer change, so any
+    exception is reported to the client as an "error" event instead.
+    """
+    async def event_stream():
+        try:
+            async for event, data in events:
+                yield format_sse(data, event)
+        except Exception as e:
+            print(f"Error in event stream: {str(e)}")
+            yield format_sse({"error": str(e)}, "error")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -27,12 +27,25 @@ from app.api.document import router as document_router
 from app.api.quiz import router as quiz_router
 from app.api.qa import router as qa_router
 from app.api.explanation import router as explanation_router
+from app.api.admin import router as admin_router
+from app.services.http_pool import llm_http_pool
+from app.services.compression import CompressionMiddleware, COMPRESSION_ENABLED
 
 # Include routers
 app.include_router(document_router, prefix="/api/documents", tags=["Documents"])
 app.include_router(quiz_router, prefix="/api/quizzes", tags=["Quizzes"])
 app.include_router(qa_router, prefix="/api/qa", tags=["Q&A"])
 app.include_router(explanation_router, prefix="/api/explanations", tags=["Explanations"])
+app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
+
+# Compress large responses with gzip or brotli, as negotiated with each client
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Close pooled upstream connections on shutdown
+@app.on_event("shutdown")
+async def close_http_pool():
+    await llm_http_pool.aclose()
 
 # Root endpoint
 @app.get("/")
@@ -42,7 +55,8 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # The process IDs let run_production.py tell which master's workers are answering
+    return {"status": "healthy", "pid": os.getpid(), "parent_pid": os.getppid()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class CacheWarmupRequest(BaseModel):
+    """Request model for warming the explanation cache."""
+    concepts: List[str] = Field(..., min_length=1)
+
+
+class CacheWarmupResponse(BaseModel):
+    """Response model for an explanation cache warm-up."""
+    queued: int
+    already_cached: int
+
+
+class CacheInvalidationResponse(BaseModel):
+    """Response model for explanation cache invalidation."""
+    invalidated: int
+    concept: Optional[str] = None
+
+
+class SemanticCacheReview(BaseModel):
+    """Reviewer verdict on a sampled semantic cache hit."""
+    false_hit: bool
@@ -13,15 +13,16 @@ class DocumentResponse(BaseModel):
 
 
 class DocumentMetadata(BaseModel):
-    """Metadata for a processed document."""
-    file_id: str
-    extraction_date: str
-    content_length: int
+    """Metadata for a processed document; fields left out of a projection are omitted."""
+    file_id: Optional[str] = None
+    extraction_date: Optional[str] = None
+    content_length: Optional[int] = None
 
 
 class DocumentList(BaseModel):
-    """List of document metadata."""
+    """A page of document metadata."""
     documents: List[DocumentMetadata]
+    next_cursor: Optional[str] = None
 
 
 class DocumentContent(BaseModel):
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class ExplanationRequest(BaseModel):
@@ -10,4 +10,9 @@ class ExplanationRequest(BaseModel):
 class ExplanationResponse(BaseModel):
     """Response model for legal concept explanation."""
     concept: str
-    explanation: str 
\ No newline at end of file
+    explanation: str
+
+
+class BatchExplanationRequest(BaseModel):
+    """Request model for explaining several legal concepts at once."""
+    concepts: List[str] = Field(..., min_length=1, max_length=100)
@@ -13,6 +13,7 @@ class QuestionRequest(BaseModel):
     question: str
     document_id: Optional[str] = None
     chat_history: Optional[List[ChatMessage]] = None
+    session_id: Optional[str] = None
 
 
 class Source(BaseModel):
@@ -25,4 +26,12 @@ class QuestionResponse(BaseModel):
     """Response model for a question answer."""
     answer: str
     sources: List[Source] = []
-    document_id: Optional[str] = None 
\ No newline at end of file
+    document_id: Optional[str] = None
+
+
+class ChatSession(BaseModel):
+    """Model for a server-side chat session."""
+    session_id: str
+    created_at: float
+    updated_at: float
+    messages: List[ChatMessage] = []
@@ -16,6 +16,7 @@ class QuizQuestion(BaseModel):
     options: List[str]
     correct_answer: Optional[str] = None
     explanation: Optional[str] = None
+    section: Optional[int] = None
 
 
 class QuizResponse(BaseModel):
@@ -29,22 +30,24 @@ class QuizResponse(BaseModel):
 
 
 class QuizMetadata(BaseModel):
-    """Metadata for a quiz."""
-    quiz_id: str
-    document_id: str
-    generated_at: str
-    difficulty: str
-    num_questions: int
+    """Metadata for a quiz; fields left out of a projection are omitted."""
+    quiz_id: Optional[str] = None
+    document_id: Optional[str] = None
+    generated_at: Optional[str] = None
+    difficulty: Optional[str] = None
+    num_questions: Optional[int] = None
 
 
 class QuizList(BaseModel):
-    """List of quiz metadata."""
+    """A page of quiz metadata."""
     quizzes: List[QuizMetadata]
+    next_cursor: Optional[str] = None
 
 
 class QuizSubmission(BaseModel):
     """Submission model for quiz answers."""
     answers: List[str]
+    student_id: Optional[str] = None
 
 
 class QuizFeedbackItem(BaseModel):
@@ -62,4 +65,35 @@ class QuizResult(BaseModel):
     score: float
     correct_count: int
     total_questions: int
-    feedback: List[QuizFeedbackItem] 
\ No newline at end of file
+    feedback: List[QuizFeedbackItem] 
+
+
+class BulkSubmission(BaseModel):
+    """Many students' answers to one quiz, graded together."""
+    submissions: List[QuizSubmission] = Field(..., min_length=1)
+
+
+class GradedSubmission(BaseModel):
+    """Score of one submission in a bulk grading run."""
+    result_id: str
+    student_id: Optional[str] = None
+    score: float
+    correct_count: int
+
+
+class QuestionStatistics(BaseModel):
+    """Item statistics for one question across a bulk grading run."""
+    question_number: int
+    correct_answer: Optional[str] = None
+    difficulty: Optional[float] = None
+    discrimination: Optional[float] = None
+    point_biserial: Optional[float] = None
+
+
+class BulkGradingResult(BaseModel):
+    """Result model for bulk grading."""
+    quiz_id: str
+    total_questions: int
+    summary: Dict[str, Any]
+    questions: List[QuestionStatistics]
+    results: List[GradedSubmission]
\ No newline at end of file
@@ -0,0 +1,126 @@
+import os
+import math
+from typing import Any, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+# Get bulk grading configuration from environment variables
+BULK_GRADING_MAX_SUBMISSIONS = int(os.getenv("BULK_GRADING_MAX_SUBMISSIONS", "5000"))
+
+# Share of students in each of the upper and lower groups for the discrimination index
+DISCRIMINATION_GROUP_SHARE = 0.27
+
+
+def _statistic(value: float) -> Optional[float]:
+    """Round a statistic for the response, or None if it is undefined."""
+    return None if math.isnan(value) else round(float(value), 4)
+
+
+class BulkGrader:
+    """
+    Vectorised grading of many submissions to one quiz.
+    
+    The submissions form an answer matrix (one row per student, one column
+    per question) that is compared against the answer key in a single
+    operation. Scores and the per-question item statistics are then column
+    and row reductions of the resulting correctness matrix:
+    
+    - difficulty: share of students answering correctly (p-value)
+    - discrimination: share correct in the top 27% of students by score
+      minus the share correct in the bottom 27%
+    - point_biserial: correlation of the question with the score on the rest
+      of the quiz, undefined when everyone (or no one) answered correctly
+    """
+    
+    def __init__(self, max_submissions: int = BULK_GRADING_MAX_SUBMISSIONS):
+        """Initialize the grader settings."""
+        self.max_submissions = max_submissions
+        self.counters = {
+            "batches": 0,
+            "submissions": 0
+        }
+    
+    def grade(self, answer_key: Sequence[Optional[str]], answers: List[List[str]]) -> Dict[str, Any]:
+        """
+        Grade submissions against an answer key.
+        
+        Args:
+            answer_key: The correct answer of each question
+            answers: Each student's answers, one per question
+        
+        Returns:
+            Per-submission correct counts and scores, summary score statistics
+            and per-question item statistics
+        """
+        num_questions = len(answer_key)
+        num_submissions = len(answers)
+        
+        # Questions without a correct answer are never marked correct
+        key = np.array([answer if answer is not None else "" for answer in answer_key], dtype=str)
+        has_key = np.array([answer is not None for answer in answer_key], dtype=bool)
+        matrix = np.array(answers, dtype=str).reshape(num_submissions, num_questions)
+        
+        correct = (matrix == key) & has_key
+        correct_counts = correct.sum(axis=1)
+        if num_questions:
+            scores = correct_counts * (100.0 / num_questions)
+        else:
+            scores = np.zeros(num_submissions)
+        
+        # Upper and lower groups by total score (ties broken by submission order)
+        group_size = max(1, int(round(num_submissions * DISCRIMINATION_GROUP_SHARE)))
+        order = np.argsort(correct_counts, kind="stable")
+        difficulty = correct.mean(axis=0)
+        discrimination = correct[order[-group_size:]].mean(axis=0) - correct[order[:group_size]].mean(axis=0)
+        
+        # Corrected item-total correlation: each question against the score on the other questions
+        items = correct.astype(np.float64)
+        rest = correct_counts[:, None] - items
+        items_centred = items - items.mean(axis=0)
+        rest_centred = rest - rest.mean(axis=0)
+        denominator = np.sqrt((items_centred ** 2).sum(axis=0) * (rest_centred ** 2).sum(axis=0))
+        point_biserial = np.divide(
+            (items_centred * rest_centred).sum(axis=0),
+            denominator,
+            out=np.full(num_questions, np.nan),
+            where=denominator > 0
+        )
+        
+        self.counters["batches"] += 1
+        self.counters["submissions"] += num_submissions
+        
+        return {
+            "correct_counts": correct_counts.tolist(),
+            "scores": scores.tolist(),
+            "summary": {
+                "submissions": num_submissions,
+                "mean_score": _statistic(scores.mean()),
+                "std_score": _statistic(scores.std()),
+                "median_score": _statistic(np.median(scores)),
+                "min_score": _statistic(scores.min()),
+                "max_score": _statistic(scores.max())
+            },
+            "questions": [
+                {
+                    "question_number": i + 1,
+                    "correct_answer": answer_key[i],
+                    "difficulty": _statistic(difficulty[i]),
+                    "discrimination": _statistic(discrimination[i]),
+                    "point_biserial": _statistic(point_biserial[i])
+                }
+                for i in range(num_questions)
+            ]
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of batches and submissions graded."""
+        return {
+            "max_submissions": self.max_submissions,
+            **self.counters
+        }
+
+# Create a singleton instance
+bulk_grader = BulkGrader()
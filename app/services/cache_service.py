@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get cache configuration from environment variables
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+EXPLANATION_CACHE_DIR = os.path.join(OUTPUT_DIR, "cache", "explanations")
+EXPLANATION_CACHE_MEMORY_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MEMORY_ENTRIES", "256"))
+EXPLANATION_CACHE_DISK_ENTRIES = int(os.getenv("EXPLANATION_CACHE_DISK_ENTRIES", "5000"))
+EXPLANATION_CACHE_TTL_SECONDS = int(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Ensure the cache directory exists
+os.makedirs(EXPLANATION_CACHE_DIR, exist_ok=True)
+
+
+def normalize_concept(concept: str) -> str:
+    """
+    Normalise a concept name so trivial variations share a cache entry.
+    
+    "Res Judicata", "  res   judicata?" and "RES JUDICATA." all map to "res judicata".
+    """
+    normalized = re.sub(r"\s+", " ", concept.strip().lower())
+    return normalized.strip(" .,;:!?\"'")
+
+
+class ExplanationCache:
+    """
+    Two-tier LRU cache for legal concept explanations.
+    
+    Entries are keyed on the normalised concept, the prompt version and the
+    model name, so changing either the prompt or the model never serves stale
+    text. The memory tier is an ordered dict; the disk tier is one JSON file per
+    entry whose modification time records the last access for LRU eviction.
+    
+    The disk tier is shared by every worker process and is the source of
+    truth: a memory hit is only served while its disk entry still exists, so
+    an entry invalidated or evicted by another process is not served again.
+    """
+    
+    def __init__(self,
+                 cache_dir: str = EXPLANATION_CACHE_DIR,
+                 memory_entries: int = EXPLANATION_CACHE_MEMORY_ENTRIES,
+                 disk_entries: int = EXPLANATION_CACHE_DISK_ENTRIES,
+                 ttl_seconds: int = EXPLANATION_CACHE_TTL_SECONDS):
+        """Initialize the cache and count the entries already on disk."""
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+        
+        # key -> (explanation, expires_at), most recently used last
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._disk_count = len(self._disk_files())
+        
+        self.stats_counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+    
+    @staticmethod
+    def make_key(concept: str, prompt_version: str, model_name: str) -> str:
+        """Build the cache key for a concept, prompt version and model."""
+        raw = f"{normalize_concept(concept)}\x00{prompt_version}\x00{model_name}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, concept: str, prompt_version: str, model_name: str) -> Optional[str]:
+        """
+        Look up a cached explanation.
+        
+        Args:
+            concept: The legal concept
+            prompt_version: Version of the prompt that produced the explanation
+            model_name: Name of the model that produced the explanation
+        
+        Returns:
+            The cached explanation, or None on a miss
+        """
+        key = self.make_key(concept, prompt_version, model_name)
+        now = time.time()
+        path = self._path(key)
+        
+        # Memory tier, while the disk entry has not been removed by another process
+        entry = self._memory.get(key)
+        if entry is not None:
+            explanation, expires_at = entry
+            if expires_at > now and os.path.exists(path):
+                self._memory.move_to_end(key)
+                self.stats_counters["memory_hits"] += 1
+                return explanation
+            del self._memory[key]
+            if expires_at <= now:
+                self.stats_counters["expired"] += 1
+        
+        # Disk tier
+        data = self._read_entry(path)
+        if data is not None:
+            if data.get("expires_at", 0) > now:
+                # Touch the file so disk eviction sees it as recently used
+                os.utime(path, None)
+                self._remember(key, data["explanation"], data["expires_at"])
+                self.stats_counters["disk_hits"] += 1
+                return data["explanation"]
+            self._remove_file(path)
+            self.stats_counters["expired"] += 1
+        
+        self.stats_counters["misses"] += 1
+        return None
+    
+    def contains(self, concept: str, prompt_version: str, model_name: str) -> bool:
+        """Check for an unexpired entry on disk without updating recency or hit counters."""
+        key = self.make_key(concept, prompt_version, model_name)
+        data = self._read_entry(self._path(key))
+        return data is not None and data.get("expires_at", 0) > time.time()
+    
+    def set(self, concept: str, prompt_version: str, model_name: str, explanation: str):
+        """
+        Store an explanation in both tiers.
+        
+        Args:
+            concept: The legal concept
+            prompt_version: Version of the prompt that produced the explanation
+            model_name: Name of the model that produced the explanation
+            explanation: The explanation text
+        """
+        key = self.make_key(concept, prompt_version, model_name)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        
+        self._remember(key, explanation, expires_at)
+        
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        entry = {
+            "concept": normalize_concept(concept),
+            "prompt_version": prompt_version,
+            "model_name": model_name,
+            "created_at": now,
+            "expires_at": expires_at,
+            "explanation": explanation
+        }
+        
+        # Write atomically so a concurrent reader never sees a partial file; each process writes its own temporary file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        
+        self.stats_counters["writes"] += 1
+        if is_new:
+            self._disk_count += 1
+            if self._disk_count > self.disk_entries:
+                self._evict_disk()
+    
+    def invalidate(self, concept: Optional[str] = None) -> int:
+        """
+        Remove cached explanations.
+        
+        Args:
+            concept: Only remove entries for this concept (across all prompt
+                versions and models); remove everything if omitted
+        
+        Returns:
+            Number of disk entries removed
+        
+        Other processes stop serving the removed entries from memory on their
+        next lookup of them.
+        """
+        target = normalize_concept(concept) if concept else None
+        removed = 0
+        
+        for path in self._disk_files():
+            if target is not None:
+                data = self._read_entry(path)
+                if data is None or data.get("concept") != target:
+                    continue
+            key = os.path.splitext(os.path.basename(path))[0]
+            self._memory.pop(key, None)
+            self._remove_file(path)
+            removed += 1
+        
+        if target is None:
+            self._memory.clear()
+        
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return cache sizes and hit/miss counters."""
+        counters = dict(self.stats_counters)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.memory_entries,
+            "disk_entries": self._disk_count,
+            "disk_capacity": self.disk_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            **counters
+        }
+    
+    def _remember(self, key: str, explanation: str, expires_at: float):
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = (explanation, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict_disk(self):
+        """Drop the least recently used disk entries down to 90% of capacity."""
+        files = self._disk_files()
+        files.sort(key=lambda path: os.path.getmtime(path))
+        target = int(self.disk_entries * 0.9)
+        
+        for path in files[:max(0, len(files) - target)]:
+            key = os.path.splitext(os.path.basename(path))[0]
+            self._memory.pop(key, None)
+            self._remove_file(path)
+            self.stats_counters["evictions"] += 1
+        
+        self._disk_count = len(self._disk_files())
+    
+    def _disk_files(self):
+        """List the entry files in the disk tier."""
+        return [
+            os.path.join(self.cache_dir, filename)
+            for filename in os.listdir(self.cache_dir)
+            if filename.endswith(".json")
+        ]
+    
+    def _path(self, key: str) -> str:
+        """Return the disk path for a cache key."""
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def _read_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        """Read a disk entry, treating unreadable files as missing."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def _remove_file(self, path: str):
+        """Delete a disk entry and keep the entry count in step."""
+        try:
+            os.remove(path)
+            self._disk_count = max(0, self._disk_count - 1)
+        except FileNotFoundError:
+            pass
+
+# Create a singleton instance
+explanation_cache = ExplanationCache()
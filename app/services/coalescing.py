@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+    
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task instead of starting their
+    own. The task is shielded, so a caller that disconnects does not cancel
+    the work for everyone else. Results are not retained once the task has
+    finished - this is request coalescing, not a cache.
+    """
+    
+    def __init__(self, name: str):
+        """Initialize an empty set of in-flight calls."""
+        self.name = name
+        self._in_flight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.counters = {
+            "calls": 0,
+            "executions": 0,
+            "deduplicated": 0,
+            "errors": 0
+        }
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn for the key, or join the call already in flight for it.
+        
+        Args:
+            key: Identifies calls that are interchangeable
+            fn: Zero-argument coroutine function performing the work
+        
+        Returns:
+            The result of the shared execution
+        """
+        self.counters["calls"] += 1
+        
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.counters["deduplicated"] += 1
+            return await asyncio.shield(task)
+        
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        self.counters["executions"] += 1
+        task.add_done_callback(lambda finished: self._finish(key, finished))
+        
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]"):
+        """Forget a finished call so the next caller starts fresh."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return call counts and how many were deduplicated."""
+        counters = dict(self.counters)
+        calls = counters["calls"]
+        return {
+            "in_flight": len(self._in_flight),
+            "dedup_rate": counters["deduplicated"] / calls if calls else 0.0,
+            **counters
+        }
+
+# Create instances for each coalesced operation
+llm_coalescer = SingleFlight("llm")
+index_load_coalescer = SingleFlight("index_load")
@@ -0,0 +1,211 @@
+import os
+import gzip
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.conditional import with_encoding
+
+# Handle optional brotli support
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Load environment variables
+load_dotenv()
+
+# Get response compression configuration from environment variables
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))
+
+# Content types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class ResponseCompressor:
+    """
+    Negotiates and applies gzip or brotli compression of response bodies.
+    
+    Brotli is preferred when the client accepts it and the brotli package is
+    installed. Bodies with a strong entity tag are immutable for that tag,
+    so their compressed form is kept in a small LRU cache and repeated
+    reads of the same quiz or document are not compressed again.
+    """
+    
+    def __init__(self,
+                 min_size: int = COMPRESSION_MIN_SIZE,
+                 gzip_level: int = COMPRESSION_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+                 cache_size: int = COMPRESSION_CACHE_SIZE):
+        """Initialize the compression settings and an empty cache."""
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.counters = {
+            "compressed": {encoding: 0 for encoding in self.encodings},
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "cache_hits": 0
+        }
+    
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """
+        Choose a content coding from an Accept-Encoding header.
+        
+        Returns:
+            "br", "gzip", or None if the client accepts neither
+        """
+        if not accept_encoding:
+            return None
+        
+        weights: Dict[str, float] = {}
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            weight = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[coding.strip().lower()] = weight
+        
+        # Codings not listed take the weight of "*", if given; ties go to the first (preferred) coding
+        best = None
+        for encoding in self.encodings:
+            weight = weights.get(encoding, weights.get("*", 0.0))
+            if weight > 0 and (best is None or weight > best[1]):
+                best = (encoding, weight)
+        return best[0] if best else None
+    
+    def compress(self, body: bytes, encoding: str, etag: Optional[str] = None) -> bytes:
+        """
+        Compress a body, reusing the cached result for a strong entity tag.
+        
+        Args:
+            body: The uncompressed body
+            encoding: "br" or "gzip"
+            etag: The body's strong entity tag, if it has one
+        
+        Returns:
+            The compressed body
+        """
+        key = (etag, encoding) if etag and not etag.startswith("W/") else None
+        if key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            self.counters["cache_hits"] += 1
+            compressed = self._cache[key]
+        else:
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                # A fixed timestamp keeps the output identical for identical bodies
+                compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            
+            if key is not None and self.cache_size > 0:
+                self._cache[key] = compressed
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        self.counters["compressed"][encoding] += 1
+        self.counters["bytes_in"] += len(body)
+        self.counters["bytes_out"] += len(compressed)
+        return compressed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return compression counts, savings and cache usage."""
+        bytes_in = self.counters["bytes_in"]
+        return {
+            "enabled": COMPRESSION_ENABLED,
+            "encodings": list(self.encodings),
+            "min_size": self.min_size,
+            "cached_bodies": len(self._cache),
+            **self.counters,
+            "compression_ratio": self.counters["bytes_out"] / bytes_in if bytes_in else None
+        }
+    
+    def is_eligible(self, status: int, headers: Headers, body: bytes) -> bool:
+        """Whether a complete response should be compressed."""
+        return (
+            200 <= status < 300 and status not in (204, 206)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            and len(body) >= self.min_size
+        )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete responses per request.
+    
+    The response start is held until the first body message. A response sent
+    in one piece is compressed if it is eligible; streamed responses
+    (server-sent events, exports) are passed through unchanged so each chunk
+    still reaches the client as soon as it is produced. A compressed
+    response's entity tag gets an encoding suffix, since its bytes differ.
+    Every eligible response carries Vary: Accept-Encoding, including one sent
+    uncompressed to a client that accepts no supported coding, so shared
+    caches never hand it a compressed copy or the other way round.
+    """
+    
+    def __init__(self, app: Any, compressor: Optional[ResponseCompressor] = None):
+        """Wrap an ASGI application."""
+        self.app = app
+        self.compressor = compressor or response_compressor
+    
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        encoding = self.compressor.negotiate(Headers(scope=scope).get("accept-encoding"))
+        start_message: Optional[Dict[str, Any]] = None
+        
+        async def send_compressed(message: Dict[str, Any]):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body", False) or not self.compressor.is_eligible(start["status"], headers, body):
+                await send(start)
+                await send(message)
+                return
+            
+            # The representation depends on Accept-Encoding even when it goes out uncompressed
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            if encoding is None:
+                await send(start)
+                await send(message)
+                return
+            
+            etag = headers.get("etag")
+            compressed = self.compressor.compress(body, encoding, etag)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if etag and etag.endswith('"'):
+                headers["ETag"] = with_encoding(etag, encoding)
+            
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+        
+        await self.app(scope, receive, send_compressed)
+
+# Create a singleton instance
+response_compressor = ResponseCompressor()
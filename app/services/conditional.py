@@ -0,0 +1,75 @@
+import hashlib
+from typing import Any, Dict, Optional
+from starlette.responses import Response
+
+# Suffixes added to an entity tag by response compression, one per content coding
+ENCODING_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+
+
+def strong_etag(*parts: Any) -> str:
+    """
+    Strong entity tag from the content, or from the version, of a representation.
+    
+    Args:
+        parts: The response body as bytes, or values that change whenever it does
+    
+    Returns:
+        The quoted entity tag
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def with_encoding(etag: str, encoding: str) -> str:
+    """The entity tag of a representation compressed with a content coding."""
+    return f'{etag[:-1]}{ENCODING_SUFFIXES[encoding]}"'
+
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    Find the tag in an If-None-Match header that matches a representation.
+    
+    A compressed representation has its own tag, so a client that received
+    one sends the tag with the encoding suffix; it still names the same
+    content and matches.
+    
+    Args:
+        if_none_match: The If-None-Match request header
+        etag: The uncompressed representation's entity tag
+    
+    Returns:
+        The matching tag as sent by the client, to be echoed in the 304
+        response, or None if nothing matches
+    """
+    if not if_none_match:
+        return None
+    
+    variants = {etag, *(with_encoding(etag, encoding) for encoding in ENCODING_SUFFIXES)}
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return etag
+        # If-None-Match uses weak comparison
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in variants:
+            return tag
+    return None
+
+
+def validator_headers(etag: str) -> Dict[str, str]:
+    """Headers sent with a representation that can be revalidated by its entity tag."""
+    return {
+        "ETag": etag,
+        # Clients may store the response but must revalidate it before reuse
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+
+
+def not_modified(etag: str) -> Response:
+    """A 304 response for a client whose copy is current."""
+    return Response(status_code=304, headers=validator_headers(etag))
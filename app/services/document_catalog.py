@@ -0,0 +1,173 @@
+import os
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.pagination import InvalidListQueryError, keyset_page, parse_fields
+
+# Load environment variables
+load_dotenv()
+
+# Get document catalog configuration from environment variables
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+DOCUMENT_CATALOG_DB = os.getenv("DOCUMENT_CATALOG_DB", os.path.join(OUTPUT_DIR, "document_catalog.db"))
+
+# Columns returned for each document in list views
+CATALOG_FIELDS = ("file_id", "extraction_date", "content_length")
+
+# Columns documents can be listed in order of
+SORT_KEYS = ("extraction_date", "content_length")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class DocumentCatalog:
+    """
+    Indexed catalog of document metadata, so listing does not read document files.
+    
+    Extracted documents are still stored as JSON files holding their full
+    text; the catalog keeps one row of metadata per document in SQLite.
+    Lists use keyset (cursor) pagination over an index on each sort key, so
+    the cost of a page depends only on its size.
+    """
+    
+    def __init__(self, db_path: str = DOCUMENT_CATALOG_DB):
+        """Open the catalog database, creating the table and indexes if needed."""
+        self.db_path = db_path
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS document_catalog ("
+            "file_id TEXT PRIMARY KEY, "
+            "extraction_date TEXT NOT NULL, "
+            "content_length INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_document_catalog_extraction_date "
+            "ON document_catalog (extraction_date, file_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_document_catalog_content_length "
+            "ON document_catalog (content_length, file_id)"
+        )
+        self._db.commit()
+    
+    def upsert(self, document: Dict[str, Any]):
+        """
+        Add or update a document's catalog entry.
+        
+        Args:
+            document: The document metadata (file_id, extraction_date, content_length)
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO document_catalog (file_id, extraction_date, content_length) VALUES (?, ?, ?)",
+            tuple(document.get(field) for field in CATALOG_FIELDS)
+        )
+        self._db.commit()
+    
+    def delete(self, file_id: str) -> bool:
+        """
+        Remove a document's catalog entry.
+        
+        Returns:
+            True if the document was catalogued
+        """
+        cursor = self._db.execute("DELETE FROM document_catalog WHERE file_id = ?", (file_id,))
+        self._db.commit()
+        return cursor.rowcount > 0
+    
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a document's catalog entry.
+        
+        Returns:
+            The document metadata, or None if the document is not catalogued
+        """
+        row = self._db.execute(
+            f"SELECT {', '.join(CATALOG_FIELDS)} FROM document_catalog WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        return dict(zip(CATALOG_FIELDS, row)) if row else None
+    
+    def list_documents(self,
+                       limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None,
+                       extracted_from: Optional[str] = None,
+                       extracted_to: Optional[str] = None,
+                       sort: str = "extraction_date",
+                       order: str = "desc",
+                       fields: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List document metadata one page at a time, newest first by default.
+        
+        Args:
+            limit: Maximum documents to return
+            cursor: The next_cursor of the previous page
+            extracted_from: Only list documents extracted at or after this ISO date or time
+            extracted_to: Only list documents extracted before this ISO date or time
+            sort: Column to sort by (extraction_date or content_length)
+            order: "asc" or "desc"
+            fields: Comma-separated fields to return (all by default)
+        
+        Returns:
+            (documents, next_cursor), where next_cursor is None on the last page
+        """
+        if sort not in SORT_KEYS:
+            raise InvalidListQueryError(f"Unknown sort key: {sort}. Available sort keys: {', '.join(SORT_KEYS)}")
+        
+        conditions = []
+        params: List[Any] = []
+        for condition, value in (("extraction_date >= ?", extracted_from),
+                                 ("extraction_date < ?", extracted_to)):
+            if value:
+                conditions.append(condition)
+                params.append(value)
+        
+        return keyset_page(
+            self._db, "document_catalog", parse_fields(fields, CATALOG_FIELDS), "file_id",
+            sort, order, conditions, params, max(1, min(limit, MAX_PAGE_SIZE)), cursor
+        )
+    
+    def reconnect(self):
+        """Open a new catalog connection in a forked worker."""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    def count(self) -> int:
+        """Number of catalogued documents."""
+        return self._db.execute("SELECT COUNT(*) FROM document_catalog").fetchone()[0]
+    
+    def rebuild(self, output_dir: str) -> int:
+        """
+        Catalog every extracted document in a directory, replacing existing entries.
+        
+        Used once to populate the catalog for documents extracted before it existed.
+        
+        Returns:
+            The number of documents catalogued
+        """
+        rows = []
+        for filename in os.listdir(output_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(output_dir, filename), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if "file_id" not in data:
+                    continue
+                rows.append((data["file_id"], data.get("extraction_date", ""), len(data.get("content", ""))))
+            except Exception as e:
+                print(f"Error cataloguing document file {filename}: {str(e)}")
+        
+        self._db.executemany(
+            "INSERT OR REPLACE INTO document_catalog (file_id, extraction_date, content_length) VALUES (?, ?, ?)",
+            rows
+        )
+        self._db.commit()
+        return len(rows)
+
+# Create a singleton instance
+document_catalog = DocumentCatalog()
@@ -1,12 +1,15 @@
 import os
 import json
 import uuid
-from typing import Dict, List, Optional, BinaryIO
+from typing import Any, Dict, List, Optional, BinaryIO
 from datetime import datetime
 from dotenv import load_dotenv
 import pypdf
 import docx2txt
 
+from app.services.document_catalog import document_catalog, DEFAULT_PAGE_SIZE
+from app.services.conditional import strong_etag
+
 # Load environment variables
 load_dotenv()
 
@@ -22,6 +25,14 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 class DocumentService:
     """Service for handling document uploads and text extraction."""
     
+    def __init__(self):
+        """Catalog documents extracted before the catalog existed."""
+        try:
+            if document_catalog.count() == 0:
+                document_catalog.rebuild(OUTPUT_DIR)
+        except Exception as e:
+            print(f"Error cataloguing documents: {str(e)}")
+    
     async def save_uploaded_file(self, file: BinaryIO, filename: str) -> str:
         """
         Save an uploaded file to the upload directory.
@@ -109,6 +120,12 @@ class DocumentService:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
+        document_catalog.upsert({
+            "file_id": file_id,
+            "extraction_date": data["extraction_date"],
+            "content_length": len(text)
+        })
+        
         return output_file
     
     async def get_document_content(self, file_id: str) -> Optional[str]:
@@ -130,29 +147,77 @@ class DocumentService:
             data = json.load(f)
             return data.get("content", "")
     
-    async def get_all_documents(self) -> List[Dict]:
+    def has_document(self, file_id: str) -> bool:
         """
-        Get a list of all processed documents.
+        Check whether a document's extracted text exists, without reading it.
+        
+        Args:
+            file_id: The unique identifier of the document
         
         Returns:
-            List of document metadata
+            True if the document has not been deleted
+        """
+        return os.path.exists(os.path.join(OUTPUT_DIR, f"{file_id}.json"))
+    
+    def get_document_etag(self, file_id: str, include_content: bool = False) -> Optional[str]:
         """
-        documents = []
+        Entity tag of a document's representation, from its catalog entry.
+        
+        A document's text is only written when it is extracted, so its
+        extraction date identifies the version. The tag is found without
+        reading the document file.
         
-        for filename in os.listdir(OUTPUT_DIR):
-            if filename.endswith(".json"):
-                file_path = os.path.join(OUTPUT_DIR, filename)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    # Extract only the metadata, not the full content
-                    document = {
-                        "file_id": data.get("file_id"),
-                        "extraction_date": data.get("extraction_date"),
-                        "content_length": len(data.get("content", ""))
-                    }
-                    documents.append(document)
+        Args:
+            file_id: The unique identifier of the document
+            include_content: Whether the representation includes the content
         
-        return documents
+        Returns:
+            The entity tag, or None if the document is not catalogued
+        """
+        entry = document_catalog.get(file_id)
+        if entry is None:
+            return None
+        return strong_etag(file_id, entry["extraction_date"], entry["content_length"], include_content)
+    
+    async def list_documents(self, 
+                             limit: int = DEFAULT_PAGE_SIZE, 
+                             cursor: Optional[str] = None, 
+                             extracted_from: Optional[str] = None, 
+                             extracted_to: Optional[str] = None, 
+                             sort: str = "extraction_date", 
+                             order: str = "desc", 
+                             fields: Optional[str] = None) -> Dict[str, Any]:
+        """
+        List document metadata from the catalog, one page at a time.
+        
+        Args:
+            limit: Maximum number of documents to return
+            cursor: The next_cursor of the previous page
+            extracted_from: Only documents extracted at or after this ISO date or time
+            extracted_to: Only documents extracted before this ISO date or time
+            sort: Sort key (extraction_date or content_length)
+            order: Sort order (asc or desc)
+            fields: Comma-separated fields to return (all by default)
+        
+        Returns:
+            {"documents": [...], "next_cursor": ...}, with next_cursor None on the last page
+        """
+        documents, next_cursor = document_catalog.list_documents(
+            limit, cursor, extracted_from, extracted_to, sort, order, fields
+        )
+        return {"documents": documents, "next_cursor": next_cursor}
+    
+    async def get_all_documents(self, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """
+        Get the most recently processed documents.
+        
+        Args:
+            limit: Maximum number of documents to return
+        
+        Returns:
+            List of document metadata
+        """
+        return (await self.list_documents(limit))["documents"]
         
     async def delete_document(self, file_id: str) -> bool:
         """
@@ -174,6 +239,7 @@ class DocumentService:
                 
             # Delete the file
             os.remove(file_path)
+            document_catalog.delete(file_id)
             
             # Check if there are any uploaded files associated with this document
             # We don't know the original filename, so we can't delete it directly
@@ -0,0 +1,154 @@
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.token_counter import count_tokens, MESSAGE_OVERHEAD_TOKENS
+
+# Load environment variables
+load_dotenv()
+
+# Get chat history configuration from environment variables
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+CHAT_SUMMARY_MAX_WORDS = int(os.getenv("CHAT_SUMMARY_MAX_WORDS", "200"))
+CHAT_SUMMARY_CACHE_SIZE = int(os.getenv("CHAT_SUMMARY_CACHE_SIZE", "1024"))
+
+# When folding, keep only this fraction of the budget verbatim so the next
+# few turns fit without another summarisation call
+FOLD_TARGET_RATIO = 0.5
+
+# Summariser signature: (previous summary or None, turns to fold in) -> new summary
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], Awaitable[str]]
+
+
+class ChatHistoryManager:
+    """
+    Keep chat prompts within a token budget using a rolling summary.
+    
+    The most recent turns are kept verbatim within the budget. Older turns
+    are folded into a summary, which is cached by a hash of the conversation
+    prefix it covers. As a conversation grows, the summary for the longest
+    cached prefix is extended with only the newly folded turns, so each
+    summarisation call sees a bounded amount of text.
+    
+    Folding goes past the minimum needed (down to half the budget). This way
+    the following turns reuse the cached summary instead of summarising on
+    every turn, and per-turn prompt size stays roughly constant.
+    """
+    
+    def __init__(self,
+                 token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+                 cache_size: int = CHAT_SUMMARY_CACHE_SIZE):
+        """Initialize the manager with an empty summary cache."""
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        
+        # prefix hash -> summary of the turns up to that prefix
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        
+        self.counters = {
+            "prepared": 0,
+            "within_budget": 0,
+            "summary_cache_hits": 0,
+            "summaries_generated": 0,
+            "summary_failures": 0,
+            "turns_folded": 0
+        }
+    
+    async def prepare(self,
+                      chat_history: List[Dict[str, str]],
+                      summarize: Summarizer) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Split a chat history into a summary of older turns and recent verbatim turns.
+        
+        Args:
+            chat_history: The full conversation, oldest first
+            summarize: Coroutine that folds new turns into a previous summary
+        
+        Returns:
+            (summary of the folded turns or None, recent turns to send verbatim)
+        """
+        self.counters["prepared"] += 1
+        
+        turn_tokens = [count_tokens(turn.get("content")) + MESSAGE_OVERHEAD_TOKENS for turn in chat_history]
+        required = self._split_for_budget(turn_tokens, self.token_budget)
+        if required == 0:
+            self.counters["within_budget"] += 1
+            return None, chat_history
+        
+        prefix_hashes = self._prefix_hashes(chat_history)
+        
+        # Reuse an earlier fold that already covers enough of the conversation
+        for split in range(len(chat_history), required - 1, -1):
+            summary = self._summaries.get(prefix_hashes[split])
+            if summary is not None:
+                self._summaries.move_to_end(prefix_hashes[split])
+                self.counters["summary_cache_hits"] += 1
+                return summary, chat_history[split:]
+        
+        # Fold further than required so the next turns can reuse this summary
+        target = max(required, self._split_for_budget(turn_tokens, int(self.token_budget * FOLD_TARGET_RATIO)))
+        
+        # Extend the longest cached summary that precedes the target
+        start, previous = 0, None
+        for split in range(target - 1, 0, -1):
+            cached = self._summaries.get(prefix_hashes[split])
+            if cached is not None:
+                start, previous = split, cached
+                break
+        
+        try:
+            summary = await summarize(previous, chat_history[start:target])
+        except Exception as e:
+            # Fall back to plain truncation so the prompt stays bounded
+            print(f"Error summarising chat history: {str(e)}")
+            self.counters["summary_failures"] += 1
+            return previous, chat_history[required:]
+        
+        self.counters["summaries_generated"] += 1
+        self.counters["turns_folded"] += target - start
+        self._remember(prefix_hashes[target], summary)
+        
+        return summary, chat_history[target:]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return summary cache and folding counters."""
+        return {
+            "token_budget": self.token_budget,
+            "cached_summaries": len(self._summaries),
+            **self.counters
+        }
+    
+    @staticmethod
+    def _split_for_budget(turn_tokens: List[int], budget: int) -> int:
+        """Smallest index such that the turns from it onwards fit in the budget."""
+        total = 0
+        for i in range(len(turn_tokens) - 1, -1, -1):
+            total += turn_tokens[i]
+            if total > budget:
+                return i + 1
+        return 0
+    
+    @staticmethod
+    def _prefix_hashes(chat_history: List[Dict[str, str]]) -> List[str]:
+        """Chained hashes where entry k identifies the first k turns."""
+        hashes = [hashlib.sha256(b"").hexdigest()]
+        for turn in chat_history:
+            digest = hashlib.sha256()
+            digest.update(hashes[-1].encode("utf-8"))
+            digest.update(turn.get("role", "").encode("utf-8"))
+            digest.update(b"\x00")
+            digest.update(turn.get("content", "").encode("utf-8"))
+            hashes.append(digest.hexdigest())
+        return hashes
+    
+    def _remember(self, prefix_hash: str, summary: str):
+        """Cache a summary, evicting the least recently used one."""
+        self._summaries[prefix_hash] = summary
+        self._summaries.move_to_end(prefix_hash)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+# Create a singleton instance
+chat_history_manager = ChatHistoryManager()
@@ -0,0 +1,253 @@
+import os
+import time
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    # HTTP/2 support in httpx needs the optional h2 package
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from app.services.llm_metrics import Histogram, SECONDS_BUCKETS
+
+# Load environment variables
+load_dotenv()
+
+# Get upstream HTTP pool configuration from environment variables
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_SYNC_CONNECTIONS = int(os.getenv("LLM_HTTP_SYNC_CONNECTIONS", "5"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+LLM_HTTP_POOL_TIMEOUT = float(os.getenv("LLM_HTTP_POOL_TIMEOUT", "10"))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+
+class PoolStats:
+    """Request counters shared by the sync and async clients."""
+    
+    def __init__(self):
+        """Initialize empty counters."""
+        self.counters = {
+            "requests": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0
+        }
+        self.in_flight_by_client = {"sync": 0, "async": 0}
+        self.http_versions: Dict[str, int] = {}
+        # Time from sending a request to its response headers, including any wait for a connection
+        self.time_to_headers = Histogram(SECONDS_BUCKETS)
+    
+    def started(self, client: str):
+        """Record a request leaving for the upstream through the sync or async client."""
+        self.counters["requests"] += 1
+        self.counters["in_flight"] += 1
+        self.in_flight_by_client[client] += 1
+        self.counters["peak_in_flight"] = max(self.counters["peak_in_flight"], self.counters["in_flight"])
+    
+    def finished(self, client: str, started: float, response: Any = None):
+        """Record response headers arriving, or the request failing when there is no response."""
+        self.counters["in_flight"] -= 1
+        self.in_flight_by_client[client] -= 1
+        if response is None:
+            self.counters["errors"] += 1
+            return
+        self.time_to_headers.observe(time.monotonic() - started)
+        version = getattr(response, "http_version", None) or "unknown"
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+
+if httpx is not None:
+    class _InstrumentedTransport(httpx.BaseTransport):
+        """Sync transport wrapper recording requests in the pool statistics."""
+        
+        def __init__(self, transport: "httpx.HTTPTransport", stats: PoolStats):
+            self.transport = transport
+            self.stats = stats
+        
+        def handle_request(self, request: "httpx.Request") -> "httpx.Response":
+            started = time.monotonic()
+            self.stats.started("sync")
+            response = None
+            try:
+                response = self.transport.handle_request(request)
+                return response
+            finally:
+                self.stats.finished("sync", started, response)
+        
+        def close(self):
+            self.transport.close()
+    
+    class _InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+        """Async transport wrapper recording requests in the pool statistics."""
+        
+        def __init__(self, transport: "httpx.AsyncHTTPTransport", stats: PoolStats):
+            self.transport = transport
+            self.stats = stats
+        
+        async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+            started = time.monotonic()
+            self.stats.started("async")
+            response = None
+            try:
+                response = await self.transport.handle_async_request(request)
+                return response
+            finally:
+                self.stats.finished("async", started, response)
+        
+        async def aclose(self):
+            await self.transport.aclose()
+
+
+class HTTPPool:
+    """
+    Shared keep-alive connection pool for all upstream LLM traffic.
+    
+    ChatGroq and LlamaIndex's Groq LLM are both handed these clients, so TLS
+    handshakes are paid once per connection rather than per client and one
+    set of limits bounds the connections open to the provider. HTTP/2 is used
+    when the h2 package is installed, letting concurrent requests share a
+    connection.
+    
+    LangChain and LlamaIndex call the provider from both sync and async code,
+    so there is one sync and one async client. httpx cannot share a
+    connection limit between them, so the limit is split: the sync client,
+    used by document queries running in worker threads, gets
+    sync_connections and the async client the rest. Each client is created
+    on first use and both report to the same statistics. A worker forked from a process
+    that already created them calls reset, so it never shares their
+    connections or event-loop state with its parent.
+    """
+    
+    def __init__(self,
+                 max_connections: int = LLM_HTTP_MAX_CONNECTIONS,
+                 sync_connections: int = LLM_HTTP_SYNC_CONNECTIONS,
+                 max_keepalive: int = LLM_HTTP_MAX_KEEPALIVE,
+                 keepalive_expiry: float = LLM_HTTP_KEEPALIVE_EXPIRY,
+                 connect_timeout: float = LLM_HTTP_CONNECT_TIMEOUT,
+                 pool_timeout: float = LLM_HTTP_POOL_TIMEOUT,
+                 read_timeout: float = LLM_HTTP_READ_TIMEOUT,
+                 http2: bool = LLM_HTTP2):
+        """Initialize the pool settings; clients are created lazily."""
+        self.max_connections = max_connections
+        # Each client needs at least one connection
+        self.connections = {"sync": max(1, min(sync_connections, max_connections - 1))}
+        self.connections["async"] = max(1, max_connections - self.connections["sync"])
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        
+        if http2 and not HTTP2_AVAILABLE:
+            print("WARNING: h2 is not installed, upstream LLM connections will use HTTP/1.1. Install with: pip install h2")
+        
+        self.stats_data = PoolStats()
+        self._client: Optional[Any] = None
+        self._async_client: Optional[Any] = None
+    
+    @property
+    def available(self) -> bool:
+        """Whether httpx is installed."""
+        return httpx is not None
+    
+    def client(self) -> Any:
+        """Return the shared sync client, or None if httpx is not installed."""
+        if self._client is None and self.available:
+            transport = httpx.HTTPTransport(limits=self._limits("sync"), http2=self.http2)
+            self._client = httpx.Client(
+                transport=_InstrumentedTransport(transport, self.stats_data),
+                timeout=self._timeout()
+            )
+        return self._client
+    
+    def async_client(self) -> Any:
+        """Return the shared async client, or None if httpx is not installed."""
+        if self._async_client is None and self.available:
+            transport = httpx.AsyncHTTPTransport(limits=self._limits("async"), http2=self.http2)
+            self._async_client = httpx.AsyncClient(
+                transport=_InstrumentedAsyncTransport(transport, self.stats_data),
+                timeout=self._timeout()
+            )
+        return self._async_client
+    
+    def reset(self):
+        """
+        Forget clients inherited from a parent process, along with their statistics.
+        
+        The clients are not closed: their connections belong to the parent as
+        well. New clients are created on next use.
+        """
+        self._client = None
+        self._async_client = None
+        self.stats_data = PoolStats()
+    
+    async def aclose(self):
+        """Close both clients and their connections."""
+        try:
+            if self._async_client is not None:
+                await self._async_client.aclose()
+            if self._client is not None:
+                self._client.close()
+        except Exception as e:
+            print(f"Error closing upstream HTTP pool: {str(e)}")
+        finally:
+            self._client = None
+            self._async_client = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return pool limits, request counters and current connection usage."""
+        in_flight = self.stats_data.counters["in_flight"]
+        total = sum(self.connections.values())
+        return {
+            "available": self.available,
+            "http2": self.http2,
+            "limits": {
+                "max_connections": total,
+                "connections_by_client": dict(self.connections),
+                "max_keepalive": self.max_keepalive,
+                "keepalive_expiry": self.keepalive_expiry
+            },
+            "timeouts": {
+                "connect": self.connect_timeout,
+                "pool": self.pool_timeout,
+                "read": self.read_timeout
+            },
+            **self.stats_data.counters,
+            "http_versions": self.stats_data.http_versions,
+            "time_to_headers_seconds": self.stats_data.time_to_headers.summary(),
+            # Each request in flight holds a connection from its client's pool, or a stream of one over HTTP/2
+            "utilisation": in_flight / total,
+            "utilisation_by_client": {
+                client: self.stats_data.in_flight_by_client[client] / connections
+                for client, connections in self.connections.items()
+            }
+        }
+    
+    def _limits(self, client: str) -> Any:
+        """A client's share of the connection limits."""
+        connections = self.connections[client]
+        return httpx.Limits(
+            max_connections=connections,
+            max_keepalive_connections=max(1, round(self.max_keepalive * connections / sum(self.connections.values()))),
+            keepalive_expiry=self.keepalive_expiry
+        )
+    
+    def _timeout(self) -> Any:
+        """Default timeouts; the provider SDKs may override the read timeout per request."""
+        return httpx.Timeout(
+            self.read_timeout,
+            connect=self.connect_timeout,
+            pool=self.pool_timeout
+        )
+
+# Create a singleton instance
+llm_http_pool = HTTPPool()
@@ -1,6 +1,8 @@
 import os
 import json
-from typing import Dict, List, Optional
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
 from dotenv import load_dotenv
 
 # Handle potential import errors with LlamaIndex
@@ -8,7 +10,6 @@ try:
     from llama_index.core import VectorStoreIndex, Document, Settings
     from llama_index.core.storage import StorageContext
     from llama_index.core.vector_stores import SimpleVectorStore
-    from llama_index.llms.groq import Groq
     from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 except ImportError:
     # Fallback to older versions
@@ -16,20 +17,30 @@ except ImportError:
         from llama_index import VectorStoreIndex, Document, Settings
         from llama_index.storage.storage_context import StorageContext
         from llama_index.vector_stores import SimpleVectorStore
-        from llama_index.llms import Groq
         from llama_index.embeddings.huggingface import HuggingFaceEmbedding
     except ImportError:
         print("Warning: Failed to import LlamaIndex modules. Please check your installation.")
 
+from app.services.coalescing import index_load_coalescer
+from app.services.llm_backends import llm_backend
+from app.services.llm_metrics import llm_metrics, call_status
+from app.services.llm_policy import llm_call_policy
+from app.services.llm_scheduler import llm_scheduler, LLM_EXPECTED_COMPLETION_TOKENS
+from app.services.token_counter import count_tokens
+
 # Load environment variables
 load_dotenv()
 
 # Get environment variables
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
 INDICES_DIR = os.path.join(OUTPUT_DIR, "indices")
 
+# Number of document chunks retrieved per query
+SIMILARITY_TOP_K = 3
+
+# Approximate size of LlamaIndex's question-answering prompt template around the context and query
+QA_TEMPLATE_TOKENS = 60
+
 # Ensure the indices directory exists
 os.makedirs(INDICES_DIR, exist_ok=True)
 
@@ -68,15 +79,8 @@ class IndexService:
                     print(f"Error initializing embedding model with manual approach: {str(e2)}")
                     self.embed_model = None
                 
-            # Initialize LLM
-            try:
-                self.llm = Groq(
-                    api_key=GROQ_API_KEY,
-                    model=MODEL_NAME
-                )
-            except Exception as e:
-                print(f"Error initializing Groq: {str(e)}")
-                self.llm = None
+            # Initialize LLM from the shared backend so document queries use the same provider
+            self.llm = llm_backend.llama_index_llm()
             
             # Update global settings
             Settings.embed_model = self.embed_model
@@ -168,11 +172,57 @@ class IndexService:
         if file_id in self.indices:
             return self.indices[file_id]
         
+        # Concurrent requests for the same index share one load
+        return await index_load_coalescer.do(file_id, lambda: self._load_index_from_disk(file_id))
+    
+    async def _load_index_from_disk(self, file_id: str) -> Optional[VectorStoreIndex]:
+        """Load an index from disk in a worker thread and keep it in memory."""
         # Check if index exists on disk
         index_dir = os.path.join(INDICES_DIR, file_id)
         if not os.path.exists(index_dir):
             return None
         
+        # Parsing the persisted stores is blocking, so keep it off the event loop
+        index = await asyncio.to_thread(self._read_index, index_dir)
+        
+        if index is not None:
+            # Store in memory
+            self.indices[file_id] = index
+        
+        return index
+    
+    def preload_indices(self) -> int:
+        """
+        Load every persisted index into memory synchronously.
+        
+        Used by the production server before it forks its workers, so the
+        indices are read once and shared by all workers copy-on-write
+        instead of being loaded again in each of them.
+        
+        Returns:
+            The number of indices in memory
+        """
+        for file_id in sorted(os.listdir(INDICES_DIR)):
+            index_dir = os.path.join(INDICES_DIR, file_id)
+            if file_id in self.indices or not os.path.isdir(index_dir):
+                continue
+            index = self._read_index(index_dir)
+            if index is not None:
+                self.indices[file_id] = index
+        return len(self.indices)
+    
+    def reset_llm(self):
+        """Recreate the LlamaIndex LLM in a forked worker, so it does not share the parent's HTTP clients."""
+        if self.llm is None:
+            return
+        try:
+            self.llm = llm_backend.llama_index_llm()
+            Settings.llm = self.llm
+        except Exception as e:
+            print(f"Error resetting the document query LLM: {str(e)}")
+    
+    def _read_index(self, index_dir: str) -> Optional[VectorStoreIndex]:
+        """Read a persisted index, trying the loaders of different LlamaIndex versions."""
         try:
             # Load from disk
             storage_context = StorageContext.from_defaults(
@@ -204,9 +254,6 @@ class IndexService:
                         print(f"All index loading methods failed: {str(e)}")
                         return None
             
-            # Store in memory
-            self.indices[file_id] = index
-            
             return index
         except Exception as e:
             print(f"Error loading index: {str(e)}")
@@ -216,6 +263,10 @@ class IndexService:
         """
         Query a document index.
         
+        The query runs under the LLM call policy (deadline and retries) and
+        the scheduler, like every other LLM call. It is not model-routed:
+        LlamaIndex answers with the single LLM configured in its settings.
+        
         Args:
             file_id: The unique identifier of the document
             query: The search query
@@ -231,11 +282,15 @@ class IndexService:
         try:
             # Create a query engine
             query_engine = index.as_query_engine(
-                similarity_top_k=3
+                similarity_top_k=SIMILARITY_TOP_K
             )
             
-            # Execute the query
-            response = query_engine.query(query)
+            # A timed-out query keeps running in its thread, so it is not retried
+            response = await llm_call_policy.call(
+                lambda timeout: self._query_once(query_engine, query, timeout),
+                can_hedge=lambda: llm_scheduler.queue_depth() == 0,
+                retry_timeouts=False
+            )
             
             # Format the response
             result = {
@@ -256,6 +311,186 @@ class IndexService:
             print(f"Error querying document: {str(e)}")
             return {"error": f"Failed to query document: {str(e)}"}
     
+    async def stream_query_document(self, file_id: str, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query a document index, streaming the answer as it is generated.
+        
+        The retrieved sources are emitted before any answer text so clients can
+        render them while the LLM is still generating. Opening the stream is
+        retried under the LLM call policy, except after a timeout, and each
+        token must arrive within its deadline; once text has been sent
+        nothing is retried. The scheduler slot is held until the answer has
+        finished streaming, and past that until any worker thread still
+        reading from upstream returns.
+        
+        Args:
+            file_id: The unique identifier of the document
+            query: The search query
+        
+        Yields:
+            Events of the form {"type": "sources", "sources": [...]},
+            {"type": "token", "text": "..."} or {"type": "error", "error": "..."}
+        """
+        # Load the index
+        index = await self.load_index(file_id)
+        if not index:
+            yield {"type": "error", "error": f"No index found for document {file_id}"}
+            return
+        
+        try:
+            # Create a streaming query engine
+            query_engine = index.as_query_engine(
+                similarity_top_k=SIMILARITY_TOP_K,
+                streaming=True
+            )
+            
+            waited = await llm_scheduler.acquire("document_qa", self._estimate_query_tokens(query))
+            work = None
+            
+            def in_thread(fn: Any, *args: Any) -> "asyncio.Future[Any]":
+                nonlocal work
+                work = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+                return work
+            
+            try:
+                started = time.monotonic()
+                response = None
+                token_gen = None
+                answer = ""
+                first_token_at = None
+                status = "ok"
+                try:
+                    # Retrieval runs synchronously; keep it off the event loop. A hedge
+                    # would open a second stream, and a timed-out attempt is still
+                    # running, so only retries after errors are allowed here
+                    response = await llm_call_policy.call(
+                        lambda timeout: asyncio.wait_for(asyncio.shield(in_thread(query_engine.query, query)), timeout=timeout),
+                        can_hedge=lambda: False,
+                        retry_timeouts=False
+                    )
+                    
+                    sources = []
+                    if hasattr(response, "source_nodes"):
+                        for source_node in response.source_nodes:
+                            sources.append({
+                                "text": source_node.node.text,
+                                "score": source_node.score if hasattr(source_node, "score") else None
+                            })
+                    yield {"type": "sources", "sources": sources}
+                    
+                    # The token generator blocks on the network, so pull each token in a worker thread
+                    token_gen = response.response_gen
+                    while True:
+                        token = await asyncio.wait_for(
+                            asyncio.shield(in_thread(next, token_gen, None)), timeout=llm_call_policy.timeout
+                        )
+                        if token is None:
+                            break
+                        if token:
+                            if first_token_at is None:
+                                first_token_at = time.monotonic()
+                            answer += token
+                            yield {"type": "token", "text": token}
+                except BaseException as e:
+                    status = call_status(e)
+                    raise
+                finally:
+                    # Closing the generator closes the upstream stream when the client disconnects
+                    self._close_generator(token_gen)
+                    self._record_query(waited, started, query, response, answer, status,
+                                       first_token_at=first_token_at, streaming=True)
+            finally:
+                self._release_after(work)
+        except Exception as e:
+            print(f"Error streaming document query: {str(e)}")
+            yield {"type": "error", "error": f"Failed to query document: {str(e)}"}
+    
+    async def _query_once(self, query_engine: Any, query: str, timeout: float) -> Any:
+        """
+        Run one query attempt once the scheduler grants a slot, recording its metrics.
+        
+        The query runs in a worker thread, which cannot be stopped. If the
+        attempt times out or is cancelled the thread carries on calling
+        upstream, so the slot is released only once it returns.
+        """
+        waited = await llm_scheduler.acquire("document_qa", self._estimate_query_tokens(query))
+        started = time.monotonic()
+        work = asyncio.ensure_future(asyncio.to_thread(query_engine.query, query))
+        try:
+            response = await asyncio.wait_for(asyncio.shield(work), timeout=timeout)
+        except BaseException as e:
+            self._record_query(waited, started, query, None, "", call_status(e))
+            raise
+        finally:
+            self._release_after(work)
+        
+        self._record_query(waited, started, query, response, response.response)
+        return response
+    
+    def _release_after(self, work: Optional["asyncio.Future[Any]"]):
+        """Release the scheduler slot now, or once a worker thread still calling upstream returns."""
+        if work is None or work.done():
+            llm_scheduler.release()
+            return
+        
+        def release(finished: "asyncio.Future[Any]"):
+            # Retrieve the outcome so an abandoned failure is not reported as unhandled
+            if not finished.cancelled():
+                finished.exception()
+            llm_scheduler.release()
+        
+        work.add_done_callback(release)
+    
+    def _close_generator(self, token_gen: Any):
+        """Close a LlamaIndex token generator, unless a worker thread is still reading from it."""
+        if token_gen is None or not hasattr(token_gen, "close"):
+            return
+        try:
+            token_gen.close()
+        except ValueError:
+            # A timed-out or cancelled read is still running; the generator ends with its stream
+            pass
+    
+    def _record_query(self, 
+                      queue_wait: float, 
+                      started: float, 
+                      query: str, 
+                      response: Any, 
+                      answer: str, 
+                      status: str = "ok", 
+                      first_token_at: Optional[float] = None, 
+                      streaming: bool = False):
+        """
+        Record LLM metrics for a document query.
+        
+        LlamaIndex does not report token usage, so the prompt is estimated from
+        the query, the retrieved chunks and the template, and the completion is
+        counted from the answer. Latency includes retrieval.
+        """
+        source_nodes = getattr(response, "source_nodes", None) or []
+        prompt_tokens = (
+            count_tokens(query)
+            + sum(count_tokens(source_node.node.text) for source_node in source_nodes)
+            + QA_TEMPLATE_TOKENS
+        )
+        
+        llm_metrics.record(
+            "document_qa",
+            llm_backend.model_name,
+            queue_wait,
+            time.monotonic() - started,
+            prompt_tokens,
+            count_tokens(answer or ""),
+            ttft=first_token_at - started if first_token_at is not None else None,
+            status=status,
+            streaming=streaming
+        )
+    
+    def _estimate_query_tokens(self, query: str) -> int:
+        """Estimate the tokens a retrieval-augmented query sends and receives."""
+        chunk_size = getattr(Settings, "chunk_size", None) or 1024
+        return count_tokens(query) + SIMILARITY_TOP_K * chunk_size + LLM_EXPECTED_COMPLETION_TOKENS
+    
     async def get_all_indexed_documents(self) -> List[str]:
         """
         Get a list of all indexed documents.
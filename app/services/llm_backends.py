@@ -0,0 +1,492 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+try:
+    # Try importing from langchain_groq (underscore) first
+    from langchain_groq import ChatGroq
+except ImportError:
+    try:
+        # Fallback to hyphenated import if underscore version fails
+        from langchain.chat_models import ChatGroq
+    except ImportError:
+        ChatGroq = None
+
+from app.services.http_pool import llm_http_pool
+
+# Load environment variables
+load_dotenv()
+
+# Get backend configuration from environment variables
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODEL_NAME = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+SMALL_MODEL_NAME = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+
+# Fake backend behaviour, for load testing and offline runs
+FAKE_LLM_TTFT_SECONDS = float(os.getenv("FAKE_LLM_TTFT_SECONDS", "0.3"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RESPONSE_WORDS = int(os.getenv("FAKE_LLM_RESPONSE_WORDS", "120"))
+FAKE_LLM_SMALL_SPEEDUP = float(os.getenv("FAKE_LLM_SMALL_SPEEDUP", "3"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+FAKE_LLM_RESPONSES_FILE = os.getenv("FAKE_LLM_RESPONSES_FILE", "")
+
+
+class LLMBackend(ABC):
+    """
+    Interface between the LLM-backed services and a model provider.
+    
+    Messages are LangChain-style objects exposing `type` ("system", "human",
+    "ai") and `content`. Calls use the large model unless another model is
+    named, which lets the router send simple work to the small model.
+    `llama_index_llm` returns the LLM LlamaIndex should use for document
+    queries, so both services talk to the same provider.
+    """
+    
+    name = "base"
+    
+    def __init__(self, model_name: str, small_model_name: str):
+        """Initialize the backend for a large and a small model."""
+        self.model_name = model_name
+        self.small_model_name = small_model_name
+    
+    @property
+    def available(self) -> bool:
+        """Whether the backend can serve requests."""
+        return True
+    
+    @abstractmethod
+    async def complete(self, messages: List[Any], model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate a full response for the messages.
+        
+        Returns:
+            {"text": ..., "prompt_tokens": ..., "completion_tokens": ...}, with
+            token counts as reported by the provider or None if not reported
+        """
+    
+    @abstractmethod
+    def stream(self, messages: List[Any], model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield response text chunks as they are generated; implemented as an async generator."""
+    
+    def llama_index_llm(self) -> Any:
+        """Return a LlamaIndex LLM for this backend, or None if unavailable."""
+        return None
+    
+    def reset_clients(self):
+        """Recreate provider clients in a forked worker, so none is shared with the parent."""
+
+
+class ModelUnavailableError(Exception):
+    """Raised when no client could be created for a requested model."""
+
+
+class GroqBackend(LLMBackend):
+    """Backend calling the Groq API through LangChain's ChatGroq, over the shared HTTP pool."""
+    
+    name = "groq"
+    
+    def __init__(self, 
+                 model_name: str = MODEL_NAME, 
+                 small_model_name: str = SMALL_MODEL_NAME, 
+                 api_key: Optional[str] = GROQ_API_KEY):
+        """Initialize the ChatGroq client for the large model; other models are created on first use."""
+        super().__init__(model_name, small_model_name)
+        self.api_key = api_key
+        self._clients: Dict[str, Any] = {}
+        
+        if not ChatGroq:
+            print("ERROR: Could not import ChatGroq. Please install with:")
+            print("pip install git+https://github.com/langchain-ai/langchain.git@master#subdirectory=libs/partners/groq")
+            self.client = None
+            return
+        
+        try:
+            self.client = self._client_for(model_name)
+        except ModelUnavailableError:
+            # Leave the backend unavailable; each call then fails with LLMUnavailableError
+            self.client = None
+            print("WARNING: LLM initialization failed. Functions requiring LLM will not work.")
+    
+    @property
+    def available(self) -> bool:
+        """Whether the ChatGroq client was initialised."""
+        return self.client is not None
+    
+    async def complete(self, messages: List[Any], model: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a full response with ChatGroq, including the reported token usage."""
+        response = await self._client_for(model or self.model_name).ainvoke(messages)
+        
+        # Newer LangChain versions report usage_metadata, older ones only the raw token_usage
+        usage = getattr(response, "usage_metadata", None) or {}
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        return {
+            "text": response.content,
+            "prompt_tokens": usage.get("input_tokens", token_usage.get("prompt_tokens")),
+            "completion_tokens": usage.get("output_tokens", token_usage.get("completion_tokens"))
+        }
+    
+    async def stream(self, messages: List[Any], model: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response with ChatGroq."""
+        async for chunk in self._client_for(model or self.model_name).astream(messages):
+            if chunk.content:
+                yield chunk.content
+    
+    def reset_clients(self):
+        """Recreate the ChatGroq clients, which hold the HTTP clients of the process that created them."""
+        if self.client is None:
+            return
+        self._clients = {}
+        try:
+            self.client = self._client_for(self.model_name)
+        except ModelUnavailableError:
+            self.client = None
+            print("WARNING: LLM initialization failed. Functions requiring LLM will not work.")
+    
+    def _client_for(self, model: str) -> Any:
+        """Return the ChatGroq client for a model, creating it on first use."""
+        if model not in self._clients:
+            client = self._create_client(model)
+            if client is None:
+                raise ModelUnavailableError(f"Could not initialise a client for model {model}")
+            self._clients[model] = client
+        return self._clients[model]
+    
+    def _create_client(self, model: str) -> Any:
+        """Create a ChatGroq client, trying the parameter names of different versions."""
+        if llm_http_pool.available:
+            try:
+                # Share the pooled connections with every other upstream client
+                return ChatGroq(
+                    api_key=self.api_key,
+                    model=model,
+                    http_client=llm_http_pool.client(),
+                    http_async_client=llm_http_pool.async_client()
+                )
+            except Exception as e:
+                print(f"Error initializing ChatGroq with the shared HTTP pool: {str(e)}")
+        
+        # Use a try-except block for each possible parameter combination
+        try:
+            # Try with minimal parameters first
+            return ChatGroq(api_key=self.api_key, model=model)
+        except Exception as e1:
+            print(f"Error with primary initialization method: {str(e1)}")
+            try:
+                # Try with groq_api_key instead
+                return ChatGroq(groq_api_key=self.api_key, model=model)
+            except Exception as e2:
+                print(f"Error with secondary initialization method: {str(e2)}")
+                try:
+                    # Try with model_name instead of model
+                    return ChatGroq(api_key=self.api_key, model_name=model)
+                except Exception as e3:
+                    print(f"Error with tertiary initialization method: {str(e3)}")
+                    if model != self.model_name:
+                        return None
+                    try:
+                        # Final attempt with minimal possible parameters
+                        return ChatGroq()
+                    except Exception as e4:
+                        print(f"All initialization methods failed: {str(e4)}")
+                        return None
+    
+    def llama_index_llm(self) -> Any:
+        """Return LlamaIndex's Groq LLM for the same model, on the shared HTTP pool."""
+        try:
+            try:
+                from llama_index.llms.groq import Groq
+            except ImportError:
+                # Fallback to older versions
+                from llama_index.llms import Groq
+            if llm_http_pool.available:
+                try:
+                    return Groq(
+                        api_key=self.api_key,
+                        model=self.model_name,
+                        http_client=llm_http_pool.client(),
+                        async_http_client=llm_http_pool.async_client()
+                    )
+                except Exception as e:
+                    # Older versions do not accept custom HTTP clients
+                    print(f"Error initializing Groq with the shared HTTP pool: {str(e)}")
+            return Groq(api_key=self.api_key, model=self.model_name)
+        except Exception as e:
+            print(f"Error initializing Groq: {str(e)}")
+            return None
+
+
+class FakeLLMError(Exception):
+    """Injected upstream failure; carries a status code so it is treated as retryable."""
+    
+    status_code = 503
+
+
+class FakeBackend(LLMBackend):
+    """
+    Local, deterministic stand-in for the upstream LLM.
+    
+    The response text depends only on the seed and the messages, so repeated
+    runs produce identical output. Quiz prompts get a valid JSON array with
+    the requested number of questions, summary prompts a short summary, and
+    other prompts either a canned response (first matching entry of
+    FAKE_LLM_RESPONSES_FILE, a JSON list of {"match", "response"} objects) or
+    a templated answer.
+    
+    Latency is simulated as a time to first token followed by a fixed token
+    rate, both faster by a configurable factor for the small model, and a
+    configurable fraction of calls fail before producing output.
+    The failure sequence is drawn from a seeded generator, so it is also
+    reproducible across runs.
+    """
+    
+    name = "fake"
+    
+    def __init__(self,
+                 model_name: str = "fake",
+                 small_model_name: str = "fake-small",
+                 ttft_seconds: float = FAKE_LLM_TTFT_SECONDS,
+                 tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+                 small_speedup: float = FAKE_LLM_SMALL_SPEEDUP,
+                 error_rate: float = FAKE_LLM_ERROR_RATE,
+                 response_words: int = FAKE_LLM_RESPONSE_WORDS,
+                 seed: int = FAKE_LLM_SEED,
+                 responses_file: str = FAKE_LLM_RESPONSES_FILE):
+        """Initialize the fake with its latency, error and response settings."""
+        super().__init__(model_name, small_model_name)
+        self.ttft_seconds = ttft_seconds
+        self.tokens_per_second = tokens_per_second
+        self.small_speedup = small_speedup
+        self.error_rate = error_rate
+        self.response_words = response_words
+        self.seed = seed
+        
+        self._error_rng = random.Random(seed)
+        self.canned_responses: List[Tuple[str, str]] = []
+        
+        if responses_file:
+            try:
+                with open(responses_file, "r", encoding="utf-8") as f:
+                    self.canned_responses = [(entry["match"].lower(), entry["response"]) for entry in json.load(f)]
+            except Exception as e:
+                print(f"Error loading fake LLM responses: {str(e)}")
+    
+    async def complete(self, messages: List[Any], model: Optional[str] = None) -> Dict[str, Any]:
+        """Return the full response after the simulated generation time."""
+        tokens = self._begin(messages)
+        ttft, token_interval = self._timing(model)
+        await asyncio.sleep(ttft + len(tokens) * token_interval)
+        return {"text": "".join(tokens), "prompt_tokens": None, "completion_tokens": len(tokens)}
+    
+    async def stream(self, messages: List[Any], model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the response token by token at the simulated rate."""
+        tokens = self._begin(messages)
+        ttft, token_interval = self._timing(model)
+        await asyncio.sleep(ttft)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(token_interval)
+            yield token
+    
+    def complete_sync(self, prompt: str) -> str:
+        """Blocking variant of complete, for LlamaIndex query engines running in worker threads."""
+        tokens = self._begin([_PromptMessage(prompt)])
+        time.sleep(self.ttft_seconds + len(tokens) / self.tokens_per_second)
+        return "".join(tokens)
+    
+    def stream_sync(self, prompt: str) -> Iterator[str]:
+        """Blocking variant of stream, for LlamaIndex query engines running in worker threads."""
+        tokens = self._begin([_PromptMessage(prompt)])
+        time.sleep(self.ttft_seconds)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            yield token
+    
+    def llama_index_llm(self) -> Any:
+        """Return a LlamaIndex LLM backed by this fake."""
+        try:
+            return _fake_llama_index_llm(self)
+        except Exception as e:
+            print(f"Error initializing fake LlamaIndex LLM: {str(e)}")
+            return None
+    
+    def respond(self, messages: List[Any]) -> str:
+        """Produce the deterministic response text for the messages."""
+        system = "\n".join(message.content for message in messages if message.type == "system")
+        prompt = messages[-1].content if messages else ""
+        rng = random.Random(self._digest(messages))
+        
+        lowered = prompt.lower()
+        for match, response in self.canned_responses:
+            if match in lowered:
+                return response
+        
+        if "quiz questions" in lowered and "json" in lowered:
+            return self._quiz_response(prompt, rng)
+        if "summar" in system.lower():
+            return self._summary_response(prompt, rng)
+        return self._answer_response(prompt, rng)
+    
+    def _timing(self, model: Optional[str]) -> Tuple[float, float]:
+        """Time to first token and seconds per token for a model."""
+        speedup = self.small_speedup if model == self.small_model_name else 1.0
+        return self.ttft_seconds / speedup, 1 / (self.tokens_per_second * speedup)
+    
+    def _begin(self, messages: List[Any]) -> List[str]:
+        """Decide whether this call fails, then tokenize its response."""
+        if self.error_rate > 0 and self._error_rng.random() < self.error_rate:
+            raise FakeLLMError("Simulated upstream failure from the fake LLM backend")
+        return re.findall(r"\S+\s*", self.respond(messages))
+    
+    def _digest(self, messages: List[Any]) -> int:
+        """Seed for the response generator, derived from the seed and the messages."""
+        digest = hashlib.sha256(str(self.seed).encode("utf-8"))
+        for message in messages:
+            digest.update(message.type.encode("utf-8"))
+            digest.update(b"\x00")
+            digest.update(message.content.encode("utf-8"))
+        return int.from_bytes(digest.digest()[:8], "big")
+    
+    def _quiz_response(self, prompt: str, rng: random.Random) -> str:
+        """A valid JSON array of multiple-choice questions, as the quiz prompt requests."""
+        match = re.search(r"Generate (\d+) (\w+)-difficulty", prompt)
+        count = int(match.group(1)) if match else 5
+        difficulty = match.group(2) if match else "medium"
+        content = re.search(r"Content:(.*?)(?:Format each|$)", prompt, re.S)
+        topics = _topics(content.group(1) if content else prompt, rng, count)
+        
+        questions = []
+        for i, topic in enumerate(topics, start=1):
+            correct = rng.choice("ABCD")
+            questions.append({
+                "question": f"Question {i} ({difficulty}): Which statement about {topic} is correct?",
+                "options": [
+                    f"{letter}. {'The correct' if letter == correct else 'An incorrect'} statement about {topic}"
+                    for letter in "ABCD"
+                ],
+                "correct_answer": correct,
+                "explanation": f"Option {correct} reflects the position on {topic} described in the source material."
+            })
+        
+        return json.dumps(questions, indent=2)
+    
+    def _summary_response(self, prompt: str, rng: random.Random) -> str:
+        """A short summary naming a few topics from the conversation."""
+        turns = re.search(r"New conversation turns:(.*?)(?:Write an updated|$)", prompt, re.S)
+        topics = _topics(turns.group(1) if turns else prompt, rng, 3)
+        return f"The student and tutor discussed {', '.join(topics)}. The student asked follow-up questions on {topics[-1]}."
+    
+    def _answer_response(self, prompt: str, rng: random.Random) -> str:
+        """A templated tutor answer of the configured length."""
+        # LlamaIndex wraps the question in a context template ending in "Query: ..."
+        query = re.search(r"Query:\s*(.+)", prompt)
+        subject = " ".join((query.group(1) if query else prompt).split()[:12])
+        words = f"This is a simulated answer to: {subject}.".split()
+        while len(words) < self.response_words:
+            words.extend(rng.choice(_ANSWER_SENTENCES).split())
+        return " ".join(words[:self.response_words])
+
+
+class _PromptMessage:
+    """Minimal message wrapper for prompts coming from LlamaIndex."""
+    
+    type = "human"
+    
+    def __init__(self, content: str):
+        self.content = content
+
+
+# Sentences the fake backend assembles templated answers from
+_ANSWER_SENTENCES = [
+    "Under the Constitution of India, fundamental rights are enforceable against the State.",
+    "Article 21 has been read broadly by the Supreme Court to include the right to live with dignity.",
+    "The Indian Penal Code defines offences together with their punishments.",
+    "Courts apply the principle of natural justice, including the rule against bias.",
+    "A valid contract under the Indian Contract Act requires free consent and lawful consideration.",
+    "Precedents of the Supreme Court are binding on all courts within India under Article 141.",
+    "The burden of proof generally lies on the party who asserts a fact.",
+    "Statutory interpretation begins with the plain meaning of the words used."
+]
+
+# Fallback topics when a prompt offers too few distinctive words
+_DEFAULT_TOPICS = [
+    "fundamental rights", "criminal liability", "contract formation", "judicial review",
+    "the law of torts", "constitutional remedies", "statutory interpretation", "due process"
+]
+
+
+# Words that appear in the prompts themselves rather than the material
+_STOP_WORDS = {"student", "between", "conversation", "question", "questions", "following", "content"}
+
+
+def _topics(text: str, rng: random.Random, count: int) -> List[str]:
+    """Pick distinctive words from the text as topics, padding with defaults."""
+    words = sorted({word.lower() for word in re.findall(r"[A-Za-z]{7,}", text)} - _STOP_WORDS)
+    rng.shuffle(words)
+    topics = words[:count]
+    while len(topics) < count:
+        topics.append(_DEFAULT_TOPICS[len(topics) % len(_DEFAULT_TOPICS)])
+    return topics
+
+
+def _fake_llama_index_llm(backend: FakeBackend) -> Any:
+    """Build a LlamaIndex CustomLLM delegating to the fake backend."""
+    # Imported here so the fake backend works without LlamaIndex installed
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+    from llama_index.core.llms.callbacks import llm_completion_callback
+    
+    class FakeLlamaIndexLLM(CustomLLM):
+        """LlamaIndex LLM serving responses from the fake backend."""
+        
+        _backend: Any = PrivateAttr()
+        
+        def __init__(self, fake: FakeBackend):
+            super().__init__()
+            self._backend = fake
+        
+        @property
+        def metadata(self) -> LLMMetadata:
+            return LLMMetadata(model_name=self._backend.model_name)
+        
+        @llm_completion_callback()
+        def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+            return CompletionResponse(text=self._backend.complete_sync(prompt))
+        
+        @llm_completion_callback()
+        def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+            text = ""
+            for token in self._backend.stream_sync(prompt):
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+    
+    return FakeLlamaIndexLLM(backend)
+
+
+def create_llm_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """
+    Create the backend selected by LLM_BACKEND.
+    
+    Args:
+        name: "groq" (default) or "fake"
+    
+    Returns:
+        The LLM backend
+    """
+    if name == "fake":
+        print("Using the fake LLM backend; responses are simulated.")
+        return FakeBackend()
+    if name != "groq":
+        print(f"Unknown LLM_BACKEND '{name}', falling back to groq")
+    return GroqBackend()
+
+# Create a singleton instance
+llm_backend = create_llm_backend()
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import random
+import asyncio
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get instrumentation configuration from environment variables
+LLM_METRICS_SAMPLE_LOG = os.getenv("LLM_METRICS_SAMPLE_LOG", "")
+LLM_METRICS_SAMPLE_RATE = float(os.getenv("LLM_METRICS_SAMPLE_RATE", "1.0"))
+LLM_PRICING_JSON = os.getenv("LLM_PRICING_JSON", "")
+
+# USD per million prompt and completion tokens, overridable with LLM_PRICING_JSON
+DEFAULT_PRICING = {
+    "llama-3.3-70b-versatile": [0.59, 0.79],
+    "llama-3.1-8b-instant": [0.05, 0.08],
+    "fake": [0.0, 0.0],
+    "fake-small": [0.0, 0.0]
+}
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+TOKEN_BUCKETS = [64, 128, 256, 512, 1024, 2048, 4096, 8192]
+
+
+def call_status(error: BaseException) -> str:
+    """Classify why an upstream call ended without a response."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        # Cancelled hedges and abandoned streams still consumed upstream capacity
+        return "cancelled"
+    return "error"
+
+
+def load_pricing() -> Dict[str, List[float]]:
+    """Return the per-model pricing table, merged with any LLM_PRICING_JSON override."""
+    pricing = dict(DEFAULT_PRICING)
+    if LLM_PRICING_JSON:
+        try:
+            pricing.update(json.loads(LLM_PRICING_JSON))
+        except json.JSONDecodeError as e:
+            print(f"Error parsing LLM_PRICING_JSON: {str(e)}")
+    return pricing
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate percentiles."""
+    
+    def __init__(self, buckets: List[float]):
+        """Initialize empty buckets; the last bucket catches everything above the bounds."""
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        """Record a value."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+    
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (the maximum for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return count, sum, mean, percentiles and cumulative bucket counts."""
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.bounds + ["+Inf"], self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": buckets
+        }
+
+
+class CallStats:
+    """Counters and histograms for calls sharing a feature and model."""
+    
+    def __init__(self):
+        """Initialize empty aggregates."""
+        self.counters = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "streamed": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
+        self.cost_usd = 0.0
+        self.queue_wait = Histogram(SECONDS_BUCKETS)
+        self.ttft = Histogram(SECONDS_BUCKETS)
+        self.latency = Histogram(SECONDS_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+
+class LLMMetrics:
+    """
+    Per-call instrumentation for upstream LLM requests.
+    
+    Every attempt sent upstream (including retries and hedges, which are paid
+    for too) is recorded with its queue wait, time to first token, latency,
+    token counts and cost, aggregated by calling feature and model. A
+    fraction of calls can also be appended to a JSONL sample log for offline
+    analysis.
+    """
+    
+    def __init__(self,
+                 sample_log: str = LLM_METRICS_SAMPLE_LOG,
+                 sample_rate: float = LLM_METRICS_SAMPLE_RATE):
+        """Initialize empty aggregates and the pricing table."""
+        self.sample_log = sample_log
+        self.sample_rate = sample_rate
+        self.pricing = load_pricing()
+        self.started_at = time.time()
+        self._stats: Dict[Tuple[str, str], CallStats] = {}
+        self._log_file = None
+        self.samples_written = 0
+    
+    def record(self,
+               feature: str,
+               model: str,
+               queue_wait: float,
+               latency: float,
+               prompt_tokens: int,
+               completion_tokens: int,
+               ttft: Optional[float] = None,
+               status: str = "ok",
+               streaming: bool = False):
+        """
+        Record one upstream call.
+        
+        Args:
+            feature: The calling feature (qa, chat, explanation, quiz, ...)
+            model: Model that served the call
+            queue_wait: Seconds spent waiting for a scheduler slot
+            latency: Seconds from sending the request to the last byte or failure
+            prompt_tokens: Tokens sent
+            completion_tokens: Tokens received
+            ttft: Seconds to the first streamed token, for streaming calls
+            status: "ok", "error", "timeout" or "cancelled"
+            streaming: Whether the response was streamed
+        """
+        stats = self._stats.get((feature, model))
+        if stats is None:
+            stats = self._stats[(feature, model)] = CallStats()
+        
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        
+        stats.counters["calls"] += 1
+        if status == "timeout":
+            stats.counters["timeouts"] += 1
+        elif status == "cancelled":
+            stats.counters["cancelled"] += 1
+        elif status != "ok":
+            stats.counters["errors"] += 1
+        if streaming:
+            stats.counters["streamed"] += 1
+        stats.counters["prompt_tokens"] += prompt_tokens
+        stats.counters["completion_tokens"] += completion_tokens
+        stats.cost_usd += cost
+        
+        stats.queue_wait.observe(queue_wait)
+        stats.latency.observe(latency)
+        if ttft is not None:
+            stats.ttft.observe(ttft)
+        stats.prompt_tokens.observe(prompt_tokens)
+        stats.completion_tokens.observe(completion_tokens)
+        
+        if self.sample_log and random.random() < self.sample_rate:
+            self._write_sample({
+                "timestamp": time.time(),
+                "feature": feature,
+                "model": model,
+                "status": status,
+                "streaming": streaming,
+                "queue_wait": round(queue_wait, 6),
+                "ttft": round(ttft, 6) if ttft is not None else None,
+                "latency": round(latency, 6),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": cost
+            })
+    
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Cost in USD of a call, or 0 for models without pricing."""
+        prompt_price, completion_price = self.pricing.get(model, [0.0, 0.0])
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return totals and per feature and model aggregates."""
+        totals = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost_usd": 0.0
+        }
+        breakdown = []
+        
+        for (feature, model), stats in sorted(self._stats.items()):
+            for name in ("calls", "errors", "timeouts", "cancelled", "prompt_tokens", "completion_tokens"):
+                totals[name] += stats.counters[name]
+            totals["cost_usd"] += stats.cost_usd
+            
+            breakdown.append({
+                "feature": feature,
+                "model": model,
+                **stats.counters,
+                "cost_usd": round(stats.cost_usd, 6),
+                "queue_wait_seconds": stats.queue_wait.summary(),
+                "ttft_seconds": stats.ttft.summary(),
+                "latency_seconds": stats.latency.summary(),
+                "prompt_tokens_per_call": stats.prompt_tokens.summary(),
+                "completion_tokens_per_call": stats.completion_tokens.summary()
+            })
+        
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        
+        return {
+            "since": self.started_at,
+            "totals": totals,
+            "by_feature_model": breakdown,
+            "sample_log": self.sample_log or None,
+            "samples_written": self.samples_written
+        }
+    
+    def _write_sample(self, sample: Dict[str, Any]):
+        """Append a call sample to the JSONL log."""
+        try:
+            if self._log_file is None:
+                log_dir = os.path.dirname(self.sample_log)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                # Line buffered, so each sample reaches the file without an explicit flush
+                self._log_file = open(self.sample_log, "a", encoding="utf-8", buffering=1)
+            self._log_file.write(json.dumps(sample) + "\n")
+            self.samples_written += 1
+        except Exception as e:
+            print(f"Error writing LLM metrics sample: {str(e)}")
+
+# Create a singleton instance
+llm_metrics = LLMMetrics()
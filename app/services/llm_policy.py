@@ -0,0 +1,310 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get retry, deadline and hedging configuration from environment variables
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Exception class names raised by the Groq / OpenAI-compatible clients for transient failures
+RETRYABLE_ERROR_NAMES = (
+    "RateLimitError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError"
+)
+
+T = TypeVar("T")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """Extract an HTTP status code from a client exception, if it carries one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Decide whether an upstream failure is transient and worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Read a Retry-After header (in seconds) from a rate-limit error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyWindow:
+    """Rolling window of latencies with percentile lookups."""
+    
+    def __init__(self, size: int = 1000):
+        """Initialize an empty window."""
+        self._samples: Deque[float] = deque(maxlen=size)
+    
+    def add(self, latency: float):
+        """Record a latency in seconds."""
+        self._samples.append(latency)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def percentile(self, p: float) -> float:
+        """Return the p-th percentile, or 0 for an empty window."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    
+    def summary(self) -> Dict[str, float]:
+        """Return p50, p95 and p99."""
+        return {
+            "count": len(self._samples),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+
+
+class CallPolicy:
+    """
+    Deadline, retry and hedging policy for upstream LLM calls.
+    
+    Every attempt runs under a deadline. Retryable failures are retried with
+    full-jitter exponential backoff, honouring Retry-After on rate limits.
+    When hedging is enabled and enough latency samples exist, a duplicate
+    request is sent once the primary has been running longer than the
+    configured latency percentile, and whichever finishes first wins.
+    
+    To measure what hedging buys, a primary that loses to its hedge is left
+    to finish (it is already running upstream), and its latency is recorded
+    as what the call would have taken without hedging. Failed or timed-out
+    primaries are recorded at the deadline, which makes the reported
+    improvement a lower bound.
+    """
+    
+    def __init__(self,
+                 timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = LLM_RETRY_BASE_DELAY,
+                 max_delay: float = LLM_RETRY_MAX_DELAY,
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+                 hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        """Initialize the policy and its latency windows."""
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        
+        self.latency = LatencyWindow()
+        self.unhedged_latency = LatencyWindow()
+        self.counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "hedges_sent": 0,
+            "hedge_wins": 0
+        }
+    
+    async def call(self,
+                   fn: Callable[[float], Awaitable[T]],
+                   timeout: Optional[float] = None,
+                   can_hedge: Optional[Callable[[], bool]] = None,
+                   retry_timeouts: bool = True) -> T:
+        """
+        Run an upstream call under the policy.
+        
+        Args:
+            fn: Coroutine function making one upstream request; it receives the
+                deadline in seconds and applies it to the upstream call only, so
+                time spent queueing for a scheduler slot does not count against it
+            timeout: Per-attempt deadline in seconds, overriding the default
+            can_hedge: Optional predicate that must hold for a hedge to be sent,
+                e.g. to avoid hedging while requests are queueing
+            retry_timeouts: Whether an attempt that hit its deadline is retried.
+                Calls made in a worker thread keep running after their deadline,
+                so retrying them would only add a second request upstream
+        
+        Returns:
+            The result of the first successful attempt
+        """
+        self.counters["calls"] += 1
+        deadline = timeout or self.timeout
+        started = time.monotonic()
+        attempt = 0
+        
+        while True:
+            try:
+                result, hedge_won = await self._attempt(fn, deadline, can_hedge, started)
+                elapsed = time.monotonic() - started
+                self.latency.add(elapsed)
+                if not hedge_won:
+                    # A hedge win records its unhedged latency when the losing primary finishes
+                    self.unhedged_latency.add(elapsed)
+                return result
+            except Exception as e:
+                if not self.should_retry(attempt, e, retry_timeouts):
+                    raise
+                attempt += 1
+                await asyncio.sleep(self.backoff_delay(attempt, e))
+    
+    def should_retry(self, attempt: int, error: Exception, retry_timeouts: bool = True) -> bool:
+        """
+        Record a failed attempt and decide whether to try again.
+        
+        Args:
+            attempt: Number of retries already made
+            error: The failure
+            retry_timeouts: Whether a timed-out attempt may be retried
+        """
+        timed_out = isinstance(error, asyncio.TimeoutError)
+        if timed_out:
+            self.counters["timeouts"] += 1
+        if attempt >= self.max_retries or not is_retryable(error) or (timed_out and not retry_timeouts):
+            self.counters["failures"] += 1
+            return False
+        self.counters["retries"] += 1
+        return True
+    
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if longer."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.max_delay))
+        return delay
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Return how long to wait before hedging, or None if hedging is off or untrained."""
+        if not self.hedge_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(self.hedge_percentile))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and the observed versus unhedged tail latency."""
+        observed = self.latency.summary()
+        unhedged = self.unhedged_latency.summary()
+        return {
+            "timeout_seconds": self.timeout,
+            "max_retries": self.max_retries,
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "latency_seconds": observed,
+            "unhedged_latency_seconds": unhedged,
+            "p99_improvement_lower_bound_seconds": max(0.0, unhedged["p99"] - observed["p99"]),
+            **self.counters
+        }
+    
+    async def _attempt(self,
+                       fn: Callable[[float], Awaitable[T]],
+                       deadline: float,
+                       can_hedge: Optional[Callable[[], bool]],
+                       call_started: float):
+        """
+        Make one attempt, possibly hedged.
+        
+        Returns:
+            (result, whether the hedge request won)
+        """
+        self.counters["attempts"] += 1
+        primary = asyncio.ensure_future(fn(deadline))
+        
+        hedge_after = self.hedge_delay()
+        if hedge_after is None:
+            return await primary, False
+        
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        except asyncio.CancelledError:
+            # asyncio.wait does not cancel what it waits for; stop the upstream call with the caller
+            primary.cancel()
+            raise
+        if done or (can_hedge is not None and not can_hedge()):
+            return await primary, False
+        
+        self.counters["hedges_sent"] += 1
+        hedge = asyncio.ensure_future(fn(deadline))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self.counters["hedge_wins"] += 1
+                        # The primary is already running upstream; let it finish so we
+                        # learn how long the call would have taken without the hedge
+                        primary.add_done_callback(
+                            lambda finished: self._record_unhedged(finished, call_started, deadline)
+                        )
+                        pending.discard(primary)
+                        return task.result(), True
+                    return task.result(), False
+        except asyncio.CancelledError:
+            primary.cancel()
+            hedge.cancel()
+            raise
+        finally:
+            # Cancel a losing hedge; a losing primary is left to finish for measurement
+            if not hedge.done():
+                hedge.cancel()
+        
+        # Both requests failed; surface the last error
+        raise error
+    
+    def _record_unhedged(self, primary: "asyncio.Future[Any]", call_started: float, deadline: float):
+        """Record the latency the call would have had if only the primary had been sent."""
+        if primary.cancelled() or primary.exception() is not None:
+            # The primary would have failed or hit its deadline and been retried
+            self.unhedged_latency.add(max(time.monotonic() - call_started, deadline))
+        else:
+            self.unhedged_latency.add(time.monotonic() - call_started)
+
+# Create a singleton instance
+llm_call_policy = CallPolicy()
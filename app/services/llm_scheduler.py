@@ -0,0 +1,271 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get scheduler configuration from environment variables
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "512"))
+
+# Priority classes, lower value is served first
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "explanation": 1,
+    "background": 2
+}
+
+# Which priority class each calling feature belongs to
+FEATURE_PRIORITIES = {
+    "qa": "interactive",
+    "document_qa": "interactive",
+    "chat": "interactive",
+    "summary": "interactive",
+    "explanation": "explanation",
+    "quiz": "background"
+}
+
+
+def priority_class_for(feature: str) -> str:
+    """Map a calling feature to its priority class, defaulting to interactive."""
+    return FEATURE_PRIORITIES.get(feature, "interactive")
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+    
+    def __init__(self, per_minute: float):
+        """Initialize a full bucket."""
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+    
+    def time_until(self, amount: float) -> float:
+        """
+        Seconds until the bucket holds the requested amount.
+        
+        Requests larger than the whole bucket are allowed once it is full,
+        otherwise they could never be served.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        """Take tokens out of the bucket."""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+    
+    def _refill(self):
+        """Add the tokens accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class LLMScheduler:
+    """
+    Priority scheduler in front of the upstream LLM.
+    
+    Callers wait in a priority queue (interactive, then explanations, then
+    background quiz generation; FIFO within a class) until a concurrency slot
+    is free and both the requests-per-minute and tokens-per-minute buckets can
+    cover the request. Work is queued rather than rejected, so bulk generation
+    slows down instead of exhausting the quota and causing 429s for chat.
+    
+    The limits apply to the upstream quota as a whole. When several worker
+    processes serve the application, each schedules its own calls within an
+    equal share of them (see share).
+    """
+    
+    def __init__(self,
+                 requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        """Initialize the buckets and an empty queue."""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.total_concurrency = max_concurrency
+        self.processes = 1
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        
+        self._queue: List[Tuple[int, int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        
+        self._queued_by_class = {name: 0 for name in PRIORITY_CLASSES}
+        self._granted_by_class = {name: 0 for name in PRIORITY_CLASSES}
+        self._waits_by_class: Dict[str, Deque[float]] = {
+            name: deque(maxlen=1000) for name in PRIORITY_CLASSES
+        }
+        self._total_wait_by_class = {name: 0.0 for name in PRIORITY_CLASSES}
+    
+    @asynccontextmanager
+    async def slot(self, feature: str, tokens: int) -> AsyncIterator[float]:
+        """
+        Hold a scheduled slot for the duration of an upstream call.
+        
+        Args:
+            feature: The calling feature (qa, document_qa, chat, summary, explanation, quiz)
+            tokens: Estimated prompt plus completion tokens for the call
+        
+        Yields:
+            The time in seconds spent waiting in the queue
+        """
+        waited = await self.acquire(feature, tokens)
+        try:
+            yield waited
+        finally:
+            self.release()
+    
+    async def acquire(self, feature: str, tokens: int) -> float:
+        """
+        Wait until the request may be sent upstream.
+        
+        Returns:
+            The time in seconds spent waiting in the queue
+        """
+        priority_class = priority_class_for(feature)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        enqueued_at = time.monotonic()
+        
+        heapq.heappush(self._queue, (
+            PRIORITY_CLASSES[priority_class],
+            next(self._sequence),
+            tokens,
+            priority_class,
+            future
+        ))
+        self._queued_by_class[priority_class] += 1
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the caller went away
+                self.release()
+            else:
+                future.cancel()
+                self._queued_by_class[priority_class] -= 1
+            raise
+        
+        waited = time.monotonic() - enqueued_at
+        self._waits_by_class[priority_class].append(waited)
+        self._total_wait_by_class[priority_class] += waited
+        return waited
+    
+    def release(self):
+        """Free a concurrency slot and let the dispatcher serve the next waiter."""
+        self._active = max(0, self._active - 1)
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def share(self, processes: int):
+        """
+        Limit this process to an equal share of the budgets.
+        
+        Called in each worker process after it is forked, so the workers
+        together stay within the configured limits. A worker cannot borrow
+        the unused share of an idle one.
+        
+        Args:
+            processes: Number of worker processes serving the same quota
+        """
+        self.processes = max(1, processes)
+        self.request_bucket = TokenBucket(self.requests_per_minute / self.processes)
+        self.token_bucket = TokenBucket(self.tokens_per_minute / self.processes)
+        self.max_concurrency = max(1, self.total_concurrency // self.processes)
+    
+    def queue_depth(self) -> int:
+        """Number of requests currently waiting."""
+        return sum(self._queued_by_class.values())
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, wait-time and bucket metrics."""
+        classes = {}
+        for name in PRIORITY_CLASSES:
+            waits = sorted(self._waits_by_class[name])
+            granted = self._granted_by_class[name]
+            classes[name] = {
+                "queue_depth": self._queued_by_class[name],
+                "granted": granted,
+                "mean_wait_seconds": self._total_wait_by_class[name] / granted if granted else 0.0,
+                "p95_wait_seconds": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max_wait_seconds": waits[-1] if waits else 0.0
+            }
+        
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "processes": self.processes,
+            "queue_depth": self.queue_depth(),
+            "requests_per_minute": self.request_bucket.capacity,
+            "tokens_per_minute": self.token_bucket.capacity,
+            "available_requests": round(self.request_bucket.tokens, 2),
+            "available_tokens": round(self.token_bucket.tokens, 2),
+            "classes": classes
+        }
+    
+    def _ensure_dispatcher(self):
+        """Start the dispatcher task on the running event loop if needed."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+    
+    async def _dispatch(self):
+        """Grant slots to waiters in priority order as capacity allows."""
+        while True:
+            # Drop waiters that gave up while queued
+            while self._queue and self._queue[0][4].done():
+                heapq.heappop(self._queue)
+            
+            if not self._queue or self._active >= self.max_concurrency:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            _, _, tokens, priority_class, future = self._queue[0]
+            delay = max(
+                self.request_bucket.time_until(1),
+                self.token_bucket.time_until(tokens)
+            )
+            if delay > 0:
+                # Sleep until the buckets refill, but wake early if a more
+                # urgent request arrives or a slot is released
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            heapq.heappop(self._queue)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self._active += 1
+            self._queued_by_class[priority_class] -= 1
+            self._granted_by_class[priority_class] += 1
+            future.set_result(None)
+
+# Create a singleton instance
+llm_scheduler = LLMScheduler()
@@ -1,65 +1,74 @@
-import os
-from typing import List, Dict, Any, Optional
+import json
+import time
+import asyncio
+import hashlib
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from dotenv import load_dotenv
-try:
-    # Try importing from langchain_groq (underscore) first
-    from langchain_groq import ChatGroq
-except ImportError:
-    try:
-        # Fallback to hyphenated import if underscore version fails
-        from langchain.chat_models import ChatGroq
-    except ImportError:
-        # If both fail, print helpful error
-        print("ERROR: Could not import ChatGroq. Please install with:")
-        print("pip install git+https://github.com/langchain-ai/langchain.git@master#subdirectory=libs/partners/groq")
-        ChatGroq = None
-
 from langchain.schema.messages import HumanMessage, AIMessage, SystemMessage
 
+from app.services.cache_service import explanation_cache, normalize_concept
+from app.services.coalescing import llm_coalescer
+from app.services.history_service import chat_history_manager, CHAT_SUMMARY_MAX_WORDS
+from app.services.llm_backends import llm_backend
+from app.services.llm_metrics import llm_metrics, call_status
+from app.services.llm_policy import llm_call_policy
+from app.services.llm_scheduler import llm_scheduler, LLM_EXPECTED_COMPLETION_TOKENS
+from app.services.model_router import model_router
+from app.services.quiz_parser import QuizStreamParser, parse_quiz_questions
+from app.services.token_counter import count_tokens, MESSAGE_OVERHEAD_TOKENS
+from app.services.semantic_cache import qa_semantic_cache, explanation_semantic_cache
+
 # Load environment variables
 load_dotenv()
 
+# System messages shared by the blocking and streaming variants of each feature
+EXPLANATION_SYSTEM_MESSAGE = """You are an expert Indian law tutor. Provide clear, concise, and accurate 
+        explanations of legal concepts, with references to relevant sections of Indian law where applicable.
+        Ensure explanations are educational and helpful for law students."""
+
+EXPLANATION_PROMPT_TEMPLATE = "Explain the following legal concept in Indian law: {concept}"
+
+# Derived from the prompt text so editing the prompt automatically bypasses old cache entries
+EXPLANATION_PROMPT_VERSION = hashlib.sha256(
+    f"{EXPLANATION_SYSTEM_MESSAGE}\n{EXPLANATION_PROMPT_TEMPLATE}".encode("utf-8")
+).hexdigest()[:12]
+
+QA_SYSTEM_MESSAGE = """You are an expert Indian law tutor answering questions from law students.
+        Provide accurate, educational, and helpful responses based on Indian law.
+        Reference relevant statutes, case law, and legal principles in your answers.
+        If you're unsure about any information, clearly indicate this rather than providing incorrect information."""
+
+SUMMARY_SYSTEM_MESSAGE = """You summarise tutoring conversations between a law student and an Indian law tutor.
+        Summaries are read by the tutor to keep context in later turns, so be factual and compact."""
+
+QUIZ_SYSTEM_MESSAGE = """You are an expert at creating educational quiz questions for Indian law students.
+        Generate multiple-choice questions that test understanding of legal concepts, statutes, and case law.
+        Each question should have four options with one correct answer."""
+
+# Characters of source content sent with one quiz generation prompt
+QUIZ_CONTENT_CHARS = 3000
+
+QA_PROMPT_VERSION = hashlib.sha256(QA_SYSTEM_MESSAGE.encode("utf-8")).hexdigest()[:12]
+
+class LLMUnavailableError(Exception):
+    """Raised when no LLM client could be initialised."""
+
+
 class LLMService:
     """Service for interacting with LLM models."""
     
     def __init__(self):
-        """Initialize LLM service with the configured model."""
-        self.api_key = os.getenv("GROQ_API_KEY")
-        self.model_name = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
-        
-        # Initialize the model with minimal parameters
-        if not ChatGroq:
-            self.llm = None
-            return
-            
-        # Use a try-except block for each possible parameter combination
-        try:
-            # Try with minimal parameters first 
-            self.llm = ChatGroq(api_key=self.api_key, model=self.model_name)
-        except Exception as e1:
-            print(f"Error with primary initialization method: {str(e1)}")
-            try:
-                # Try with groq_api_key instead
-                self.llm = ChatGroq(groq_api_key=self.api_key, model=self.model_name)
-            except Exception as e2:
-                print(f"Error with secondary initialization method: {str(e2)}")
-                try:
-                    # Try with model_name instead of model
-                    self.llm = ChatGroq(api_key=self.api_key, model_name=self.model_name)
-                except Exception as e3:
-                    print(f"Error with tertiary initialization method: {str(e3)}")
-                    try:
-                        # Final attempt with minimal possible parameters
-                        self.llm = ChatGroq()
-                    except Exception as e4:
-                        print(f"All initialization methods failed: {str(e4)}")
-                        self.llm = None
-                        print("WARNING: LLM initialization failed. Functions requiring LLM will not work.")
+        """Initialize LLM service with the configured backend."""
+        # The backend (Groq, or the local fake for load tests) is selected by LLM_BACKEND
+        self.backend = llm_backend
+        self.model_name = self.backend.model_name
     
     async def generate_response(self, 
                                prompt: str, 
                                system_message: Optional[str] = None, 
-                               chat_history: Optional[List[Dict[str, str]]] = None) -> str:
+                               chat_history: Optional[List[Dict[str, str]]] = None,
+                               feature: str = "qa",
+                               difficulty: Optional[str] = None) -> str:
         """
         Generate a response from the LLM model.
         
@@ -67,13 +76,281 @@ class LLMService:
             prompt: The user's query
             system_message: Optional system message to set the context
             chat_history: Optional chat history for maintaining context
+            feature: The calling feature, used to prioritise the request
+            difficulty: Optional quiz difficulty, used to route the request
             
         Returns:
             The LLM's response as a string
         """
-        if not self.llm:
+        try:
+            return await self._complete(prompt, system_message, chat_history, feature, difficulty)
+        except Exception as e:
+            return self._error_message(e)
+    
+    async def stream_response(self, 
+                              prompt: str, 
+                              system_message: Optional[str] = None, 
+                              chat_history: Optional[List[Dict[str, str]]] = None,
+                              feature: str = "qa") -> AsyncIterator[str]:
+        """
+        Stream a response from the LLM model as it is generated.
+        
+        Args:
+            prompt: The user's query
+            system_message: Optional system message to set the context
+            chat_history: Optional chat history for maintaining context
+            feature: The calling feature, used to prioritise the request
+        
+        Yields:
+            Chunks of the LLM's response text as they arrive
+        
+        Raises:
+            The generation error, once the stream has started; streaming
+            endpoints report it as an error event
+        """
+        async for chunk in self._stream(prompt, system_message, chat_history, feature):
+            yield chunk
+    
+    async def _complete(self, 
+                        prompt: str, 
+                        system_message: Optional[str] = None, 
+                        chat_history: Optional[List[Dict[str, str]]] = None,
+                        feature: str = "qa",
+                        difficulty: Optional[str] = None,
+                        routing: Optional[Tuple[str, str]] = None) -> str:
+        """
+        Generate a full response, raising on failure instead of returning an error string.
+        
+        The model router picks the small or large model for the call, unless
+        the caller already routed it. Identical concurrent requests share a
+        single upstream call, which is queued by the scheduler according to
+        the feature's priority.
+        """
+        if not self.backend.available:
+            raise LLMUnavailableError()
+        
+        system_message, chat_history = await self._prepare_history(system_message, chat_history)
+        messages = self._build_messages(prompt, system_message, chat_history)
+        model, route = routing or model_router.route(
+            feature, self._count_prompt_tokens(messages), llm_scheduler.queue_depth(), difficulty
+        )
+        key = self._request_key(messages, model)
+        
+        return await llm_coalescer.do(key, lambda: self._invoke(messages, feature, model, route))
+    
+    async def _invoke(self, messages: List[Any], feature: str, model: str, route: str) -> str:
+        """
+        Send messages to the routed model, falling back to the large model if it fails.
+        
+        Each attempt (and each hedge) takes its own scheduler slot. Hedges are
+        only sent while nothing is queueing, so they never delay other callers.
+        """
+        started = time.monotonic()
+        fallback = False
+        try:
+            try:
+                result = await self._call(messages, feature, model)
+            except Exception as e:
+                if not self._can_fall_back(model):
+                    raise
+                print(f"Error from {model} on route {route}, falling back to {model_router.large_model}: {str(e)}")
+                fallback = True
+                model = model_router.large_model
+                result = await self._call(messages, feature, model)
+        except Exception:
+            model_router.record(route, model, time.monotonic() - started, ok=False, fallback=fallback)
+            raise
+        
+        model_router.record(route, model, time.monotonic() - started, ok=True, fallback=fallback)
+        return result
+    
+    async def _call(self, messages: List[Any], feature: str, model: str) -> str:
+        """Send messages to one model under the call policy (timeouts, retries, hedging)."""
+        return await llm_call_policy.call(
+            lambda timeout: self._send(messages, feature, timeout, model),
+            can_hedge=lambda: llm_scheduler.queue_depth() == 0
+        )
+    
+    async def _send(self, messages: List[Any], feature: str, timeout: float, model: str) -> str:
+        """Make one upstream request once the scheduler grants a slot, recording its metrics."""
+        prompt_tokens = self._count_prompt_tokens(messages)
+        
+        async with llm_scheduler.slot(feature, prompt_tokens + LLM_EXPECTED_COMPLETION_TOKENS) as waited:
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(self.backend.complete(messages, model=model), timeout=timeout)
+            except BaseException as e:
+                llm_metrics.record(feature, model, waited, time.monotonic() - started,
+                                   prompt_tokens, 0, status=call_status(e))
+                raise
+        
+        # Prefer the provider's token counts to our estimates
+        llm_metrics.record(
+            feature,
+            model,
+            waited,
+            time.monotonic() - started,
+            result["prompt_tokens"] if result["prompt_tokens"] is not None else prompt_tokens,
+            result["completion_tokens"] if result["completion_tokens"] is not None else count_tokens(result["text"])
+        )
+        return result["text"]
+    
+    def _route(self, prompt: str, system_message: str, feature: str) -> Tuple[str, str]:
+        """
+        Route a request without chat history before it is made.
+        
+        Cached answers are keyed on the model that produced them, so cached
+        features route first, look up the caches for that model and then
+        generate with it.
+        """
+        messages = self._build_messages(prompt, system_message)
+        return model_router.route(feature, self._count_prompt_tokens(messages), llm_scheduler.queue_depth())
+    
+    def _acceptable_models(self, model: str) -> List[str]:
+        """Models whose cached answers may serve a request routed to a model; the large model's always may."""
+        if model == model_router.large_model:
+            return [model]
+        return [model, model_router.large_model]
+    
+    def _can_fall_back(self, model: str) -> bool:
+        """Whether a failed call on this model may be retried on the large model."""
+        return model_router.fallback and model != model_router.large_model
+    
+    def _count_prompt_tokens(self, messages: List[Any]) -> int:
+        """Estimate the prompt tokens of a request for routing, rate limiting and metrics."""
+        return sum(count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+    
+    def _request_key(self, messages: List[Any], model: str) -> str:
+        """Hash the model and messages so identical requests can be coalesced."""
+        payload = json.dumps(
+            [model] + [[message.type, message.content] for message in messages],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def _stream(self, 
+                      prompt: str, 
+                      system_message: Optional[str] = None, 
+                      chat_history: Optional[List[Dict[str, str]]] = None,
+                      feature: str = "qa",
+                      difficulty: Optional[str] = None,
+                      routing: Optional[Tuple[str, str]] = None) -> AsyncIterator[str]:
+        """Stream a response, raising on failure instead of yielding an error string."""
+        if not self.backend.available:
+            raise LLMUnavailableError()
+        
+        system_message, chat_history = await self._prepare_history(system_message, chat_history)
+        messages = self._build_messages(prompt, system_message, chat_history)
+        prompt_tokens = self._count_prompt_tokens(messages)
+        model, route = routing or model_router.route(feature, prompt_tokens, llm_scheduler.queue_depth(), difficulty)
+        routed_at = time.monotonic()
+        fallback = False
+        attempt = 0
+        
+        while True:
+            emitted = False
+            try:
+                # The slot is held until the stream completes
+                async with llm_scheduler.slot(feature, prompt_tokens + LLM_EXPECTED_COMPLETION_TOKENS) as waited:
+                    started = time.monotonic()
+                    first_token_at = None
+                    text = ""
+                    status = "ok"
+                    try:
+                        stream = self.backend.stream(messages, model=model).__aiter__()
+                        while True:
+                            # The deadline applies to each chunk, so a stalled stream fails
+                            try:
+                                chunk = await asyncio.wait_for(stream.__anext__(), timeout=llm_call_policy.timeout)
+                            except StopAsyncIteration:
+                                break
+                            if chunk:
+                                if first_token_at is None:
+                                    first_token_at = time.monotonic()
+                                emitted = True
+                                text += chunk
+                                yield chunk
+                    except BaseException as e:
+                        status = call_status(e)
+                        raise
+                    finally:
+                        llm_metrics.record(
+                            feature,
+                            model,
+                            waited,
+                            time.monotonic() - started,
+                            prompt_tokens,
+                            count_tokens(text),
+                            ttft=first_token_at - started if first_token_at is not None else None,
+                            status=status,
+                            streaming=True
+                        )
+                model_router.record(route, model, time.monotonic() - routed_at, ok=True, fallback=fallback)
+                return
+            except Exception as e:
+                # Once text has reached the client a retry would duplicate it
+                if not emitted and llm_call_policy.should_retry(attempt, e):
+                    attempt += 1
+                    await asyncio.sleep(llm_call_policy.backoff_delay(attempt, e))
+                    continue
+                if not emitted and self._can_fall_back(model):
+                    print(f"Error from {model} on route {route}, falling back to {model_router.large_model}: {str(e)}")
+                    fallback = True
+                    model = model_router.large_model
+                    attempt = 0
+                    continue
+                model_router.record(route, model, time.monotonic() - routed_at, ok=False, fallback=fallback)
+                raise
+    
+    def _error_message(self, error: Exception) -> str:
+        """Turn a generation failure into the user-facing error text."""
+        if isinstance(error, LLMUnavailableError):
             return "LLM service is unavailable. Please check your configuration and API keys."
-            
+        print(f"Error generating response: {str(error)}")
+        return f"Error: Unable to generate response. {str(error)}"
+    
+    async def _prepare_history(self, 
+                               system_message: Optional[str], 
+                               chat_history: Optional[List[Dict[str, str]]]) -> Tuple[Optional[str], Optional[List[Dict[str, str]]]]:
+        """
+        Fit the chat history into the token budget.
+        
+        Older turns are replaced by a rolling summary appended to the system message.
+        """
+        if not chat_history:
+            return system_message, chat_history
+        
+        summary, recent = await chat_history_manager.prepare(chat_history, self._summarize_history)
+        if summary:
+            summary_note = f"Summary of the earlier conversation:\n{summary}"
+            system_message = f"{system_message}\n\n{summary_note}" if system_message else summary_note
+        
+        return system_message, recent
+    
+    async def _summarize_history(self, 
+                                 previous_summary: Optional[str], 
+                                 turns: List[Dict[str, str]]) -> str:
+        """Fold conversation turns into a running summary."""
+        transcript = "\n".join(
+            f"{'Student' if turn['role'] == 'user' else 'Tutor'}: {turn['content']}" for turn in turns
+        )
+        prompt = f"""Existing summary of the conversation (may be empty):
+        {previous_summary or ""}
+        
+        New conversation turns:
+        {transcript}
+        
+        Write an updated summary of the whole conversation in at most {CHAT_SUMMARY_MAX_WORDS} words.
+        Keep the legal topics discussed, statutes and cases cited, and any open questions.
+        Return only the summary."""
+        
+        return await self._complete(prompt, SUMMARY_SYSTEM_MESSAGE, feature="summary")
+    
+    def _build_messages(self, 
+                        prompt: str, 
+                        system_message: Optional[str] = None, 
+                        chat_history: Optional[List[Dict[str, str]]] = None) -> List[Any]:
+        """Convert a prompt, system message and chat history into LangChain messages."""
         messages = []
         
         # Add system message if provided
@@ -91,31 +368,180 @@ class LLMService:
         # Add the current prompt
         messages.append(HumanMessage(content=prompt))
         
-        try:
-            # Generate response
-            response = self.llm(messages)
-            return response.content
-        except Exception as e:
-            print(f"Error generating response: {str(e)}")
-            return f"Error: Unable to generate response. {str(e)}"
+        return messages
     
     async def generate_legal_explanation(self, concept: str) -> str:
         """
         Generate an explanation for a legal concept.
         
+        Explanations are served from the explanation cache, or from the semantic
+        cache for paraphrased concepts, when available; only successful
+        generations are cached.
+        
         Args:
             concept: The legal concept to explain
             
         Returns:
             Explanation of the legal concept
         """
-        system_message = """You are an expert Indian law tutor. Provide clear, concise, and accurate 
-        explanations of legal concepts, with references to relevant sections of Indian law where applicable.
-        Ensure explanations are educational and helpful for law students."""
+        prompt, routing = self._explanation_route(concept)
+        cached = await self._cached_explanation(concept, routing[0])
+        if cached is not None:
+            return cached
         
-        prompt = f"Explain the following legal concept in Indian law: {concept}"
+        try:
+            explanation = await self._complete(prompt, EXPLANATION_SYSTEM_MESSAGE, feature="explanation", routing=routing)
+        except Exception as e:
+            return self._error_message(e)
         
-        return await self.generate_response(prompt, system_message)
+        await self._remember_explanation(concept, explanation, routing[0])
+        return explanation
+    
+    async def stream_legal_explanation(self, concept: str) -> AsyncIterator[str]:
+        """
+        Stream an explanation for a legal concept as it is generated.
+        
+        A cached explanation is sent as a single chunk.
+        
+        Args:
+            concept: The legal concept to explain
+        
+        Yields:
+            Chunks of the explanation text
+        
+        Raises:
+            The generation error; nothing is cached for a failed explanation
+        """
+        prompt, routing = self._explanation_route(concept)
+        cached = await self._cached_explanation(concept, routing[0])
+        if cached is not None:
+            yield cached
+            return
+        
+        explanation = ""
+        async for chunk in self._stream(prompt, EXPLANATION_SYSTEM_MESSAGE, feature="explanation", routing=routing):
+            explanation += chunk
+            yield chunk
+        
+        await self._remember_explanation(concept, explanation, routing[0])
+    
+    async def explain_legal_concepts(self, concepts: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Explain a batch of legal concepts, yielding each result as it completes.
+        
+        Concepts with a cached explanation are yielded immediately. The misses
+        are generated concurrently; the scheduler bounds how many reach the LLM
+        at once and keeps them behind interactive traffic. A failed concept is
+        reported in its own result and does not affect the rest of the batch.
+        Duplicate concepts (ignoring case and spacing) are explained once.
+        
+        Args:
+            concepts: The legal concepts to explain
+        
+        Yields:
+            {"concept", "explanation", "cached"} for successes, or
+            {"concept", "error"} for failures
+        """
+        unique = {}
+        for concept in concepts:
+            unique.setdefault(normalize_concept(concept), concept)
+        
+        pending = []
+        for concept in unique.values():
+            cached = self._exact_explanation(concept, self._explanation_route(concept)[1][0])
+            if cached is not None:
+                yield {"concept": concept, "explanation": cached, "cached": True}
+            else:
+                pending.append(asyncio.ensure_future(self._explain_batch_item(concept)))
+        
+        try:
+            for next_result in asyncio.as_completed(pending):
+                yield await next_result
+        finally:
+            # Stop outstanding work if the client goes away
+            for task in pending:
+                task.cancel()
+    
+    async def _explain_batch_item(self, concept: str) -> Dict[str, Any]:
+        """Explain one concept of a batch, reporting failure in the result instead of raising."""
+        try:
+            prompt, routing = self._explanation_route(concept)
+            cached = await self._cached_explanation(concept, routing[0])
+            if cached is not None:
+                return {"concept": concept, "explanation": cached, "cached": True}
+            
+            explanation = await self._complete(prompt, EXPLANATION_SYSTEM_MESSAGE, feature="explanation", routing=routing)
+            await self._remember_explanation(concept, explanation, routing[0])
+            return {"concept": concept, "explanation": explanation, "cached": False}
+        except Exception as e:
+            return {"concept": concept, "error": self._error_message(e)}
+    
+    def _explanation_route(self, concept: str) -> Tuple[str, Tuple[str, str]]:
+        """Build the explanation prompt for a concept and route it."""
+        prompt = EXPLANATION_PROMPT_TEMPLATE.format(concept=concept)
+        return prompt, self._route(prompt, EXPLANATION_SYSTEM_MESSAGE, "explanation")
+    
+    def _exact_explanation(self, concept: str, model: str) -> Optional[str]:
+        """Look up an explanation by exact concept for a routed model."""
+        for candidate in self._acceptable_models(model):
+            cached = explanation_cache.get(concept, EXPLANATION_PROMPT_VERSION, candidate)
+            if cached is not None:
+                return cached
+        return None
+    
+    async def _cached_explanation(self, concept: str, model: str) -> Optional[str]:
+        """Look up an explanation for a routed model by exact concept, then by semantic similarity."""
+        cached = self._exact_explanation(concept, model)
+        if cached is not None:
+            return cached
+        
+        cached = await explanation_semantic_cache.lookup(
+            concept,
+            self._scopes(EXPLANATION_PROMPT_VERSION, model),
+            # A paraphrase is only served while its own explanation is cached, so
+            # invalidations and expiry (possibly by another process) apply to it too
+            valid=lambda matched: self._has_exact_explanation(matched, model)
+        )
+        if cached is not None:
+            # Promote the paraphrase so the next identical request is an exact hit
+            explanation_cache.set(concept, EXPLANATION_PROMPT_VERSION, model, cached)
+        return cached
+    
+    async def _remember_explanation(self, concept: str, explanation: str, model: str):
+        """Store a freshly generated explanation in both caches under the model it was routed to."""
+        explanation_cache.set(concept, EXPLANATION_PROMPT_VERSION, model, explanation)
+        await explanation_semantic_cache.store(concept, explanation, self._scope(EXPLANATION_PROMPT_VERSION, model))
+    
+    def _scope(self, prompt_version: str, model: str) -> str:
+        """Semantic cache scope for answers produced by a prompt version and a model."""
+        return f"{prompt_version}:{model}"
+    
+    def _scopes(self, prompt_version: str, model: str) -> List[str]:
+        """Semantic cache scopes whose answers may serve a request routed to a model."""
+        return [self._scope(prompt_version, candidate) for candidate in self._acceptable_models(model)]
+    
+    def _has_exact_explanation(self, concept: str, model: str) -> bool:
+        """Check the exact cache for an explanation a request routed to a model may be served."""
+        return any(
+            explanation_cache.contains(concept, EXPLANATION_PROMPT_VERSION, candidate)
+            for candidate in self._acceptable_models(model)
+        )
+    
+    def is_explanation_cached(self, concept: str) -> bool:
+        """Check whether an explanation for the concept is cached for the current prompt and its routed model."""
+        _, (model, _) = self._explanation_route(concept)
+        return self._has_exact_explanation(concept, model)
+    
+    async def warm_explanation_cache(self, concepts: List[str]):
+        """
+        Generate and cache explanations for any concepts not already cached.
+        
+        Args:
+            concepts: The legal concepts to warm
+        """
+        for concept in concepts:
+            if not self.is_explanation_cached(concept):
+                await self.generate_legal_explanation(concept)
     
     async def generate_quiz_questions(self, 
                                      content: str, 
@@ -124,6 +550,9 @@ class LLMService:
         """
         Generate quiz questions based on the provided content.
         
+        Every well-formed question is recovered from the response, even if
+        other parts of it are not valid JSON.
+        
         Args:
             content: The content to generate questions from
             num_questions: Number of questions to generate
@@ -132,14 +561,52 @@ class LLMService:
         Returns:
             List of quiz questions with options and answers
         """
-        system_message = """You are an expert at creating educational quiz questions for Indian law students.
-        Generate multiple-choice questions that test understanding of legal concepts, statutes, and case law.
-        Each question should have four options with one correct answer."""
+        prompt = self._quiz_prompt(content, num_questions, difficulty)
+        response = await self.generate_response(prompt, QUIZ_SYSTEM_MESSAGE, feature="quiz", difficulty=difficulty)
         
-        prompt = f"""Generate {num_questions} {difficulty}-difficulty multiple-choice quiz questions based on the following content. 
+        questions = parse_quiz_questions(response)
+        if not questions:
+            # Return a structured error if no question could be parsed
+            return [{"error": "Failed to parse LLM response as JSON", "raw_response": response}]
+        
+        return questions
+    
+    async def stream_quiz_questions(self, 
+                                    content: str, 
+                                    num_questions: int = 5, 
+                                    difficulty: str = "medium") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate quiz questions, yielding each one as soon as it is complete in the output.
+        
+        Args:
+            content: The content to generate questions from
+            num_questions: Number of questions to generate
+            difficulty: Difficulty level (easy, medium, hard)
+        
+        Yields:
+            Events of the form {"type": "question", "question": {...}} or
+            {"type": "error", "error": "..."}
+        """
+        prompt = self._quiz_prompt(content, num_questions, difficulty)
+        parser = QuizStreamParser()
+        
+        try:
+            async for chunk in self._stream(prompt, QUIZ_SYSTEM_MESSAGE, feature="quiz", difficulty=difficulty):
+                for question in parser.feed(chunk):
+                    yield {"type": "question", "question": question}
+        except Exception as e:
+            yield {"type": "error", "error": self._error_message(e)}
+            return
+        
+        if not parser.parsed:
+            yield {"type": "error", "error": "Failed to parse LLM response as JSON"}
+    
+    def _quiz_prompt(self, content: str, num_questions: int, difficulty: str) -> str:
+        """Build the quiz generation prompt."""
+        return f"""Generate {num_questions} {difficulty}-difficulty multiple-choice quiz questions based on the following content. 
         For each question, provide 4 options and indicate the correct answer.
         
-        Content: {content[:3000]}  # Limit content to prevent token limits
+        Content: {content[:QUIZ_CONTENT_CHARS]}  # Limit content to prevent token limits
         
         Format each question as a JSON object with the following structure:
         {{
@@ -151,23 +618,6 @@ class LLMService:
         
         Return the questions as a valid JSON array.
         """
-        
-        response = await self.generate_response(prompt, system_message)
-        
-        # Parse the response as JSON
-        import json
-        try:
-            # Handle potential formatting issues
-            if "```json" in response:
-                response = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                response = response.split("```")[1].split("```")[0].strip()
-                
-            questions = json.loads(response)
-            return questions
-        except json.JSONDecodeError:
-            # Return a structured error if JSON parsing fails
-            return [{"error": "Failed to parse LLM response as JSON", "raw_response": response}]
     
     async def answer_legal_question(self, 
                                    question: str, 
@@ -175,19 +625,67 @@ class LLMService:
         """
         Answer a legal question from a student.
         
+        Questions without chat history are answered from the semantic cache
+        when a sufficiently similar question has been answered before.
+        
         Args:
             question: The student's legal question
             chat_history: Optional chat history for context
             
         Returns:
             Answer to the legal question
+        
+        Raises:
+            The generation error, so a failure is never recorded or cached as an answer
         """
-        system_message = """You are an expert Indian law tutor answering questions from law students.
-        Provide accurate, educational, and helpful responses based on Indian law.
-        Reference relevant statutes, case law, and legal principles in your answers.
-        If you're unsure about any information, clearly indicate this rather than providing incorrect information."""
+        # Answers that depend on the conversation so far cannot be shared
+        if chat_history:
+            return await self._complete(question, QA_SYSTEM_MESSAGE, chat_history, feature="chat")
+        
+        routing = self._route(question, QA_SYSTEM_MESSAGE, "qa")
+        cached = await qa_semantic_cache.lookup(question, self._scopes(QA_PROMPT_VERSION, routing[0]))
+        if cached is not None:
+            return cached
+        
+        answer = await self._complete(question, QA_SYSTEM_MESSAGE, routing=routing)
+        await qa_semantic_cache.store(question, answer, self._scope(QA_PROMPT_VERSION, routing[0]))
+        return answer
+    
+    async def stream_legal_question(self, 
+                                    question: str, 
+                                    chat_history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """
+        Stream the answer to a legal question as it is generated.
+        
+        A semantic cache hit is sent as a single chunk.
+        
+        Args:
+            question: The student's legal question
+            chat_history: Optional chat history for context
+        
+        Yields:
+            Chunks of the answer text
+        
+        Raises:
+            The generation error; nothing is cached for a failed answer
+        """
+        if chat_history:
+            async for chunk in self.stream_response(question, QA_SYSTEM_MESSAGE, chat_history, feature="chat"):
+                yield chunk
+            return
+        
+        routing = self._route(question, QA_SYSTEM_MESSAGE, "qa")
+        cached = await qa_semantic_cache.lookup(question, self._scopes(QA_PROMPT_VERSION, routing[0]))
+        if cached is not None:
+            yield cached
+            return
+        
+        answer = ""
+        async for chunk in self._stream(question, QA_SYSTEM_MESSAGE, routing=routing):
+            answer += chunk
+            yield chunk
         
-        return await self.generate_response(question, system_message, chat_history)
+        await qa_semantic_cache.store(question, answer, self._scope(QA_PROMPT_VERSION, routing[0]))
 
 # Create a singleton instance
 llm_service = LLMService() 
\ No newline at end of file
@@ -0,0 +1,172 @@
+import os
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.llm_backends import llm_backend
+from app.services.llm_policy import LatencyWindow
+
+# Load environment variables
+load_dotenv()
+
+# Get routing configuration from environment variables
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+LLM_ROUTING_FALLBACK = os.getenv("LLM_ROUTING_FALLBACK", "true").lower() == "true"
+LLM_ROUTING_RULES = os.getenv("LLM_ROUTING_RULES", "")
+
+# Rules are checked in order and the first match wins; unmatched calls use the large model.
+# Conditions: features, difficulties, min_prompt_tokens, max_prompt_tokens,
+# min_queue_depth and min_large_p95_latency (seconds).
+DEFAULT_ROUTING_RULES = [
+    {"name": "easy_quiz", "features": ["quiz"], "difficulties": ["easy"], "model": "small"},
+    {"name": "short_explanation", "features": ["explanation"], "max_prompt_tokens": 100, "model": "small"},
+    {"name": "chat_summary", "features": ["summary"], "model": "small"},
+    {"name": "overloaded", "features": ["qa", "chat"], "min_queue_depth": 10, "max_prompt_tokens": 1500, "model": "small"}
+]
+
+# Name of the route taken when no rule matches
+DEFAULT_ROUTE = "default"
+
+
+def load_routing_rules() -> List[Dict[str, Any]]:
+    """Return the routing rules from LLM_ROUTING_RULES, or the defaults."""
+    if LLM_ROUTING_RULES:
+        try:
+            return json.loads(LLM_ROUTING_RULES)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing LLM_ROUTING_RULES, using the default rules: {str(e)}")
+    return DEFAULT_ROUTING_RULES
+
+
+class ModelRouter:
+    """
+    Routing policy choosing between a fast small model and the large model.
+    
+    Each call is matched against the rules by feature, quiz difficulty,
+    prompt size, current scheduler queue depth and the large model's recent
+    tail latency. Matching calls go to the rule's model; everything else
+    stays on the large model. Latency, error and fallback counts are kept
+    per route so rules can be tuned against what they cost in quality.
+    """
+    
+    def __init__(self,
+                 large_model: str,
+                 small_model: str,
+                 rules: Optional[List[Dict[str, Any]]] = None,
+                 enabled: bool = LLM_ROUTING_ENABLED,
+                 fallback: bool = LLM_ROUTING_FALLBACK):
+        """Initialize the router for a pair of models."""
+        self.models = {"large": large_model, "small": small_model}
+        self.rules = rules if rules is not None else load_routing_rules()
+        self.enabled = enabled
+        self.fallback = fallback
+        
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._model_latency = {model: LatencyWindow() for model in self.models.values()}
+    
+    @property
+    def large_model(self) -> str:
+        """The model used when no rule matches."""
+        return self.models["large"]
+    
+    def route(self,
+              feature: str,
+              prompt_tokens: int,
+              queue_depth: int = 0,
+              difficulty: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Pick the model for a call.
+        
+        Args:
+            feature: The calling feature (qa, chat, summary, explanation, quiz)
+            prompt_tokens: Estimated prompt size
+            queue_depth: Requests currently waiting in the scheduler
+            difficulty: Quiz difficulty, if any
+        
+        Returns:
+            (model name, route name)
+        """
+        if self.enabled:
+            for rule in self.rules:
+                if self._matches(rule, feature, prompt_tokens, queue_depth, difficulty):
+                    return self.models.get(rule.get("model"), self.large_model), rule.get("name", "unnamed")
+        return self.large_model, DEFAULT_ROUTE
+    
+    def record(self, route: str, model: str, latency: float, ok: bool, fallback: bool = False):
+        """
+        Record the outcome of a routed call.
+        
+        Args:
+            route: The route the call was sent on
+            model: Model that finally served (or failed) the call
+            latency: Seconds including any fallback
+            ok: Whether the call succeeded
+            fallback: Whether the call fell back to the large model
+        """
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = {
+                "calls": 0,
+                "errors": 0,
+                "fallbacks": 0,
+                "models": {},
+                "latency": LatencyWindow()
+            }
+        
+        stats["calls"] += 1
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+        if not ok:
+            stats["errors"] += 1
+        if fallback:
+            stats["fallbacks"] += 1
+        stats["latency"].add(latency)
+        
+        if ok and model in self._model_latency:
+            self._model_latency[model].add(latency)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return per-route call counts, fallbacks and latency."""
+        return {
+            "enabled": self.enabled,
+            "fallback": self.fallback,
+            "models": self.models,
+            "rules": self.rules,
+            "model_latency_seconds": {model: window.summary() for model, window in self._model_latency.items()},
+            "routes": {
+                route: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "fallbacks": stats["fallbacks"],
+                    "fallback_rate": stats["fallbacks"] / stats["calls"] if stats["calls"] else 0.0,
+                    "models": stats["models"],
+                    "latency_seconds": stats["latency"].summary()
+                }
+                for route, stats in self._routes.items()
+            }
+        }
+    
+    def _matches(self,
+                 rule: Dict[str, Any],
+                 feature: str,
+                 prompt_tokens: int,
+                 queue_depth: int,
+                 difficulty: Optional[str]) -> bool:
+        """Check every condition of a rule; absent conditions always match."""
+        if "features" in rule and feature not in rule["features"]:
+            return False
+        if "difficulties" in rule and difficulty not in rule["difficulties"]:
+            return False
+        if "min_prompt_tokens" in rule and prompt_tokens < rule["min_prompt_tokens"]:
+            return False
+        if "max_prompt_tokens" in rule and prompt_tokens > rule["max_prompt_tokens"]:
+            return False
+        if "min_queue_depth" in rule and queue_depth < rule["min_queue_depth"]:
+            return False
+        if "min_large_p95_latency" in rule:
+            window = self._model_latency[self.large_model]
+            if not len(window) or window.percentile(95) < rule["min_large_p95_latency"]:
+                return False
+        return True
+
+# Create a singleton instance
+model_router = ModelRouter(llm_backend.model_name, llm_backend.small_model_name)
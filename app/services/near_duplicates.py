@@ -0,0 +1,215 @@
+import os
+import re
+import zlib
+from typing import Any, Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Set, Tuple
+from dotenv import load_dotenv
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+# Get near-duplicate detection configuration from environment variables
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))
+NEAR_DUPLICATE_ANSWER_OVERLAP = float(os.getenv("NEAR_DUPLICATE_ANSWER_OVERLAP", "0.8"))
+
+# Characters per shingle of the normalised question text
+SHINGLE_CHARS = 5
+
+# Signature length, split into LSH bands of MINHASH_PERMUTATIONS // LSH_BANDS rows each.
+# With 32 bands of 4 rows, pairs at the default threshold become candidates more than 99.9% of the time.
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+
+# Letter prefix of a multiple-choice option, such as "B. " or "b) "
+OPTION_LETTER = re.compile(r"^\s*([A-Da-d])[.)]\s*")
+
+# Words that do not distinguish one answer from another
+ANSWER_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "its", "of", "on", "or", "the", "to", "under", "with"
+})
+
+# Universal hashing (a * x + b) mod p, with p prime and larger than any 32-bit shingle hash
+_PRIME = np.uint64(4294967311)
+_random = np.random.default_rng(7919)
+_A = _random.integers(1, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_B = _random.integers(0, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalise(text: str) -> str:
+    """Lower-cased words of a text, ignoring punctuation and spacing."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def shingles(text: str, size: int = SHINGLE_CHARS) -> Set[str]:
+    """Overlapping character shingles of lower-cased text, ignoring punctuation and spacing."""
+    normalised = normalise(text)
+    if len(normalised) <= size:
+        return {normalised}
+    return {normalised[i:i + size] for i in range(len(normalised) - size + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of a text's shingles; matching positions estimate Jaccard similarity."""
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)),
+        dtype=np.uint64
+    )
+    # One row per permutation, one column per shingle; products stay below 2^63
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def signature_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(first == second)) / len(first)
+
+
+def answer_text(question: Dict[str, Any]) -> str:
+    """The normalised text of a question's correct option, or of its correct_answer if that is not an option letter."""
+    answer = str(question.get("correct_answer") or "").strip()
+    options = [str(option) for option in question.get("options") or []]
+    if len(answer.rstrip(".)")) == 1 and answer[0].upper() in "ABCD":
+        letter = answer[0].upper()
+        for option in options:
+            prefix = OPTION_LETTER.match(option)
+            if prefix and prefix.group(1).upper() == letter:
+                return normalise(option[prefix.end():])
+        position = "ABCD".index(letter)
+        if position < len(options):
+            return normalise(options[position])
+    return normalise(OPTION_LETTER.sub("", answer))
+
+
+def answer_terms(question: Dict[str, Any]) -> FrozenSet[str]:
+    """The words of a question's correct answer that carry meaning."""
+    return frozenset(answer_text(question).split()) - ANSWER_STOPWORDS
+
+
+def answers_overlap(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """
+    Share of the shorter answer's words found in the other answer.
+    
+    A reworded answer usually keeps the words of the original and adds some
+    ("Right to life" and "The right to life and liberty" overlap fully),
+    while templated answers differ in the detail that matters ("Right to
+    life" and "Right to equality" overlap by half). An unknown answer
+    overlaps any other.
+    """
+    if not first or not second:
+        return 1.0
+    return len(first & second) / min(len(first), len(second))
+
+
+class QuestionSignature(NamedTuple):
+    """MinHash signature of a question's stem, with the words of its correct answer."""
+    stem: np.ndarray
+    answer: FrozenSet[str]
+
+
+def question_signature(question: Dict[str, Any]) -> QuestionSignature:
+    """
+    Signature of a question for near-duplicate detection.
+    
+    Templated questions differ only in a detail of the stem ("Article 21"
+    against "Article 14") and in their answer, so the stem alone cannot tell
+    them apart. The stem's MinHash finds candidates; the answers' words then
+    decide whether a candidate asks the same thing.
+    """
+    return QuestionSignature(minhash(question.get("question", "")), answer_terms(question))
+
+
+class NearDuplicateIndex:
+    """
+    Locality-sensitive hashing index of question signatures.
+    
+    Each stem signature is split into bands and every band is hashed into a
+    bucket, so questions that are likely to be similar share at least one
+    bucket. A lookup only compares against the questions in its buckets, so
+    it takes the same few microseconds however many questions are indexed.
+    A candidate is a near-duplicate when the similarity estimated from the
+    stem signatures reaches the threshold and the correct answers overlap.
+    """
+    
+    def __init__(self,
+                 threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 answer_overlap: float = NEAR_DUPLICATE_ANSWER_OVERLAP,
+                 bands: int = LSH_BANDS):
+        """Initialize an empty index."""
+        self.threshold = threshold
+        self.answer_overlap = answer_overlap
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        
+        self._signatures: Dict[Hashable, QuestionSignature] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[Hashable]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+    
+    def add(self, key: Hashable, signature: QuestionSignature) -> QuestionSignature:
+        """
+        Index a question under a key, replacing any question already indexed under it.
+        
+        Args:
+            key: Identifier of the question
+            signature: The question's signature, from question_signature
+        
+        Returns:
+            The signature
+        """
+        self.remove(key)
+        
+        self._signatures[key] = signature
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+        return signature
+    
+    def remove(self, key: Hashable):
+        """Remove a key from the index, if present."""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+    
+    def signature(self, key: Hashable) -> Optional[QuestionSignature]:
+        """The signature indexed under a key."""
+        return self._signatures.get(key)
+    
+    def match(self, signature: QuestionSignature) -> Optional[Tuple[Hashable, float]]:
+        """
+        Find the most similar indexed question with an overlapping answer.
+        
+        Args:
+            signature: Signature of the question to look up
+        
+        Returns:
+            (key, estimated stem similarity), or None if nothing is similar enough
+        """
+        candidates: Set[Hashable] = set()
+        for band in self._bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        
+        best = None
+        for key in candidates:
+            indexed = self._signatures[key]
+            similarity = signature_similarity(signature.stem, indexed.stem)
+            if similarity < self.threshold or (best is not None and similarity <= best[1]):
+                continue
+            if answers_overlap(signature.answer, indexed.answer) >= self.answer_overlap:
+                best = (key, similarity)
+        return best
+    
+    def _bands(self, signature: QuestionSignature) -> List[Tuple[int, bytes]]:
+        """Bucket keys of a signature's stem, one per band."""
+        return [
+            (band, signature.stem[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
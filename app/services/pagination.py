@@ -0,0 +1,119 @@
+import json
+import base64
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SORT_ORDERS = ("asc", "desc")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded or does not match the query."""
+
+
+class InvalidListQueryError(ValueError):
+    """Raised when a list query names an unknown sort key or field."""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor carrying the sort and the position of the last record of a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Parse a comma-separated fields= projection.
+    
+    Args:
+        fields: The requested fields, or None for all of them
+        allowed: The fields that can be requested, in response order
+    
+    Returns:
+        The requested fields in response order
+    """
+    if not fields:
+        return list(allowed)
+    
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise InvalidListQueryError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. Available fields: {', '.join(allowed)}"
+        )
+    return [field for field in allowed if field in requested]
+
+
+def keyset_page(db: sqlite3.Connection,
+                table: str,
+                fields: Sequence[str],
+                key: str,
+                sort: str,
+                order: str,
+                conditions: List[str],
+                params: List[Any],
+                limit: int,
+                cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Read one page of a table in (sort, key) order using keyset pagination.
+    
+    Rather than an offset, each page starts just after the last record of
+    the previous one, so with an index on (sort, key) the cost of a page
+    depends only on its size.
+    
+    Args:
+        db: The database connection
+        table: The table to read
+        fields: Columns to return
+        key: Unique column that breaks ties in the sort
+        sort: Column to sort by
+        order: "asc" or "desc"
+        conditions: SQL filter conditions, joined with AND
+        params: Parameters of the conditions
+        limit: Maximum records to return
+        cursor: The next_cursor of the previous page
+    
+    Returns:
+        (records, next_cursor), where next_cursor is None on the last page
+    """
+    if order not in SORT_ORDERS:
+        raise InvalidListQueryError(f"Unknown sort order: {order}. Use asc or desc")
+    
+    conditions = list(conditions)
+    params = list(params)
+    
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 4 or values[:2] != [sort, order]:
+            raise InvalidCursorError("Cursor does not match the requested sort; start again without a cursor")
+        conditions.append(f"({sort}, {key}) {'<' if order == 'desc' else '>'} (?, ?)")
+        params.extend(values[2:])
+    
+    # The sort and key columns are always read, to build the next cursor
+    columns = list(dict.fromkeys([*fields, sort, key]))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "DESC" if order == "desc" else "ASC"
+    
+    # Fetch one extra row to know whether another page follows
+    rows = db.execute(
+        f"SELECT {', '.join(columns)} FROM {table} {where} "
+        f"ORDER BY {sort} {direction}, {key} {direction} LIMIT ?",
+        (*params, limit + 1)
+    ).fetchall()
+    
+    records = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = records[-1]
+        next_cursor = encode_cursor([sort, order, last[sort], last[key]])
+    
+    return [{field: record[field] for field in fields} for record in records], next_cursor
@@ -0,0 +1,603 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+# Handle optional file locking; without it (on Windows) banks are only consistent within one process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from app.services.coalescing import SingleFlight
+from app.services.document_service import document_service
+from app.services.quiz_pipeline import quiz_pipeline
+from app.services.near_duplicates import NearDuplicateIndex, question_signature
+
+# Load environment variables
+load_dotenv()
+
+# Get question bank configuration from environment variables
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "true").lower() == "true"
+QUESTION_BANK_TARGET = int(os.getenv("QUESTION_BANK_TARGET", "20"))
+QUESTION_BANK_LOW_WATER = int(os.getenv("QUESTION_BANK_LOW_WATER", "5"))
+QUESTION_BANK_MAX_PER_DIFFICULTY = int(os.getenv("QUESTION_BANK_MAX_PER_DIFFICULTY", "200"))
+QUESTION_BANK_RECENT_WINDOW = int(os.getenv("QUESTION_BANK_RECENT_WINDOW", "10"))
+QUESTION_BANK_FILL_LEASE_SECONDS = float(os.getenv("QUESTION_BANK_FILL_LEASE_SECONDS", "600"))
+
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+QUESTION_BANK_DIR = os.path.join(OUTPUT_DIR, "question_bank")
+QUESTION_BANK_DB = os.getenv("QUESTION_BANK_DB", os.path.join(OUTPUT_DIR, "question_serves.db"))
+
+# Ensure the question bank directory exists
+os.makedirs(QUESTION_BANK_DIR, exist_ok=True)
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# Fields of a bank entry that belong to the question itself
+QUESTION_FIELDS = ("question", "options", "correct_answer", "explanation", "section")
+
+
+def question_id(question: Dict[str, Any]) -> str:
+    """Stable identifier of a question, derived from its text."""
+    return hashlib.sha256(question.get("question", "").strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+class QuestionBank:
+    """
+    Pre-generated per-document question bank, so quizzes can be served instantly.
+    
+    Each document's bank holds questions tagged with their difficulty and
+    source section, stored as one JSON file per document. Banks are filled in
+    the background after a document is ingested, and topped up whenever a
+    difficulty runs low on questions that have never been served.
+    
+    A quiz is sampled from the bank round-robin across sections, preferring
+    the least-served questions and skipping the questions served most
+    recently. Live generation is only needed when the bank cannot supply
+    enough questions for the requested difficulty.
+    
+    Every banked question of a document is kept in a MinHash/LSH index, so
+    near-duplicates (paraphrases of a banked question, at any difficulty)
+    are rejected when added and never sampled into the same quiz. The index
+    is also used to steer live generation away from questions already
+    served.
+    
+    Serve counts live in SQLite rather than in the bank file, so serving a
+    quiz updates a few rows instead of rewriting the document's whole bank.
+    Reads and writes run in a worker thread, off the event loop.
+    
+    Several worker processes may serve the same banks. Every change is made
+    under a lock on the document's bank, to the bank as currently on disk,
+    and a bank cached in memory is read again once another process has
+    replaced its file. A fill takes a lease recorded in the bank file, so
+    only one process fills a document at a time, and nothing is written
+    for a document that no longer exists, so a deleted bank stays deleted.
+    """
+    
+    def __init__(self,
+                 bank_dir: str = QUESTION_BANK_DIR,
+                 db_path: str = QUESTION_BANK_DB,
+                 enabled: bool = QUESTION_BANK_ENABLED,
+                 target: int = QUESTION_BANK_TARGET,
+                 low_water: int = QUESTION_BANK_LOW_WATER,
+                 max_per_difficulty: int = QUESTION_BANK_MAX_PER_DIFFICULTY,
+                 recent_window: int = QUESTION_BANK_RECENT_WINDOW,
+                 fill_lease_seconds: float = QUESTION_BANK_FILL_LEASE_SECONDS):
+        """Initialize the bank settings and open the serve-count database; banks are loaded from disk on first use."""
+        self.bank_dir = bank_dir
+        self.db_path = db_path
+        self.enabled = enabled
+        self.target = target
+        self.low_water = low_water
+        self.max_per_difficulty = max_per_difficulty
+        self.recent_window = recent_window
+        self.fill_lease_seconds = fill_lease_seconds
+        
+        self._banks: Dict[str, Dict[str, Any]] = {}
+        # Version (inode, modification time, size) of the file each cached bank was read from
+        self._versions: Dict[str, Tuple[int, int, int]] = {}
+        self._indexes: Dict[str, NearDuplicateIndex] = {}
+        self._document_locks: Dict[str, threading.Lock] = {}
+        self._fills = SingleFlight("question_bank")
+        self._background: Set["asyncio.Task[Any]"] = set()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "fill_errors": 0,
+            "questions_generated": 0,
+            "duplicates_dropped": 0,
+            "fills_skipped": 0,
+            "reloads": 0
+        }
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS question_serves ("
+            "document_id TEXT NOT NULL, "
+            "question_id TEXT NOT NULL, "
+            "difficulty TEXT NOT NULL, "
+            "served_count INTEGER NOT NULL, "
+            "last_served_at REAL NOT NULL, "
+            "PRIMARY KEY (document_id, question_id))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_question_serves_recent "
+            "ON question_serves (document_id, difficulty, last_served_at)"
+        )
+        self._db.commit()
+    
+    def reconnect(self):
+        """Open a new serve-count database connection in a forked worker."""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    async def sample(self, document_id: str, num_questions: int, difficulty: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Draw a quiz from a document's bank.
+        
+        Args:
+            document_id: The unique identifier of the document
+            num_questions: Number of questions to draw
+            difficulty: Difficulty level (easy, medium, hard)
+        
+        Returns:
+            The questions, spread across sections, or None if the bank cannot
+            supply enough questions that were not served recently
+        """
+        if not self.enabled:
+            return None
+        
+        chosen, unserved = await asyncio.to_thread(self._sample, document_id, num_questions, difficulty)
+        if chosen is None:
+            self.counters["misses"] += 1
+            self.schedule_fill(document_id)
+            return None
+        self.counters["hits"] += 1
+        
+        if unserved < self.low_water:
+            self.schedule_fill(document_id)
+        
+        # Present the quiz in document order
+        chosen.sort(key=lambda entry: (entry.get("section") is None, entry.get("section") or 0))
+        return [{field: entry.get(field) for field in QUESTION_FIELDS} for entry in chosen]
+    
+    async def add(self,
+                  document_id: str,
+                  difficulty: str,
+                  questions: List[Dict[str, Any]],
+                  served: bool = False) -> int:
+        """
+        Add questions to a document's bank, skipping near-duplicates of banked questions.
+        
+        Args:
+            document_id: The unique identifier of the document
+            difficulty: Difficulty the questions were generated at
+            questions: The questions to add
+            served: Whether the questions were just served in a quiz
+        
+        Returns:
+            The number of questions added; none are added once the document has been deleted
+        """
+        return await asyncio.to_thread(self._add, document_id, difficulty, questions, served)
+    
+    async def fill(self, document_id: str, difficulties: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Top up a document's bank; concurrent fills of the same document share one run.
+        
+        Args:
+            document_id: The unique identifier of the document
+            difficulties: Difficulties to fill (all by default)
+        
+        Returns:
+            Number of questions added per difficulty
+        """
+        return await self._fills.do(document_id, lambda: self._fill(document_id, difficulties or DIFFICULTIES))
+    
+    def index(self, document_id: str) -> NearDuplicateIndex:
+        """
+        Near-duplicate index of every question in a document's bank, built on first use.
+        
+        Args:
+            document_id: The unique identifier of the document
+        
+        Returns:
+            The index, keyed by question ID
+        """
+        index = self._indexes.get(document_id)
+        if index is None:
+            index = NearDuplicateIndex()
+            for entry in self._load(document_id)["questions"]:
+                index.add(entry["id"], signature=question_signature(entry))
+            self._indexes[document_id] = index
+        return index
+    
+    def schedule_fill(self, document_id: str):
+        """Start a background fill of a document's bank, if one is not already running in this or another process."""
+        if not self.enabled:
+            return
+        task = asyncio.ensure_future(self.fill(document_id))
+        # Keep a reference so the task is not garbage collected before it finishes
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    def delete(self, document_id: str) -> bool:
+        """
+        Remove a document's bank and serve counts from memory and disk.
+        
+        Other processes drop their copy when they next find the file gone.
+        
+        Returns:
+            True if a bank existed
+        """
+        with self._locked(document_id):
+            self._forget(document_id)
+            with self._db_lock:
+                self._db.execute("DELETE FROM question_serves WHERE document_id = ?", (document_id,))
+                self._db.commit()
+            bank_file = self._path(document_id)
+            if os.path.exists(bank_file):
+                os.remove(bank_file)
+                return True
+            return False
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and fill counters and the size of the loaded banks."""
+        return {
+            "enabled": self.enabled,
+            "target": self.target,
+            "low_water": self.low_water,
+            "recent_window": self.recent_window,
+            "banks_loaded": len(self._banks),
+            "indexed_questions": sum(len(index) for index in self._indexes.values()),
+            "fills_in_flight": self._fills.stats()["in_flight"],
+            **self.counters,
+            "hit_rate": self.counters["hits"] / (self.counters["hits"] + self.counters["misses"])
+            if self.counters["hits"] + self.counters["misses"] else 0.0
+        }
+    
+    def document_stats(self, document_id: str) -> Dict[str, Any]:
+        """Return per-difficulty question counts for a document's bank."""
+        bank = self._load(document_id)
+        served = self._served_counts(document_id)
+        difficulties = {}
+        for difficulty in DIFFICULTIES:
+            entries = [entry for entry in bank["questions"] if entry["difficulty"] == difficulty]
+            difficulties[difficulty] = {
+                "questions": len(entries),
+                "unserved": sum(1 for entry in entries if not served.get(entry["id"])),
+                "sections": len({entry.get("section") for entry in entries})
+            }
+        return {
+            "document_id": document_id,
+            "updated_at": bank["updated_at"],
+            "difficulties": difficulties
+        }
+    
+    def _sample(self, document_id: str, num_questions: int, difficulty: str) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """
+        Choose and mark served a quiz's questions, in a worker thread.
+        
+        Returns:
+            The chosen entries, or None if there are not enough, and the
+            number of never-served questions left at this difficulty
+        """
+        with self._locked(document_id):
+            bank = self._load(document_id)
+            served = self._served_counts(document_id)
+            recent = set(self._recent(document_id, difficulty))
+            eligible = [
+                entry for entry in bank["questions"]
+                if entry["difficulty"] == difficulty and entry["id"] not in recent
+            ]
+            
+            chosen = self._choose(document_id, eligible, num_questions, served) if len(eligible) >= num_questions else []
+            if len(chosen) < num_questions:
+                return None, self._unserved(bank, served, difficulty)
+            
+            self._mark_served(document_id, difficulty, chosen)
+            for entry in chosen:
+                served[entry["id"]] = served.get(entry["id"], 0) + 1
+            return chosen, self._unserved(bank, served, difficulty)
+    
+    def _add(self,
+             document_id: str,
+             difficulty: str,
+             questions: List[Dict[str, Any]],
+             served: bool) -> int:
+        """Add questions to a document's bank, in a worker thread."""
+        with self._locked(document_id):
+            if not document_service.has_document(document_id):
+                return 0
+            
+            bank = self._load(document_id)
+            index = self.index(document_id)
+            
+            added = []
+            for question in questions:
+                if "error" in question or not question.get("question"):
+                    continue
+                signature = question_signature(question)
+                if index.match(signature):
+                    self.counters["duplicates_dropped"] += 1
+                    continue
+                
+                entry = {field: question.get(field) for field in QUESTION_FIELDS}
+                index.add(question_id(question), signature=signature)
+                entry.update({
+                    "id": question_id(question),
+                    "difficulty": difficulty,
+                    "created_at": time.time()
+                })
+                bank["questions"].append(entry)
+                added.append(entry)
+            
+            if added:
+                self._save(bank)
+            if served:
+                self._mark_served(document_id, difficulty, added)
+        
+        return len(added)
+    
+    async def _fill(self, document_id: str, difficulties: List[str]) -> Dict[str, int]:
+        """Generate questions for every difficulty that is short of unserved questions."""
+        added = {}
+        if not await asyncio.to_thread(self._claim_fill, document_id):
+            self.counters["fills_skipped"] += 1
+            return added
+        
+        try:
+            content = await document_service.get_document_content(document_id)
+            if not content:
+                return added
+            
+            for difficulty in difficulties:
+                needed = await asyncio.to_thread(self._needed, document_id, difficulty)
+                if needed <= 0:
+                    continue
+                
+                index = await asyncio.to_thread(self.index, document_id)
+                questions = await quiz_pipeline.generate(content, needed, difficulty, index)
+                self.counters["questions_generated"] += sum(1 for question in questions if "error" not in question)
+                added[difficulty] = await self.add(document_id, difficulty, questions)
+            
+            self.counters["fills"] += 1
+        except Exception as e:
+            self.counters["fill_errors"] += 1
+            print(f"Error filling question bank for document {document_id}: {str(e)}")
+        finally:
+            await asyncio.to_thread(self._release_fill, document_id)
+        
+        return added
+    
+    def _needed(self, document_id: str, difficulty: str) -> int:
+        """Number of questions a fill should generate for a difficulty."""
+        bank = self._load(document_id)
+        size = sum(1 for entry in bank["questions"] if entry["difficulty"] == difficulty)
+        unserved = self._unserved(bank, self._served_counts(document_id), difficulty)
+        return min(self.target - unserved, self.max_per_difficulty - size)
+    
+    def _claim_fill(self, document_id: str) -> bool:
+        """
+        Take a document's fill lease, recorded in its bank file.
+        
+        Returns:
+            False if another process holds an unexpired lease or the document
+            no longer exists
+        """
+        with self._locked(document_id):
+            if not document_service.has_document(document_id):
+                return False
+            
+            bank = self._load(document_id)
+            lease = bank.get("fill_lease")
+            now = time.time()
+            if lease and lease["pid"] != os.getpid() and lease["expires_at"] > now:
+                return False
+            
+            bank["fill_lease"] = {"pid": os.getpid(), "expires_at": now + self.fill_lease_seconds}
+            self._save(bank)
+            return True
+    
+    def _release_fill(self, document_id: str):
+        """Give up this process's fill lease, if the bank still has it."""
+        try:
+            with self._locked(document_id):
+                bank = self._load(document_id)
+                lease = bank.get("fill_lease")
+                if lease and lease["pid"] == os.getpid():
+                    del bank["fill_lease"]
+                    self._save(bank)
+        except Exception as e:
+            print(f"Error releasing question bank fill for document {document_id}: {str(e)}")
+    
+    def _choose(self,
+                document_id: str,
+                eligible: List[Dict[str, Any]],
+                num_questions: int,
+                served: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Pick questions round-robin across sections, least-served first, skipping near-duplicates of picks."""
+        index = self.index(document_id)
+        picked = NearDuplicateIndex(index.threshold, index.answer_overlap)
+        
+        # Least-served first within each section, ties broken at random
+        by_section: Dict[Any, List[Dict[str, Any]]] = {}
+        for entry in sorted(eligible, key=lambda entry: (served.get(entry["id"], 0), random.random())):
+            by_section.setdefault(entry.get("section"), []).append(entry)
+        
+        chosen = []
+        queues = list(by_section.values())
+        random.shuffle(queues)
+        while queues and len(chosen) < num_questions:
+            for queue in queues:
+                if len(chosen) >= num_questions:
+                    break
+                entry = queue.pop(0)
+                signature = index.signature(entry["id"])
+                if signature is None:
+                    signature = index.add(entry["id"], signature=question_signature(entry))
+                if picked.match(signature):
+                    continue
+                picked.add(entry["id"], signature=signature)
+                chosen.append(entry)
+            queues = [queue for queue in queues if queue]
+        
+        return chosen
+    
+    def _unserved(self, bank: Dict[str, Any], served: Dict[str, int], difficulty: str) -> int:
+        """Number of questions of a difficulty that have never been served."""
+        return sum(
+            1 for entry in bank["questions"]
+            if entry["difficulty"] == difficulty and not served.get(entry["id"])
+        )
+    
+    def _served_counts(self, document_id: str) -> Dict[str, int]:
+        """How often each served question of a document has been served, by question ID."""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT question_id, served_count FROM question_serves WHERE document_id = ?",
+                (document_id,)
+            ).fetchall()
+        return dict(rows)
+    
+    def _recent(self, document_id: str, difficulty: str) -> List[str]:
+        """IDs of the most recently served questions of a difficulty."""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT question_id FROM question_serves WHERE document_id = ? AND difficulty = ? "
+                "ORDER BY last_served_at DESC LIMIT ?",
+                (document_id, difficulty, self.recent_window)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def _mark_served(self, document_id: str, difficulty: str, entries: List[Dict[str, Any]]):
+        """Count a serve for each entry, which also makes them the most recently served."""
+        if not entries:
+            return
+        now = time.time()
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT INTO question_serves (document_id, question_id, difficulty, served_count, last_served_at) "
+                "VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (document_id, question_id) DO UPDATE SET "
+                "served_count = served_count + 1, last_served_at = excluded.last_served_at",
+                [(document_id, entry["id"], difficulty, now) for entry in entries]
+            )
+            self._db.commit()
+    
+    def _import_serves(self, bank: Dict[str, Any]):
+        """Move serve counts kept in a bank file by earlier versions into the database."""
+        rows = [
+            (bank["document_id"], entry["id"], entry["difficulty"], entry["served_count"], entry.get("last_served_at") or 0.0)
+            for entry in bank["questions"] if entry.get("served_count")
+        ]
+        for entry in bank["questions"]:
+            entry.pop("served_count", None)
+            entry.pop("last_served_at", None)
+        bank.pop("recent", None)
+        if not rows:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO question_serves "
+                "(document_id, question_id, difficulty, served_count, last_served_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+    
+    def _path(self, document_id: str) -> str:
+        """Path of a document's bank file."""
+        return os.path.join(self.bank_dir, f"{document_id}.json")
+    
+    def _load(self, document_id: str) -> Dict[str, Any]:
+        """Return a document's bank, reading it from disk on first use and whenever another process has replaced it."""
+        bank_file = self._path(document_id)
+        try:
+            version = self._version(bank_file)
+        except FileNotFoundError:
+            # Never saved, or deleted by another process. Not cached until it is
+            # first saved, so lookups of unknown documents leave nothing behind
+            self._forget(document_id)
+            return {"document_id": document_id, "updated_at": None, "questions": []}
+        
+        bank = self._banks.get(document_id)
+        if bank is not None and self._versions.get(document_id) == version:
+            return bank
+        if bank is not None:
+            self.counters["reloads"] += 1
+        
+        try:
+            with open(bank_file, "r", encoding="utf-8") as f:
+                bank = json.load(f)
+        except Exception as e:
+            print(f"Error loading question bank for document {document_id}: {str(e)}")
+            bank = {"document_id": document_id, "updated_at": None, "questions": []}
+        
+        if "recent" in bank:
+            self._import_serves(bank)
+        self._banks[document_id] = bank
+        self._versions[document_id] = version
+        # The index is rebuilt from the new contents on next use
+        self._indexes.pop(document_id, None)
+        return bank
+    
+    def _save(self, bank: Dict[str, Any]):
+        """Write a bank to disk atomically; callers hold the bank lock."""
+        bank["updated_at"] = time.time()
+        document_id = bank["document_id"]
+        self._banks[document_id] = bank
+        bank_file = self._path(document_id)
+        # Each process writes its own temporary file
+        temp_file = f"{bank_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(bank, f, ensure_ascii=False)
+            os.replace(temp_file, bank_file)
+            self._versions[document_id] = self._version(bank_file)
+        except Exception as e:
+            print(f"Error saving question bank for document {document_id}: {str(e)}")
+    
+    def _version(self, bank_file: str) -> Tuple[int, int, int]:
+        """Identify the current contents of a bank file; every save replaces the file, so this changes."""
+        status = os.stat(bank_file)
+        return (status.st_ino, status.st_mtime_ns, status.st_size)
+    
+    def _forget(self, document_id: str):
+        """Drop a bank and its index from memory."""
+        self._banks.pop(document_id, None)
+        self._versions.pop(document_id, None)
+        self._indexes.pop(document_id, None)
+    
+    @contextmanager
+    def _locked(self, document_id: str) -> Iterator[None]:
+        """
+        Hold a document's bank lock, so changes made by different threads and processes do not interleave.
+        
+        Each change is a short read-modify-write of one bank file, so the lock
+        is only ever held briefly, and changes to other documents' banks
+        never wait for it.
+        """
+        with self._document_locks.setdefault(document_id, threading.Lock()):
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.bank_dir, f"{document_id}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Create a singleton instance
+question_bank = QuestionBank()
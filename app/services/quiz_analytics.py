@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get quiz analytics configuration from environment variables
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+QUIZ_ANALYTICS_DB = os.getenv("QUIZ_ANALYTICS_DB", os.path.join(OUTPUT_DIR, "quiz_analytics.db"))
+
+# Scores are percentages, counted in bins of this width (the last bin includes 100)
+HISTOGRAM_BIN_WIDTH = 10
+HISTOGRAM_BINS = 100 // HISTOGRAM_BIN_WIDTH
+
+
+def new_aggregate() -> Dict[str, Any]:
+    """An aggregate of no results."""
+    return {
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "min_score": None,
+        "max_score": None,
+        "histogram": [0] * HISTOGRAM_BINS,
+        "questions": [],
+        "updated_at": None
+    }
+
+
+def update_aggregate(aggregate: Dict[str, Any],
+                     score: float,
+                     user_answers: Sequence[str],
+                     answer_key: Optional[Sequence[Optional[str]]] = None):
+    """
+    Add one result to an aggregate in place.
+    
+    The mean and variance are kept with Welford's method, so they stay
+    accurate however many results are added. Per-question counts are only
+    kept when the answer key is given.
+    
+    Args:
+        aggregate: The aggregate to update
+        score: The result's score, in percent
+        user_answers: The answers given
+        answer_key: The correct answer of each question
+    """
+    aggregate["count"] += 1
+    delta = score - aggregate["mean"]
+    aggregate["mean"] += delta / aggregate["count"]
+    aggregate["m2"] += delta * (score - aggregate["mean"])
+    aggregate["min_score"] = score if aggregate["min_score"] is None else min(aggregate["min_score"], score)
+    aggregate["max_score"] = score if aggregate["max_score"] is None else max(aggregate["max_score"], score)
+    aggregate["histogram"][min(int(score // HISTOGRAM_BIN_WIDTH), HISTOGRAM_BINS - 1)] += 1
+    
+    if answer_key is not None:
+        questions = aggregate["questions"]
+        while len(questions) < len(answer_key):
+            questions.append({"answered": 0, "correct": 0, "options": {}})
+        for question, user_answer, correct_answer in zip(questions, user_answers, answer_key):
+            question["answered"] += 1
+            if correct_answer is not None and user_answer == correct_answer:
+                question["correct"] += 1
+            question["options"][user_answer] = question["options"].get(user_answer, 0) + 1
+
+
+def aggregate_view(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary statistics of an aggregate, as served by the API."""
+    count = aggregate["count"]
+    variance = aggregate["m2"] / count if count else 0.0
+    return {
+        "count": count,
+        "mean_score": aggregate["mean"],
+        "variance": variance,
+        "std_score": variance ** 0.5,
+        "min_score": aggregate["min_score"],
+        "max_score": aggregate["max_score"],
+        "histogram": {
+            "bin_width": HISTOGRAM_BIN_WIDTH,
+            "counts": aggregate["histogram"]
+        },
+        "questions": [
+            {
+                "question_number": i + 1,
+                "answered": question["answered"],
+                "correct_rate": question["correct"] / question["answered"] if question["answered"] else None,
+                "option_counts": question["options"]
+            }
+            for i, question in enumerate(aggregate["questions"])
+        ],
+        "updated_at": aggregate["updated_at"]
+    }
+
+
+class QuizAnalytics:
+    """
+    Running score aggregates per quiz and per document.
+    
+    Each aggregate is one row in SQLite, updated in one small transaction
+    for every batch of saved results, so reading one is a single
+    primary-key lookup no matter how many results exist. Quiz aggregates
+    also count correct answers and option selections per question; document
+    aggregates cover every quiz on the document and only keep score
+    statistics, since their quizzes have different questions.
+    
+    Updates read the stored row inside the write transaction, so several
+    server processes can share the database without losing updates.
+    """
+    
+    def __init__(self, db_path: str = QUIZ_ANALYTICS_DB):
+        """Open the analytics database, creating the table if needed."""
+        self.db_path = db_path
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
+        self._write_lock = threading.Lock()
+        # Writes run off the event loop; reads use their own connection on the loop
+        self._db = self._connect()
+        self._reader = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_analytics ("
+            "scope TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "aggregate TEXT NOT NULL, "
+            "PRIMARY KEY (scope, key))"
+        )
+        self._db.commit()
+        
+        self.counters = {
+            "results_recorded": 0,
+            "updates": 0,
+            "update_errors": 0,
+            "rebuilds": 0
+        }
+    
+    async def record(self,
+                     quiz_id: str,
+                     document_id: Optional[str],
+                     answer_key: Sequence[Optional[str]],
+                     results: List[Dict[str, Any]]):
+        """
+        Add saved results to the quiz and document aggregates.
+        
+        Args:
+            quiz_id: The unique identifier of the quiz
+            document_id: The document the quiz was generated from
+            answer_key: The correct answer of each question
+            results: The results, each with score and user_answers
+        """
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._record, quiz_id, document_id, answer_key, results
+            )
+        except Exception:
+            self.counters["update_errors"] += 1
+            raise
+        
+        self.counters["results_recorded"] += len(results)
+        self.counters["updates"] += 1
+    
+    def get(self, scope: str, key: str) -> Dict[str, Any]:
+        """
+        Read the aggregate of a quiz or document.
+        
+        Args:
+            scope: "quiz" or "document"
+            key: The quiz or document ID
+        
+        Returns:
+            The summary statistics, with a count of 0 if no results were recorded
+        """
+        row = self._reader.execute(
+            "SELECT aggregate FROM quiz_analytics WHERE scope = ? AND key = ?", (scope, key)
+        ).fetchone()
+        return aggregate_view(json.loads(row[0]) if row else new_aggregate())
+    
+    def rebuild(self,
+                results: Iterable[Dict[str, Any]],
+                lookup: Callable[[str], Optional[Tuple[Optional[str], Sequence[Optional[str]]]]]) -> Dict[str, int]:
+        """
+        Recompute every aggregate from stored results in a single pass.
+        
+        Only the aggregates are held in memory, so results can be streamed
+        from the result store. The old aggregates are replaced in one
+        transaction.
+        
+        Args:
+            results: Every stored result, in submission order
+            lookup: Returns (document_id, answer_key) for a quiz ID, or None
+                if the quiz no longer exists
+        
+        Returns:
+            The number of results, quizzes and documents aggregated
+        """
+        aggregates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        quizzes: Dict[str, Any] = {}
+        count = 0
+        
+        for result in results:
+            quiz_id = result["quiz_id"]
+            if quiz_id not in quizzes:
+                quizzes[quiz_id] = lookup(quiz_id)
+            document_id, answer_key = quizzes[quiz_id] or (None, None)
+            
+            aggregate = aggregates.setdefault(("quiz", quiz_id), new_aggregate())
+            update_aggregate(aggregate, result["score"], result["user_answers"], answer_key)
+            if document_id:
+                aggregate = aggregates.setdefault(("document", document_id), new_aggregate())
+                update_aggregate(aggregate, result["score"], result["user_answers"])
+            count += 1
+        
+        now = time.time()
+        for aggregate in aggregates.values():
+            aggregate["updated_at"] = now
+        
+        with self._write_lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("DELETE FROM quiz_analytics")
+                self._db.executemany(
+                    "INSERT INTO quiz_analytics (scope, key, aggregate) VALUES (?, ?, ?)",
+                    [(scope, key, json.dumps(aggregate, ensure_ascii=False)) for (scope, key), aggregate in aggregates.items()]
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        
+        self.counters["rebuilds"] += 1
+        return {
+            "results": count,
+            "quizzes": sum(1 for scope, _ in aggregates if scope == "quiz"),
+            "documents": sum(1 for scope, _ in aggregates if scope == "document")
+        }
+    
+    def reconnect(self):
+        """Open a new analytics connection in a forked worker."""
+        self._db = self._connect()
+        self._reader = self._connect()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return update counters."""
+        return dict(self.counters)
+    
+    def _record(self,
+                quiz_id: str,
+                document_id: Optional[str],
+                answer_key: Sequence[Optional[str]],
+                results: List[Dict[str, Any]]):
+        """Read, update and write both aggregates in one transaction."""
+        now = time.time()
+        with self._write_lock:
+            try:
+                # Take the write lock up front so concurrent writers cannot interleave read and write
+                self._db.execute("BEGIN IMMEDIATE")
+                for scope, key, key_for_questions in (("quiz", quiz_id, answer_key), ("document", document_id, None)):
+                    if not key:
+                        continue
+                    row = self._db.execute(
+                        "SELECT aggregate FROM quiz_analytics WHERE scope = ? AND key = ?", (scope, key)
+                    ).fetchone()
+                    aggregate = json.loads(row[0]) if row else new_aggregate()
+                    for result in results:
+                        update_aggregate(aggregate, result["score"], result["user_answers"], key_for_questions)
+                    aggregate["updated_at"] = now
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO quiz_analytics (scope, key, aggregate) VALUES (?, ?, ?)",
+                        (scope, key, json.dumps(aggregate, ensure_ascii=False))
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode, managing transactions explicitly."""
+        db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+# Create a singleton instance
+quiz_analytics = QuizAnalytics()
@@ -0,0 +1,122 @@
+import os
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.conditional import strong_etag
+
+# Load environment variables
+load_dotenv()
+
+# Get quiz cache configuration from environment variables
+QUIZ_CACHE_SIZE = int(os.getenv("QUIZ_CACHE_SIZE", "256"))
+
+# Question fields hidden from students until they submit
+ANSWER_FIELDS = ("correct_answer", "explanation")
+
+
+class CachedQuiz:
+    """
+    A parsed quiz with its pre-built views.
+    
+    The views are shared by every request and must not be modified. The
+    JSON encodings can be sent as response bodies as they are, with their
+    entity tags for conditional requests.
+    """
+    
+    __slots__ = ("quiz_id", "full", "public", "answer_key", "full_json", "public_json", "full_etag", "public_etag")
+    
+    def __init__(self, quiz: Dict[str, Any]):
+        """Build the full and answer-stripped views of a quiz."""
+        questions = quiz.get("questions", [])
+        
+        self.quiz_id: str = quiz["quiz_id"]
+        self.full: Dict[str, Any] = quiz
+        self.public: Dict[str, Any] = {
+            **quiz,
+            "questions": [
+                {field: value for field, value in question.items() if field not in ANSWER_FIELDS}
+                for question in questions
+            ]
+        }
+        self.answer_key: Tuple[Optional[str], ...] = tuple(question.get("correct_answer") for question in questions)
+        self.full_json: bytes = json.dumps(self.full, ensure_ascii=False).encode("utf-8")
+        self.public_json: bytes = json.dumps(self.public, ensure_ascii=False).encode("utf-8")
+        self.full_etag: str = strong_etag(self.full_json)
+        self.public_etag: str = strong_etag(self.public_json)
+    
+    @property
+    def num_questions(self) -> int:
+        """Number of questions in the quiz."""
+        return len(self.answer_key)
+
+
+class QuizCache:
+    """
+    Bounded least-recently-used cache of parsed quizzes.
+    
+    Saving a quiz invalidates its entry, so readers never see a stale
+    version. Quizzes are not modified after generation, so in practice
+    entries only leave the cache when it is full.
+    """
+    
+    def __init__(self, max_entries: int = QUIZ_CACHE_SIZE):
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedQuiz]" = OrderedDict()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+    
+    def get(self, quiz_id: str) -> Optional[CachedQuiz]:
+        """Return a cached quiz, or None if it is not cached."""
+        cached = self._entries.get(quiz_id)
+        if cached is None:
+            self.counters["misses"] += 1
+            return None
+        
+        self._entries.move_to_end(quiz_id)
+        self.counters["hits"] += 1
+        return cached
+    
+    def put(self, quiz: Dict[str, Any]) -> CachedQuiz:
+        """
+        Cache a parsed quiz, evicting the least recently used entries beyond the limit.
+        
+        Args:
+            quiz: The quiz as read from storage; it must not be modified afterwards
+        
+        Returns:
+            The cached quiz
+        """
+        cached = CachedQuiz(quiz)
+        self._entries[cached.quiz_id] = cached
+        self._entries.move_to_end(cached.quiz_id)
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+        
+        return cached
+    
+    def invalidate(self, quiz_id: str):
+        """Drop a quiz from the cache after it has been written."""
+        if self._entries.pop(quiz_id, None) is not None:
+            self.counters["invalidations"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit, miss and eviction counts."""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0
+        }
+
+# Create a singleton instance
+quiz_cache = QuizCache()
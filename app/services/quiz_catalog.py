@@ -0,0 +1,179 @@
+import os
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.pagination import InvalidListQueryError, keyset_page, parse_fields
+
+# Load environment variables
+load_dotenv()
+
+# Get quiz catalog configuration from environment variables
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+QUIZ_CATALOG_DB = os.getenv("QUIZ_CATALOG_DB", os.path.join(OUTPUT_DIR, "quiz_catalog.db"))
+
+# Columns returned for each quiz in list views
+CATALOG_FIELDS = ("quiz_id", "document_id", "generated_at", "difficulty", "num_questions")
+
+# Columns quizzes can be listed in order of
+SORT_KEYS = ("generated_at", "num_questions")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class QuizCatalog:
+    """
+    Indexed catalog of quiz metadata, so listing does not read quiz files.
+    
+    Quizzes are still stored as JSON files; the catalog keeps one row per
+    quiz in SQLite, indexed by document and generation time. Lists are
+    returned newest first with keyset (cursor) pagination, so the cost of a
+    page depends only on its size, not on how many quizzes exist. Lists can
+    also be sorted by size, filtered by document, difficulty and generation
+    date, and projected to a subset of fields.
+    """
+    
+    def __init__(self, db_path: str = QUIZ_CATALOG_DB):
+        """Open the catalog database, creating the table and indexes if needed."""
+        self.db_path = db_path
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_catalog ("
+            "quiz_id TEXT PRIMARY KEY, "
+            "document_id TEXT NOT NULL, "
+            "generated_at TEXT NOT NULL, "
+            "difficulty TEXT, "
+            "num_questions INTEGER)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_quiz_catalog_generated_at ON quiz_catalog (generated_at, quiz_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_quiz_catalog_document ON quiz_catalog (document_id, generated_at, quiz_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_quiz_catalog_difficulty ON quiz_catalog (difficulty, generated_at, quiz_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_quiz_catalog_num_questions ON quiz_catalog (num_questions, quiz_id)"
+        )
+        self._db.commit()
+    
+    def upsert(self, quiz: Dict[str, Any]):
+        """
+        Add or update a quiz's catalog entry.
+        
+        Args:
+            quiz: The quiz, or at least its metadata fields
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO quiz_catalog (quiz_id, document_id, generated_at, difficulty, num_questions) "
+            "VALUES (?, ?, ?, ?, ?)",
+            tuple(quiz.get(field) for field in CATALOG_FIELDS)
+        )
+        self._db.commit()
+    
+    def delete(self, quiz_id: str) -> bool:
+        """
+        Remove a quiz's catalog entry.
+        
+        Returns:
+            True if the quiz was catalogued
+        """
+        cursor = self._db.execute("DELETE FROM quiz_catalog WHERE quiz_id = ?", (quiz_id,))
+        self._db.commit()
+        return cursor.rowcount > 0
+    
+    def reconnect(self):
+        """Open a new catalog connection in a forked worker."""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    def list_quizzes(self,
+                     document_id: Optional[str] = None,
+                     limit: int = DEFAULT_PAGE_SIZE,
+                     cursor: Optional[str] = None,
+                     difficulty: Optional[str] = None,
+                     generated_from: Optional[str] = None,
+                     generated_to: Optional[str] = None,
+                     sort: str = "generated_at",
+                     order: str = "desc",
+                     fields: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List quiz metadata one page at a time, newest first by default.
+        
+        Args:
+            document_id: Only list quizzes for this document
+            limit: Maximum quizzes to return
+            cursor: The next_cursor of the previous page
+            difficulty: Only list quizzes of this difficulty
+            generated_from: Only list quizzes generated at or after this ISO date or time
+            generated_to: Only list quizzes generated before this ISO date or time
+            sort: Column to sort by (generated_at or num_questions)
+            order: "asc" or "desc"
+            fields: Comma-separated fields to return (all by default)
+        
+        Returns:
+            (quizzes, next_cursor), where next_cursor is None on the last page
+        """
+        if sort not in SORT_KEYS:
+            raise InvalidListQueryError(f"Unknown sort key: {sort}. Available sort keys: {', '.join(SORT_KEYS)}")
+        
+        conditions = []
+        params: List[Any] = []
+        for condition, value in (("document_id = ?", document_id),
+                                 ("difficulty = ?", difficulty),
+                                 ("generated_at >= ?", generated_from),
+                                 ("generated_at < ?", generated_to)):
+            if value:
+                conditions.append(condition)
+                params.append(value)
+        
+        return keyset_page(
+            self._db, "quiz_catalog", parse_fields(fields, CATALOG_FIELDS), "quiz_id",
+            sort, order, conditions, params, max(1, min(limit, MAX_PAGE_SIZE)), cursor
+        )
+    
+    def count(self, document_id: Optional[str] = None) -> int:
+        """Number of catalogued quizzes, optionally for one document."""
+        if document_id:
+            row = self._db.execute("SELECT COUNT(*) FROM quiz_catalog WHERE document_id = ?", (document_id,)).fetchone()
+        else:
+            row = self._db.execute("SELECT COUNT(*) FROM quiz_catalog").fetchone()
+        return row[0]
+    
+    def rebuild(self, quiz_dir: str) -> int:
+        """
+        Catalog every quiz file in a directory, replacing existing entries.
+        
+        Used once to populate the catalog for quizzes saved before it existed.
+        
+        Returns:
+            The number of quizzes catalogued
+        """
+        rows = []
+        for filename in os.listdir(quiz_dir):
+            if not filename.endswith(".json") or filename.startswith("result_"):
+                continue
+            try:
+                with open(os.path.join(quiz_dir, filename), "r", encoding="utf-8") as f:
+                    quiz = json.load(f)
+                rows.append(tuple(quiz.get(field) for field in CATALOG_FIELDS))
+            except Exception as e:
+                print(f"Error cataloguing quiz file {filename}: {str(e)}")
+        
+        self._db.executemany(
+            "INSERT OR REPLACE INTO quiz_catalog (quiz_id, document_id, generated_at, difficulty, num_questions) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self._db.commit()
+        return len(rows)
+
+# Create a singleton instance
+quiz_catalog = QuizCatalog()
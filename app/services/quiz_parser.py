@@ -0,0 +1,170 @@
+import re
+import json
+from typing import Any, Dict, List, Optional
+
+# Matches option-style answers such as "A", "A.", "A)" or "A. The statement..."
+ANSWER_LETTER_PATTERN = re.compile(r"^\s*\(?([A-Da-d])(?:[.):\s]|$)")
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for a JSON array of quiz questions in an LLM token stream.
+    
+    Text is fed in as it arrives. Each top-level object becomes available as
+    soon as its closing brace has been seen, without waiting for the rest of
+    the array. Brace matching ignores braces inside strings, and anything
+    outside objects (code fences, prose, the array brackets) is skipped.
+    
+    Objects that are not valid JSON are repaired where possible (comments
+    echoed from the prompt, trailing commas); objects that still cannot be
+    parsed, or that do not look like a question, are dropped without
+    affecting the others. A truncated final object is dropped too.
+    """
+    
+    def __init__(self):
+        """Initialize an empty parser."""
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+        self.parsed = 0
+        self.rejected = 0
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add text from the stream.
+        
+        Args:
+            text: The next chunk of model output
+        
+        Returns:
+            Questions completed by this chunk, in order
+        """
+        self._buffer += text
+        questions = []
+        
+        for i in range(self._position, len(self._buffer)):
+            char = self._buffer[i]
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"' and self._depth > 0:
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    question = self._parse_object(self._buffer[self._object_start:i + 1])
+                    if question is not None:
+                        questions.append(question)
+                    self._object_start = None
+        
+        # Keep only the unfinished object, so the buffer stays small
+        if self._object_start is not None:
+            self._buffer = self._buffer[self._object_start:]
+            self._object_start = 0
+        else:
+            self._buffer = ""
+        self._position = len(self._buffer)
+        
+        return questions
+    
+    def _parse_object(self, text: str) -> Optional[Dict[str, Any]]:
+        """Parse, repair and validate one object."""
+        for candidate in (text, repair_json(text)):
+            try:
+                obj = json.loads(candidate, strict=False)
+            except json.JSONDecodeError:
+                continue
+            question = normalize_question(obj)
+            if question is not None:
+                self.parsed += 1
+                return question
+            break
+        
+        self.rejected += 1
+        return None
+
+
+def repair_json(text: str) -> str:
+    """Remove comments outside strings and trailing commas, the most common LLM JSON slips."""
+    repaired = []
+    in_string = False
+    escaped = False
+    i = 0
+    
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            repaired.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            i += 1
+            continue
+        
+        if char == '"':
+            in_string = True
+        elif char == "#" or text.startswith("//", i):
+            # Skip to the end of the line
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end
+            continue
+        
+        repaired.append(char)
+        i += 1
+    
+    return re.sub(r",(\s*[}\]])", r"\1", "".join(repaired))
+
+
+def normalize_question(obj: Any) -> Optional[Dict[str, Any]]:
+    """
+    Check that an object is a usable question and tidy its answer.
+    
+    Returns:
+        The question with correct_answer reduced to its option letter, or
+        None if the object has no question text or fewer than two options
+    """
+    if not isinstance(obj, dict):
+        return None
+    if not isinstance(obj.get("question"), str) or not obj["question"].strip():
+        return None
+    options = obj.get("options")
+    if not isinstance(options, list) or len(options) < 2:
+        return None
+    
+    answer = obj.get("correct_answer")
+    if isinstance(answer, str):
+        match = ANSWER_LETTER_PATTERN.match(answer)
+        if match:
+            obj["correct_answer"] = match.group(1).upper()
+    
+    return obj
+
+
+def parse_quiz_questions(text: str) -> List[Dict[str, Any]]:
+    """
+    Recover every valid question from a complete model response.
+    
+    Args:
+        text: The full model output
+    
+    Returns:
+        The questions that could be parsed, in order
+    """
+    return QuizStreamParser().feed(text)
@@ -0,0 +1,283 @@
+import os
+import math
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+from dotenv import load_dotenv
+
+from app.services.llm_service import llm_service, QUIZ_CONTENT_CHARS
+from app.services.near_duplicates import NearDuplicateIndex, question_signature, NEAR_DUPLICATE_THRESHOLD
+
+# Load environment variables
+load_dotenv()
+
+# Get quiz pipeline configuration from environment variables
+QUIZ_MAX_SECTIONS = int(os.getenv("QUIZ_MAX_SECTIONS", "8"))
+QUIZ_OVERSAMPLE = float(os.getenv("QUIZ_OVERSAMPLE", "1.5"))
+
+# Fewest candidate questions requested from a section
+MIN_QUESTIONS_PER_SECTION = 2
+
+
+def split_sections(content: str,
+                   section_chars: int = QUIZ_CONTENT_CHARS,
+                   max_sections: int = QUIZ_MAX_SECTIONS) -> List[str]:
+    """
+    Split a document into sections spread evenly across it.
+    
+    Each section is at most section_chars long, the amount a single quiz
+    prompt carries. Documents longer than max_sections sections are covered
+    by windows taken at evenly spaced points, starting at paragraph breaks
+    where possible.
+    
+    Args:
+        content: The document text
+        section_chars: Maximum characters per section
+        max_sections: Maximum number of sections
+    
+    Returns:
+        The sections in document order
+    """
+    content = content.strip()
+    if len(content) <= section_chars:
+        return [content] if content else []
+    
+    count = min(max_sections, math.ceil(len(content) / section_chars))
+    span = len(content) / count
+    sections = []
+    
+    for i in range(count):
+        start = int(i * span)
+        if i > 0:
+            # Start at the next paragraph or sentence break within the first quarter of the span
+            window = content[start:start + int(span / 4)]
+            for separator in ("\n\n", ". ", "\n"):
+                position = window.find(separator)
+                if position != -1:
+                    start += position + len(separator)
+                    break
+        end = min(start + section_chars, int((i + 1) * span))
+        section = content[start:end]
+        
+        # Do not cut the last sentence in half if a break is reasonably close
+        if end < len(content):
+            cut = section.rfind(". ")
+            if cut > len(section) // 2:
+                section = section[:cut + 1]
+        
+        section = section.strip()
+        if section:
+            sections.append(section)
+    
+    return sections
+
+
+class QuizPipeline:
+    """
+    Map-reduce quiz generation over a whole document.
+    
+    The document is split into sections and candidate questions are
+    generated for every section concurrently (the LLM scheduler still bounds
+    the upstream load), so the wall-clock time stays close to that of a
+    single call. Candidates are deduplicated and the requested number is
+    selected with a quota per section, so the quiz covers the whole document
+    rather than its first pages. Each question records the section it was
+    generated from.
+    
+    Callers can pass an index of the questions the document already has
+    (its question bank); candidates that repeat one of them are only used
+    when nothing else is left to fill the quiz.
+    """
+    
+    def __init__(self,
+                 section_chars: int = QUIZ_CONTENT_CHARS,
+                 max_sections: int = QUIZ_MAX_SECTIONS,
+                 oversample: float = QUIZ_OVERSAMPLE,
+                 duplicate_similarity: float = NEAR_DUPLICATE_THRESHOLD):
+        """Initialize the pipeline settings."""
+        self.section_chars = section_chars
+        self.max_sections = max_sections
+        self.oversample = oversample
+        self.duplicate_similarity = duplicate_similarity
+        self.counters = {
+            "duplicates_dropped": 0,
+            "repeats_avoided": 0
+        }
+    
+    def sections(self, content: str) -> List[str]:
+        """Split a document into the sections questions are generated from."""
+        return split_sections(content, self.section_chars, self.max_sections)
+    
+    async def generate(self,
+                       content: str,
+                       num_questions: int = 5,
+                       difficulty: str = "medium",
+                       existing: Optional[NearDuplicateIndex] = None) -> List[Dict[str, Any]]:
+        """
+        Generate a quiz covering the whole document.
+        
+        Args:
+            content: The document text
+            num_questions: Number of questions to select
+            difficulty: Difficulty level (easy, medium, hard)
+            existing: Index of questions the document already has
+        
+        Returns:
+            The selected questions in document order, or a single error entry
+            if no section produced a usable question
+        """
+        questions = []
+        error = None
+        async for event in self.stream(content, num_questions, difficulty, existing):
+            if event["type"] == "question":
+                questions.append(event["question"])
+            else:
+                error = event["error"]
+        
+        if not questions:
+            return [{"error": error or "No questions were generated"}]
+        
+        questions.sort(key=lambda question: question["section"])
+        return questions
+    
+    async def stream(self,
+                     content: str,
+                     num_questions: int = 5,
+                     difficulty: str = "medium",
+                     existing: Optional[NearDuplicateIndex] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a quiz covering the whole document, yielding questions as sections finish.
+        
+        Each section may contribute up to its share of the quiz as soon as its
+        candidates arrive. Once every section has finished, any shortfall (from
+        failed sections or duplicates) is filled from the remaining candidates,
+        and only then from candidates that repeat an existing question.
+        
+        Args:
+            content: The document text
+            num_questions: Number of questions to select
+            difficulty: Difficulty level (easy, medium, hard)
+            existing: Index of questions the document already has
+        
+        Yields:
+            {"type": "question", "question": {...}} for each selected question,
+            then {"type": "error", "error": "..."} if none could be generated
+        """
+        sections = self.sections(content)
+        if not sections:
+            yield {"type": "error", "error": "Document has no content"}
+            return
+        
+        quotas = self._quotas(num_questions, len(sections))
+        if len(sections) == 1:
+            per_section = num_questions
+        else:
+            # Ask for a few extra so duplicates across sections can be dropped
+            per_section = max(MIN_QUESTIONS_PER_SECTION, math.ceil(num_questions * self.oversample / len(sections)))
+        
+        tasks = [
+            asyncio.ensure_future(self._generate_section(index, section, per_section, difficulty))
+            for index, section in enumerate(sections)
+        ]
+        
+        seen = NearDuplicateIndex(self.duplicate_similarity)
+        leftovers: List[Dict[str, Any]] = []
+        repeats: List[Dict[str, Any]] = []
+        selected = 0
+        error = None
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, candidates, section_error = await next_done
+                error = section_error or error
+                
+                taken = 0
+                for question in candidates:
+                    signature = question_signature(question)
+                    if seen.match(signature):
+                        self.counters["duplicates_dropped"] += 1
+                        continue
+                    if existing is not None and existing.match(signature):
+                        repeats.append(question)
+                    elif taken < quotas[index] and selected < num_questions:
+                        seen.add(len(seen), signature=signature)
+                        taken += 1
+                        selected += 1
+                        yield {"type": "question", "question": question}
+                    else:
+                        leftovers.append(question)
+        finally:
+            # Stop generating sections nobody will read if the caller goes away
+            for task in tasks:
+                task.cancel()
+        
+        # Fill any shortfall, spreading picks across sections in document order, repeats last
+        repeats_used = 0
+        for fill in (leftovers, repeats):
+            fill.sort(key=lambda question: question["section"])
+            for question in self._interleave(fill):
+                if selected >= num_questions:
+                    break
+                signature = question_signature(question)
+                if seen.match(signature):
+                    continue
+                seen.add(len(seen), signature=signature)
+                selected += 1
+                if fill is repeats:
+                    repeats_used += 1
+                yield {"type": "question", "question": question}
+        
+        self.counters["repeats_avoided"] += len(repeats) - repeats_used
+        
+        if not selected:
+            yield {"type": "error", "error": error or "Failed to parse LLM response as JSON"}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return duplicate and repeat counters."""
+        return {
+            "duplicate_similarity": self.duplicate_similarity,
+            **self.counters
+        }
+    
+    async def _generate_section(self,
+                                index: int,
+                                section: str,
+                                num_questions: int,
+                                difficulty: str):
+        """Generate candidate questions for one section, tagging each with the section index."""
+        questions = await llm_service.generate_quiz_questions(section, num_questions, difficulty)
+        
+        candidates = []
+        error = None
+        for question in questions:
+            if "error" in question:
+                error = question["error"]
+                continue
+            question["section"] = index
+            candidates.append(question)
+        
+        return index, candidates, error
+    
+    def _quotas(self, num_questions: int, num_sections: int) -> List[int]:
+        """Share the questions across sections as evenly as possible, spreading the remainder out."""
+        quotas = [num_questions // num_sections] * num_sections
+        remainder = num_questions - sum(quotas)
+        for i in range(remainder):
+            quotas[i * num_sections // remainder] += 1
+        return quotas
+    
+    def _interleave(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order questions round-robin by section, so fills do not cluster in one section."""
+        by_section: Dict[int, List[Dict[str, Any]]] = {}
+        for question in questions:
+            by_section.setdefault(question["section"], []).append(question)
+        
+        ordered = []
+        queues = list(by_section.values())
+        while queues:
+            for queue in queues:
+                ordered.append(queue.pop(0))
+            queues = [queue for queue in queues if queue]
+        return ordered
+
+# Create a singleton instance
+quiz_pipeline = QuizPipeline()
@@ -1,12 +1,20 @@
 import os
 import json
 import uuid
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, AsyncIterator
 from datetime import datetime
 from dotenv import load_dotenv
 
 from app.services.llm_service import llm_service
 from app.services.document_service import document_service
+from app.services.quiz_pipeline import quiz_pipeline
+from app.services.question_bank import question_bank
+from app.services.quiz_cache import quiz_cache, CachedQuiz
+from app.services.quiz_catalog import quiz_catalog, DEFAULT_PAGE_SIZE
+from app.services.result_store import result_store
+from app.services.bulk_grading import bulk_grader
+from app.services.quiz_analytics import quiz_analytics
 
 # Load environment variables
 load_dotenv()
@@ -14,14 +22,20 @@ load_dotenv()
 # Get output directory from environment variables
 OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
 QUIZ_DIR = os.path.join(OUTPUT_DIR, "quizzes")
+RESULTS_DIR = os.path.join(OUTPUT_DIR, "quiz_results")
 
-# Ensure the quiz directory exists
+# Ensure the quiz and results directories exist
 os.makedirs(QUIZ_DIR, exist_ok=True)
+os.makedirs(RESULTS_DIR, exist_ok=True)
 
 
 class QuizService:
     """Service for generating and managing quizzes."""
     
+    def __init__(self):
+        """Move data written by earlier versions into the current layout."""
+        self._migrate()
+    
     async def generate_quiz(self, 
                            document_id: str, 
                            num_questions: int = 5, 
@@ -29,6 +43,10 @@ class QuizService:
         """
         Generate a quiz based on a document.
         
+        Questions are sampled from the document's question bank when it has
+        enough of them. Otherwise they are generated live from sections spread
+        across the whole document, and added to the bank.
+        
         Args:
             document_id: The unique identifier of the document
             num_questions: Number of questions to generate
@@ -42,8 +60,12 @@ class QuizService:
         if not content:
             return {"error": f"Document with ID {document_id} not found"}
         
-        # Generate questions using LLM service
-        questions = await llm_service.generate_quiz_questions(content, num_questions, difficulty)
+        # Serve from the question bank, generating live only when it runs out
+        questions = await question_bank.sample(document_id, num_questions, difficulty)
+        if questions is None:
+            existing = await asyncio.to_thread(question_bank.index, document_id)
+            questions = await quiz_pipeline.generate(content, num_questions, difficulty, existing)
+            await question_bank.add(document_id, difficulty, questions, served=True)
         
         # Create a unique quiz ID
         quiz_id = str(uuid.uuid4())
@@ -63,6 +85,74 @@ class QuizService:
         
         return quiz
     
+    async def stream_quiz(self, 
+                          document_id: str, 
+                          num_questions: int = 5, 
+                          difficulty: str = "medium") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a quiz based on a document, yielding questions as they are produced.
+        
+        Questions from the question bank are sent at once; otherwise they are
+        generated live. The quiz is saved once generation finishes, with every
+        question that could be parsed.
+        
+        Args:
+            document_id: The unique identifier of the document
+            num_questions: Number of questions to generate
+            difficulty: Difficulty level (easy, medium, hard)
+        
+        Yields:
+            {"type": "question", "index": ..., "question": {...}} for each
+            question, then {"type": "quiz", "quiz": {...}} with the saved quiz,
+            or {"type": "error", "error": "..."}
+        """
+        # Get document content
+        content = await document_service.get_document_content(document_id)
+        if not content:
+            yield {"type": "error", "error": f"Document with ID {document_id} not found"}
+            return
+        
+        questions = await question_bank.sample(document_id, num_questions, difficulty)
+        error = None
+        if questions is not None:
+            for index, question in enumerate(questions):
+                yield {"type": "question", "index": index, "question": question}
+        else:
+            # Short documents stream from a single call; longer ones fan out over their sections
+            if len(quiz_pipeline.sections(content)) > 1:
+                existing = await asyncio.to_thread(question_bank.index, document_id)
+                events = quiz_pipeline.stream(content, num_questions, difficulty, existing)
+            else:
+                events = llm_service.stream_quiz_questions(content, num_questions, difficulty)
+            
+            questions = []
+            async for event in events:
+                if event["type"] == "question":
+                    questions.append(event["question"])
+                    yield {"type": "question", "index": len(questions) - 1, "question": event["question"]}
+                else:
+                    error = event["error"]
+            
+            await question_bank.add(document_id, difficulty, questions, served=True)
+        
+        if not questions:
+            yield {"type": "error", "error": error or "No questions were generated"}
+            return
+        
+        # Keep what was generated even if the stream failed part-way
+        quiz = {
+            "quiz_id": str(uuid.uuid4()),
+            "document_id": document_id,
+            "generated_at": datetime.now().isoformat(),
+            "difficulty": difficulty,
+            "num_questions": len(questions),
+            "questions": questions
+        }
+        
+        await self.save_quiz(quiz)
+        
+        yield {"type": "quiz", "quiz": quiz}
+    
     async def save_quiz(self, quiz: Dict[str, Any]) -> str:
         """
         Save a quiz to the quiz directory.
@@ -78,6 +168,9 @@ class QuizService:
         with open(quiz_file, "w", encoding="utf-8") as f:
             json.dump(quiz, f, ensure_ascii=False, indent=2)
         
+        quiz_catalog.upsert(quiz)
+        quiz_cache.invalidate(quiz["quiz_id"])
+        
         return quiz_file
     
     async def get_quiz(self, quiz_id: str) -> Optional[Dict[str, Any]]:
@@ -88,129 +181,186 @@ class QuizService:
             quiz_id: The unique identifier of the quiz
             
         Returns:
-            The quiz, or None if not found
+            The quiz, shared with other callers and not to be modified, or None if not found
         """
+        cached = await self.get_cached_quiz(quiz_id)
+        return cached.full if cached else None
+    
+    async def get_cached_quiz(self, quiz_id: str) -> Optional[CachedQuiz]:
+        """
+        Retrieve a quiz with its full and answer-stripped views, parsing it at most once.
+        
+        Args:
+            quiz_id: The unique identifier of the quiz
+        
+        Returns:
+            The cached quiz, or None if not found
+        """
+        return self._load_quiz(quiz_id)
+    
+    def _load_quiz(self, quiz_id: str) -> Optional[CachedQuiz]:
+        """Return a quiz from the cache, reading and caching its file on a miss."""
+        cached = quiz_cache.get(quiz_id)
+        if cached is not None:
+            return cached
+        
         quiz_file = os.path.join(QUIZ_DIR, f"{quiz_id}.json")
         
         if not os.path.exists(quiz_file):
             return None
         
         with open(quiz_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+            return quiz_cache.put(json.load(f))
     
-    async def get_quizzes_for_document(self, document_id: str) -> List[Dict[str, Any]]:
+    async def list_quizzes(self, 
+                           document_id: Optional[str] = None, 
+                           limit: int = DEFAULT_PAGE_SIZE, 
+                           cursor: Optional[str] = None, 
+                           difficulty: Optional[str] = None, 
+                           generated_from: Optional[str] = None, 
+                           generated_to: Optional[str] = None, 
+                           sort: str = "generated_at", 
+                           order: str = "desc", 
+                           fields: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get all quizzes generated for a document.
+        List quiz metadata from the catalog, newest first by default, one page at a time.
+        
+        Args:
+            document_id: Optional document ID to filter quizzes
+            limit: Maximum number of quizzes to return
+            cursor: The next_cursor of the previous page
+            difficulty: Optional difficulty to filter quizzes
+            generated_from: Only quizzes generated at or after this ISO date or time
+            generated_to: Only quizzes generated before this ISO date or time
+            sort: Sort key (generated_at or num_questions)
+            order: Sort order (asc or desc)
+            fields: Comma-separated fields to return (all by default)
+        
+        Returns:
+            {"quizzes": [...], "next_cursor": ...}, with next_cursor None on the last page
+        """
+        quizzes, next_cursor = quiz_catalog.list_quizzes(
+            document_id, limit, cursor, difficulty, generated_from, generated_to, sort, order, fields
+        )
+        return {"quizzes": quizzes, "next_cursor": next_cursor}
+    
+    async def get_quizzes_for_document(self, 
+                                       document_id: str, 
+                                       limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Get the most recent quizzes generated for a document.
         
         Args:
             document_id: The unique identifier of the document
+            limit: Maximum number of quizzes to return
             
         Returns:
-            List of quizzes for the document
+            List of quiz metadata for the document
         """
-        quizzes = []
-        
-        for filename in os.listdir(QUIZ_DIR):
-            if filename.endswith(".json"):
-                quiz_file = os.path.join(QUIZ_DIR, filename)
-                with open(quiz_file, "r", encoding="utf-8") as f:
-                    quiz = json.load(f)
-                    if quiz.get("document_id") == document_id:
-                        # Remove the questions for the list view to reduce size
-                        quiz_summary = {
-                            "quiz_id": quiz.get("quiz_id"),
-                            "document_id": quiz.get("document_id"),
-                            "generated_at": quiz.get("generated_at"),
-                            "difficulty": quiz.get("difficulty"),
-                            "num_questions": quiz.get("num_questions")
-                        }
-                        quizzes.append(quiz_summary)
-        
-        return quizzes
+        return (await self.list_quizzes(document_id, limit))["quizzes"]
     
-    async def get_all_quizzes(self) -> List[Dict[str, Any]]:
+    async def get_all_quizzes(self, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
         """
-        Get a list of all generated quizzes.
+        Get the most recently generated quizzes.
+        
+        Args:
+            limit: Maximum number of quizzes to return
         
         Returns:
             List of quiz metadata
         """
-        quizzes = []
-        
-        for filename in os.listdir(QUIZ_DIR):
-            if filename.endswith(".json"):
-                quiz_file = os.path.join(QUIZ_DIR, filename)
-                with open(quiz_file, "r", encoding="utf-8") as f:
-                    quiz = json.load(f)
-                    # Return metadata only, not the full quiz content
-                    quiz_summary = {
-                        "quiz_id": quiz.get("quiz_id"),
-                        "document_id": quiz.get("document_id"),
-                        "generated_at": quiz.get("generated_at"),
-                        "difficulty": quiz.get("difficulty"),
-                        "num_questions": quiz.get("num_questions")
-                    }
-                    quizzes.append(quiz_summary)
-        
-        return quizzes
+        return (await self.list_quizzes(limit=limit))["quizzes"]
     
     async def save_quiz_results(self, 
                                quiz_id: str, 
                                user_answers: List[str], 
-                               score: float) -> Dict[str, Any]:
+                               score: float, 
+                               student_id: Optional[str] = None, 
+                               correct_count: Optional[int] = None, 
+                               quiz: Optional[CachedQuiz] = None) -> Dict[str, Any]:
         """
-        Save a user's quiz results.
+        Save a user's quiz results to the append-only result store.
         
         Args:
             quiz_id: The unique identifier of the quiz
             user_answers: The user's answers to the quiz questions
             score: The user's score
+            student_id: Optional identifier of the student
+            correct_count: Optional number of correct answers
+            quiz: The cached quiz, if the caller has already looked it up
             
         Returns:
             The saved quiz results
         """
         # Get the quiz
-        quiz = await self.get_quiz(quiz_id)
-        if not quiz:
-            return {"error": f"Quiz with ID {quiz_id} not found"}
+        if quiz is None:
+            quiz = await self.get_cached_quiz(quiz_id)
+            if not quiz:
+                return {"error": f"Quiz with ID {quiz_id} not found"}
         
         # Create results object
         results = {
             "result_id": str(uuid.uuid4()),
             "quiz_id": quiz_id,
+            "student_id": student_id,
             "completed_at": datetime.now().isoformat(),
             "user_answers": user_answers,
             "score": score,
-            "total_questions": len(quiz.get("questions", []))
+            "correct_count": correct_count,
+            "total_questions": quiz.num_questions
         }
         
-        # Save results
-        results_file = os.path.join(QUIZ_DIR, f"result_{results['result_id']}.json")
-        with open(results_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        # Save results; concurrent submissions are committed together
+        await result_store.append(results)
+        await self._record_analytics(quiz, [results])
         
         return results
     
+    async def get_quiz_results(self, 
+                               quiz_id: Optional[str] = None, 
+                               student_id: Optional[str] = None, 
+                               limit: int = 100, 
+                               cursor: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Read saved results for a quiz or a student, in submission order.
+        
+        Args:
+            quiz_id: Optional quiz ID to filter results
+            student_id: Optional student ID to filter results
+            limit: Maximum number of results to return
+            cursor: The next_cursor of the previous page
+        
+        Returns:
+            {"results": [...], "next_cursor": ...}, with next_cursor None on the last page
+        """
+        results, next_cursor = result_store.scan(quiz_id, student_id, limit, cursor)
+        return {"results": results, "next_cursor": next_cursor}
+    
     async def evaluate_quiz_answers(self, 
                                    quiz_id: str, 
-                                   user_answers: List[str]) -> Dict[str, Any]:
+                                   user_answers: List[str], 
+                                   student_id: Optional[str] = None, 
+                                   quiz: Optional[CachedQuiz] = None) -> Dict[str, Any]:
         """
         Evaluate a user's answers to a quiz.
         
         Args:
             quiz_id: The unique identifier of the quiz
             user_answers: The user's answers to the quiz questions
+            student_id: Optional identifier of the student, stored with the results
+            quiz: The cached quiz, if the caller has already looked it up
             
         Returns:
             The evaluation results with score and feedback
         """
         # Get the quiz
-        quiz = await self.get_quiz(quiz_id)
-        if not quiz:
-            return {"error": f"Quiz with ID {quiz_id} not found"}
+        if quiz is None:
+            quiz = await self.get_cached_quiz(quiz_id)
+            if not quiz:
+                return {"error": f"Quiz with ID {quiz_id} not found"}
         
         # Get the questions and correct answers
-        questions = quiz.get("questions", [])
+        questions = quiz.full.get("questions", [])
         
         # Initialize results
         correct_count = 0
@@ -246,9 +396,147 @@ class QuizService:
         }
         
         # Save results
-        await self.save_quiz_results(quiz_id, user_answers, score)
+        await self.save_quiz_results(quiz_id, user_answers, score, student_id, correct_count, quiz)
         
         return results
+    
+    async def grade_submissions(self, 
+                                quiz_id: str, 
+                                submissions: List[Dict[str, Any]], 
+                                quiz: Optional[CachedQuiz] = None) -> Dict[str, Any]:
+        """
+        Grade many submissions to a quiz at once and save their results in one batch.
+        
+        Args:
+            quiz_id: The unique identifier of the quiz
+            submissions: The submissions, each with answers and optionally a student_id
+            quiz: The cached quiz, if the caller has already looked it up
+        
+        Returns:
+            Per-student scores, summary score statistics and per-question item statistics
+        """
+        # Get the quiz
+        if quiz is None:
+            quiz = await self.get_cached_quiz(quiz_id)
+            if not quiz:
+                return {"error": f"Quiz with ID {quiz_id} not found"}
+        
+        # Grade off the event loop, so a large exam does not hold up other requests
+        answers = [submission["answers"] for submission in submissions]
+        graded = await asyncio.get_running_loop().run_in_executor(
+            None, bulk_grader.grade, quiz.answer_key, answers
+        )
+        
+        completed_at = datetime.now().isoformat()
+        results = [
+            {
+                "result_id": str(uuid.uuid4()),
+                "quiz_id": quiz_id,
+                "student_id": submission.get("student_id"),
+                "completed_at": completed_at,
+                "user_answers": submission["answers"],
+                "score": score,
+                "correct_count": correct_count,
+                "total_questions": quiz.num_questions
+            }
+            for submission, score, correct_count in zip(submissions, graded["scores"], graded["correct_counts"])
+        ]
+        
+        # Save all results in a single transaction
+        await result_store.append_many(results)
+        await self._record_analytics(quiz, results)
+        
+        return {
+            "quiz_id": quiz_id,
+            "total_questions": quiz.num_questions,
+            "summary": graded["summary"],
+            "questions": graded["questions"],
+            "results": [
+                {field: result[field] for field in ("result_id", "student_id", "score", "correct_count")}
+                for result in results
+            ]
+        }
+    
+    async def get_quiz_analytics(self, quiz_id: str) -> Dict[str, Any]:
+        """
+        Get the running score statistics of a quiz, including per-question correct rates and option counts.
+        
+        Args:
+            quiz_id: The unique identifier of the quiz
+        
+        Returns:
+            The quiz's aggregate statistics
+        """
+        return {"quiz_id": quiz_id, **quiz_analytics.get("quiz", quiz_id)}
+    
+    async def get_document_analytics(self, document_id: str) -> Dict[str, Any]:
+        """
+        Get the running score statistics across every quiz on a document.
+        
+        Args:
+            document_id: The unique identifier of the document
+        
+        Returns:
+            The document's aggregate statistics
+        """
+        aggregate = quiz_analytics.get("document", document_id)
+        del aggregate["questions"]
+        return {"document_id": document_id, **aggregate}
+    
+    def rebuild_analytics(self) -> Dict[str, int]:
+        """
+        Recompute all quiz and document analytics from the result store in one streaming pass.
+        
+        Returns:
+            The number of results, quizzes and documents aggregated
+        """
+        def lookup(quiz_id: str):
+            quiz = self._load_quiz(quiz_id)
+            return (quiz.full.get("document_id"), quiz.answer_key) if quiz else None
+        
+        return quiz_analytics.rebuild(result_store.iter_results(), lookup)
+    
+    async def _record_analytics(self, quiz: CachedQuiz, results: List[Dict[str, Any]]):
+        """Add saved results to the analytics; the results are kept even if this fails."""
+        try:
+            await quiz_analytics.record(quiz.quiz_id, quiz.full.get("document_id"), quiz.answer_key, results)
+        except Exception as e:
+            print(f"Error updating quiz analytics: {str(e)}")
+    
+    def _migrate(self):
+        """
+        Import result files into the result store and catalog quizzes saved before the catalog existed.
+        
+        Imported result files are renamed with an .imported suffix, so later
+        starts find nothing left to read.
+        """
+        try:
+            # Results were once written as one file per submission, first among the quizzes
+            legacy_files = []
+            legacy_results = []
+            for directory in (QUIZ_DIR, RESULTS_DIR):
+                for filename in os.listdir(directory):
+                    if filename.startswith("result_") and filename.endswith(".json"):
+                        result_file = os.path.join(directory, filename)
+                        with open(result_file, "r", encoding="utf-8") as f:
+                            legacy_results.append(json.load(f))
+                        legacy_files.append(result_file)
+            if legacy_results:
+                # Imported in completion order; result IDs already stored are skipped
+                legacy_results.sort(key=lambda result: result.get("completed_at", ""))
+                if result_store.import_results(legacy_results):
+                    self.rebuild_analytics()
+                for result_file in legacy_files:
+                    try:
+                        os.replace(result_file, f"{result_file}.imported")
+                    except FileNotFoundError:
+                        # Already renamed by another worker importing at the same time
+                        pass
+            
+            if quiz_catalog.count() == 0:
+                quiz_catalog.rebuild(QUIZ_DIR)
+        except Exception as e:
+            print(f"Error migrating quiz data: {str(e)}")
 
 # Create a singleton instance
 quiz_service = QuizService() 
\ No newline at end of file
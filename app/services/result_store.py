@@ -0,0 +1,351 @@
+import io
+import os
+import csv
+import json
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get result store configuration from environment variables
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+QUIZ_RESULTS_DB = os.getenv("QUIZ_RESULTS_DB", os.path.join(OUTPUT_DIR, "quiz_results.db"))
+QUIZ_RESULTS_BATCH_SIZE = int(os.getenv("QUIZ_RESULTS_BATCH_SIZE", "500"))
+QUIZ_RESULTS_FLUSH_SECONDS = float(os.getenv("QUIZ_RESULTS_FLUSH_SECONDS", "0.05"))
+
+# Columns of a stored result, in export order
+RESULT_FIELDS = (
+    "seq", "result_id", "quiz_id", "student_id", "completed_at",
+    "score", "correct_count", "total_questions", "user_answers"
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows read per query while exporting
+EXPORT_PAGE_SIZE = 1000
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class ResultStore:
+    """
+    Append-only store for quiz submissions.
+    
+    Results are rows in a SQLite table (WAL mode), indexed by quiz and by
+    student, so both can be scanned page by page with a sequence-number
+    cursor. Submissions arriving together are written as one batch: each
+    append waits at most the flush interval for others to join, then the
+    whole batch is committed in a single transaction off the event loop.
+    Each caller returns only once its result is committed.
+    """
+    
+    def __init__(self,
+                 db_path: str = QUIZ_RESULTS_DB,
+                 batch_size: int = QUIZ_RESULTS_BATCH_SIZE,
+                 flush_seconds: float = QUIZ_RESULTS_FLUSH_SECONDS):
+        """Open the results database, creating the table and indexes if needed."""
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
+        self._write_lock = threading.Lock()
+        self._db = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_results ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "result_id TEXT NOT NULL UNIQUE, "
+            "quiz_id TEXT NOT NULL, "
+            "student_id TEXT, "
+            "completed_at TEXT NOT NULL, "
+            "score REAL NOT NULL, "
+            "correct_count INTEGER, "
+            "total_questions INTEGER NOT NULL, "
+            "user_answers TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_quiz ON quiz_results (quiz_id, seq)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_student ON quiz_results (student_id, seq)")
+        self._db.commit()
+        
+        self._pending: List[Tuple[Tuple[Any, ...], "asyncio.Future[None]"]] = []
+        self._has_pending: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._writer: Optional["asyncio.Task[None]"] = None
+        self.counters = {
+            "appended": 0,
+            "batches": 0,
+            "write_errors": 0
+        }
+    
+    async def append(self, result: Dict[str, Any]):
+        """
+        Append a result, returning once it has been committed.
+        
+        Args:
+            result: The result, with result_id, quiz_id, student_id,
+                completed_at, score, correct_count, total_questions and
+                user_answers
+        """
+        self._ensure_writer()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self._row(result), future))
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        await future
+    
+    async def append_many(self, results: List[Dict[str, Any]]):
+        """
+        Append many results in one transaction, returning once they have been committed.
+        
+        Used for bulk grading, where the whole batch is known up front and
+        does not need to wait for other submissions.
+        
+        Args:
+            results: The results, each with the fields taken by append
+        """
+        rows = [self._row(result) for result in results]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+        except Exception:
+            self.counters["write_errors"] += 1
+            raise
+        
+        self.counters["appended"] += len(rows)
+        self.counters["batches"] += 1
+    
+    def import_results(self, results: List[Dict[str, Any]]) -> int:
+        """
+        Write results synchronously in one transaction, skipping result IDs already stored.
+        
+        Used to import results saved before the store existed.
+        
+        Returns:
+            The number of results written
+        """
+        with self._write_lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO quiz_results "
+                "(result_id, quiz_id, student_id, completed_at, score, correct_count, total_questions, user_answers) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row(result) for result in results]
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+    
+    def scan(self,
+             quiz_id: Optional[str] = None,
+             student_id: Optional[str] = None,
+             limit: int = DEFAULT_PAGE_SIZE,
+             cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Read results in submission order.
+        
+        Args:
+            quiz_id: Only results for this quiz
+            student_id: Only results by this student
+            limit: Maximum results to return
+            cursor: The next_cursor of the previous page
+        
+        Returns:
+            (results, next_cursor), where next_cursor is None on the last page
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        db = self._connect()
+        try:
+            rows = self._select(db, quiz_id, student_id, cursor or 0, limit + 1)
+        finally:
+            db.close()
+        
+        results = [self._result(row) for row in rows[:limit]]
+        next_cursor = results[-1]["seq"] if len(rows) > limit else None
+        return results, next_cursor
+    
+    def export(self,
+               export_format: str = "csv",
+               quiz_id: Optional[str] = None,
+               student_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream matching results as CSV or NDJSON, reading a page at a time.
+        
+        Args:
+            export_format: "csv" or "ndjson"
+            quiz_id: Only results for this quiz
+            student_id: Only results by this student
+        
+        Yields:
+            Chunks of the export, one page of results each
+        """
+        # A separate connection, so a long export does not hold up writers (WAL allows concurrent readers)
+        db = self._connect()
+        try:
+            if export_format == "csv":
+                yield ",".join(RESULT_FIELDS) + "\r\n"
+            
+            cursor = 0
+            while True:
+                rows = self._select(db, quiz_id, student_id, cursor, EXPORT_PAGE_SIZE)
+                if not rows:
+                    break
+                cursor = rows[-1][0]
+                
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(json.dumps(self._result(row), ensure_ascii=False) + "\n" for row in rows)
+        finally:
+            db.close()
+    
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """
+        Read every result in submission order, a page at a time.
+        
+        Yields:
+            Each stored result
+        """
+        db = self._connect()
+        try:
+            cursor = 0
+            while True:
+                rows = self._select(db, None, None, cursor, EXPORT_PAGE_SIZE)
+                if not rows:
+                    break
+                cursor = rows[-1][0]
+                for row in rows:
+                    yield self._result(row)
+        finally:
+            db.close()
+    
+    def reconnect(self):
+        """Open a new results connection in a forked worker."""
+        self._db = self._connect()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return append and batch counters."""
+        batches = self.counters["batches"]
+        return {
+            "pending": len(self._pending),
+            "batch_size": self.batch_size,
+            "flush_seconds": self.flush_seconds,
+            **self.counters,
+            "mean_batch_size": self.counters["appended"] / batches if batches else 0.0
+        }
+    
+    def _ensure_writer(self):
+        """Start the batch writer on the running event loop if it is not running."""
+        if self._writer is None or self._writer.done():
+            self._has_pending = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._writer = asyncio.ensure_future(self._write_batches())
+    
+    async def _write_batches(self):
+        """Group pending appends into batches and commit each in one transaction."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.batch_size:
+                # Give concurrent submissions a moment to join the batch
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            if not self._pending:
+                self._has_pending.clear()
+            if len(self._pending) < self.batch_size:
+                self._batch_full.clear()
+            
+            try:
+                await loop.run_in_executor(None, self._write, [row for row, _ in batch])
+            except Exception as e:
+                self.counters["write_errors"] += 1
+                print(f"Error writing quiz results: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self.counters["appended"] += len(batch)
+            self.counters["batches"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+    
+    def _write(self, rows: List[Tuple[Any, ...]]):
+        """Insert a batch of rows in a single transaction."""
+        with self._write_lock:
+            try:
+                self._db.executemany(
+                    "INSERT INTO quiz_results "
+                    "(result_id, quiz_id, student_id, completed_at, score, correct_count, total_questions, user_answers) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+    
+    def _select(self,
+                db: sqlite3.Connection,
+                quiz_id: Optional[str],
+                student_id: Optional[str],
+                after: int,
+                limit: int) -> List[Tuple[Any, ...]]:
+        """Fetch rows after a sequence number, using the quiz or student index."""
+        conditions = ["seq > ?"]
+        params: List[Any] = [after]
+        if quiz_id:
+            conditions.append("quiz_id = ?")
+            params.append(quiz_id)
+        if student_id:
+            conditions.append("student_id = ?")
+            params.append(student_id)
+        
+        return db.execute(
+            f"SELECT {', '.join(RESULT_FIELDS)} FROM quiz_results "
+            f"WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode."""
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints rather than on every commit; WAL keeps the database consistent
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    
+    def _row(self, result: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Convert a result into column values for insertion."""
+        return (
+            result["result_id"],
+            result["quiz_id"],
+            result.get("student_id"),
+            result["completed_at"],
+            result["score"],
+            result.get("correct_count"),
+            result["total_questions"],
+            json.dumps(result.get("user_answers", []), ensure_ascii=False)
+        )
+    
+    def _result(self, row: Tuple[Any, ...]) -> Dict[str, Any]:
+        """Convert a selected row back into a result."""
+        result = dict(zip(RESULT_FIELDS, row))
+        result["user_answers"] = json.loads(result["user_answers"])
+        return result
+
+# Create a singleton instance
+result_store = ResultStore()
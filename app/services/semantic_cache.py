@@ -0,0 +1,261 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Union
+from dotenv import load_dotenv
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+# Get semantic cache configuration from environment variables
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+SEMANTIC_CACHE_SAMPLE_RATE = float(os.getenv("SEMANTIC_CACHE_SAMPLE_RATE", "0.05"))
+SEMANTIC_CACHE_MAX_SAMPLES = int(os.getenv("SEMANTIC_CACHE_MAX_SAMPLES", "200"))
+
+
+class SemanticCache:
+    """
+    Response cache that matches paraphrased questions by embedding similarity.
+    
+    Questions are embedded with the MiniLM model already loaded by the index
+    service and kept as rows of a normalised matrix, so a lookup is a single
+    matrix-vector product. Each entry carries a scope (prompt version and
+    model) and only entries in the caller's scope can match.
+    
+    A fraction of hits is sampled together with the matched question so that
+    reviewers can label false hits and estimate the false-hit rate.
+    """
+    
+    def __init__(self,
+                 namespace: str,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 sample_rate: float = SEMANTIC_CACHE_SAMPLE_RATE,
+                 enabled: bool = SEMANTIC_CACHE_ENABLED):
+        """Initialize an empty cache for one feature."""
+        self.namespace = namespace
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        
+        self._entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=SEMANTIC_CACHE_MAX_SAMPLES)
+        
+        self.counters = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "embedding_errors": 0,
+            "samples_reviewed": 0,
+            "false_hits": 0
+        }
+    
+    async def lookup(self,
+                     question: str,
+                     scope: Union[str, Sequence[str]],
+                     valid: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        Find a cached answer for a question similar to this one.
+        
+        Args:
+            question: The incoming question or concept
+            scope: Prompt version and model the answer must have been produced
+                with, or several acceptable scopes
+            valid: Optional check that the matched question's answer may still
+                be served; a match failing it is removed and counts as a miss
+        
+        Returns:
+            The cached answer if a prior question in scope is above the
+            similarity threshold, otherwise None
+        """
+        if not self.enabled:
+            return None
+        
+        self.counters["lookups"] += 1
+        
+        if not self._entries:
+            self.counters["misses"] += 1
+            return None
+        
+        vector = await self._embed(question)
+        if vector is None:
+            self.counters["misses"] += 1
+            return None
+        
+        # The cache may have been cleared or changed while the question was embedded;
+        # read the matrix and its entries together from here on
+        matrix, entries = self._matrix, self._entries
+        if matrix is None or not entries:
+            self.counters["misses"] += 1
+            return None
+        
+        scopes = {scope} if isinstance(scope, str) else set(scope)
+        similarities = matrix @ vector
+        for i, entry in enumerate(entries):
+            if entry["scope"] not in scopes:
+                similarities[i] = -1.0
+        
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            self.counters["misses"] += 1
+            return None
+        
+        entry = entries[best]
+        if valid is not None and not valid(entry["question"]):
+            self.remove(entry["question"])
+            self.counters["misses"] += 1
+            return None
+        
+        entry["hits"] += 1
+        entry["last_used"] = time.time()
+        self.counters["hits"] += 1
+        
+        if random.random() < self.sample_rate:
+            self._samples.append({
+                "sample_id": str(uuid.uuid4()),
+                "question": question,
+                "matched_question": entry["question"],
+                "similarity": similarity,
+                "answer_preview": entry["answer"][:300],
+                "sampled_at": time.time(),
+                "false_hit": None
+            })
+        
+        return entry["answer"]
+    
+    async def store(self, question: str, answer: str, scope: str):
+        """
+        Add a question and its answer to the cache.
+        
+        Args:
+            question: The question or concept that was answered
+            answer: The generated answer
+            scope: Prompt version and model the answer was produced with
+        """
+        if not self.enabled:
+            return
+        
+        vector = await self._embed(question)
+        if vector is None:
+            return
+        
+        if len(self._entries) >= self.max_entries:
+            # Evict the least recently used entry
+            oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+            del self._entries[oldest]
+            self._matrix = np.delete(self._matrix, oldest, axis=0)
+            self.counters["evictions"] += 1
+        
+        now = time.time()
+        self._entries.append({
+            "question": question,
+            "answer": answer,
+            "scope": scope,
+            "created_at": now,
+            "last_used": now,
+            "hits": 0
+        })
+        row = vector.reshape(1, -1)
+        self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+        self.counters["stores"] += 1
+    
+    def samples(self) -> List[Dict[str, Any]]:
+        """Return the sampled hits, most recent first."""
+        return list(reversed(self._samples))
+    
+    def review_sample(self, sample_id: str, false_hit: bool) -> bool:
+        """
+        Record a reviewer's verdict on a sampled hit.
+        
+        Args:
+            sample_id: The sample to label
+            false_hit: Whether the cached answer did not fit the question
+        
+        Returns:
+            True if the sample was found
+        """
+        for sample in self._samples:
+            if sample["sample_id"] == sample_id:
+                if sample["false_hit"] is None:
+                    self.counters["samples_reviewed"] += 1
+                elif sample["false_hit"]:
+                    self.counters["false_hits"] -= 1
+                sample["false_hit"] = false_hit
+                if false_hit:
+                    self.counters["false_hits"] += 1
+                return True
+        return False
+    
+    def remove(self, question: str) -> int:
+        """
+        Remove entries whose question matches, ignoring case and surrounding whitespace.
+        
+        Returns:
+            Number of entries removed
+        """
+        target = question.strip().lower()
+        keep = [i for i, entry in enumerate(self._entries) if entry["question"].strip().lower() != target]
+        removed = len(self._entries) - len(keep)
+        if removed:
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep] if keep else None
+        return removed
+    
+    def clear(self):
+        """Remove all cached entries."""
+        self._entries = []
+        self._matrix = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate and false-hit statistics."""
+        counters = dict(self.counters)
+        lookups = counters["lookups"]
+        reviewed = counters["samples_reviewed"]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "llm_calls_saved": counters["hits"],
+            "samples_pending_review": sum(1 for sample in self._samples if sample["false_hit"] is None),
+            "estimated_false_hit_rate": counters["false_hits"] / reviewed if reviewed else None,
+            **counters
+        }
+    
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text with the shared MiniLM model and L2-normalise it."""
+        # Imported lazily so the cache does not force the embedding model to load
+        from app.services.index_service import index_service
+        
+        embed_model = index_service.embed_model
+        if embed_model is None:
+            return None
+        
+        try:
+            embedding = await asyncio.to_thread(embed_model.get_query_embedding, text)
+        except Exception as e:
+            print(f"Error embedding text for semantic cache: {str(e)}")
+            self.counters["embedding_errors"] += 1
+            return None
+        
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+# Create instances for each cached feature
+qa_semantic_cache = SemanticCache("qa")
+explanation_semantic_cache = SemanticCache("explanation")
@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get chat session configuration from environment variables
+CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "200"))
+CHAT_SESSION_MAX_IN_MEMORY = int(os.getenv("CHAT_SESSION_MAX_IN_MEMORY", "1000"))
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "")
+CHAT_SESSION_SHARED = os.getenv("CHAT_SESSION_SHARED", "false").lower() == "true"
+
+# How often expired sessions are swept, in seconds
+PURGE_INTERVAL_SECONDS = 60
+
+
+class SessionStore:
+    """
+    Server-side store for chat sessions.
+    
+    Clients create a session once and then send only the new message; the
+    conversation so far is kept here instead of being re-posted and
+    re-validated on every request. Sessions expire after a period of
+    inactivity and keep at most a fixed number of messages (older ones are
+    dropped; the chat history manager summarises what is sent to the model).
+    
+    Sessions live in memory in least-recently-used order. When more than the
+    in-memory limit are active and a SQLite path is configured, the least
+    recently used sessions are spilled to the database and loaded back on
+    their next use; without a database they are dropped.
+    
+    In shared mode, used when several server processes serve the same
+    clients, every change is also written through to the database and each
+    lookup checks it for a newer copy, so a conversation can continue on
+    whichever process receives the next message.
+    """
+    
+    def __init__(self,
+                 ttl_seconds: int = CHAT_SESSION_TTL_SECONDS,
+                 max_messages: int = CHAT_SESSION_MAX_MESSAGES,
+                 max_in_memory: int = CHAT_SESSION_MAX_IN_MEMORY,
+                 db_path: str = CHAT_SESSION_DB,
+                 shared: bool = CHAT_SESSION_SHARED):
+        """Initialize the in-memory store and open the spill database if configured."""
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_in_memory = max_in_memory
+        self.db_path = db_path
+        
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._last_purge = time.time()
+        self._db: Optional[sqlite3.Connection] = None
+        
+        if db_path:
+            try:
+                db_dir = os.path.dirname(db_path)
+                if db_dir:
+                    os.makedirs(db_dir, exist_ok=True)
+                self._db = self._connect()
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                    "session_id TEXT PRIMARY KEY, "
+                    "created_at REAL NOT NULL, "
+                    "updated_at REAL NOT NULL, "
+                    "messages TEXT NOT NULL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions (updated_at)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"Error opening chat session database: {str(e)}")
+                self._db = None
+        
+        if shared and self._db is None:
+            print("WARNING: CHAT_SESSION_SHARED needs CHAT_SESSION_DB; chat sessions will not be shared between processes")
+        self.shared = shared and self._db is not None
+        
+        self.counters = {
+            "created": 0,
+            "expired": 0,
+            "spilled": 0,
+            "restored": 0,
+            "dropped": 0,
+            "messages_truncated": 0
+        }
+    
+    def create(self) -> Dict[str, Any]:
+        """
+        Start a new, empty session.
+        
+        Returns:
+            The session record
+        """
+        self._purge_expired()
+        
+        now = time.time()
+        session = {
+            "session_id": str(uuid.uuid4()),
+            "created_at": now,
+            "updated_at": now,
+            "messages": []
+        }
+        self._sessions[session["session_id"]] = session
+        self.counters["created"] += 1
+        if self.shared:
+            self._spill(session)
+        self._enforce_memory_limit()
+        
+        return session
+    
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a session, loading it back from the spill database if needed.
+        
+        Returns:
+            The session record, or None if it does not exist or has expired
+        """
+        session = self._sessions.get(session_id)
+        if session is None or self.shared:
+            # In shared mode another process may hold a newer copy
+            session = self._restore(session_id, session)
+            if session is None:
+                return None
+        
+        if self._is_expired(session):
+            del self._sessions[session_id]
+            self.counters["expired"] += 1
+            return None
+        
+        self._sessions.move_to_end(session_id)
+        return session
+    
+    def messages(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Return a copy of the conversation so far.
+        
+        Returns:
+            List of {"role", "content"} messages, or None if the session is unknown
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+        return list(session["messages"])
+    
+    def append(self, session_id: str, messages: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """
+        Add messages to a session and refresh its expiry.
+        
+        Args:
+            session_id: The session to extend
+            messages: New {"role", "content"} messages, oldest first
+        
+        Returns:
+            The updated session record, or None if the session is unknown
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+        
+        session["messages"].extend(
+            {"role": message["role"], "content": message["content"]} for message in messages
+        )
+        overflow = len(session["messages"]) - self.max_messages
+        if overflow > 0:
+            del session["messages"][:overflow]
+            self.counters["messages_truncated"] += overflow
+        session["updated_at"] = time.time()
+        if self.shared:
+            self._spill(session)
+        
+        return session
+    
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session from memory and the spill database.
+        
+        Returns:
+            True if the session existed
+        """
+        removed = self._sessions.pop(session_id, None) is not None
+        if self._db is not None:
+            try:
+                cursor = self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+                removed = removed or cursor.rowcount > 0
+            except Exception as e:
+                print(f"Error deleting chat session {session_id}: {str(e)}")
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return session counts and spill statistics."""
+        spilled_sessions = None
+        if self._db is not None:
+            try:
+                spilled_sessions = self._db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+            except Exception as e:
+                print(f"Error counting spilled chat sessions: {str(e)}")
+        
+        return {
+            "in_memory": len(self._sessions),
+            "max_in_memory": self.max_in_memory,
+            "in_database": spilled_sessions,
+            "spill_enabled": self._db is not None,
+            "shared": self.shared,
+            "ttl_seconds": self.ttl_seconds,
+            "max_messages": self.max_messages,
+            **self.counters
+        }
+    
+    def reconnect(self):
+        """Open a new session database connection in a forked worker, if a database is configured."""
+        if self._db is not None:
+            self._db = self._connect()
+    
+    def spill_all(self) -> int:
+        """
+        Write every in-memory session to the spill database.
+        
+        Called when a worker process exits, so its conversations can be
+        resumed by the process that replaces it.
+        
+        Returns:
+            The number of sessions written
+        """
+        if self._db is None:
+            return 0
+        return sum(1 for session in list(self._sessions.values()) if self._spill(session))
+    
+    def _is_expired(self, session: Dict[str, Any]) -> bool:
+        """Whether the session has been idle for longer than the TTL."""
+        return time.time() - session["updated_at"] > self.ttl_seconds
+    
+    def _enforce_memory_limit(self):
+        """Spill or drop the least recently used sessions beyond the in-memory limit."""
+        while len(self._sessions) > self.max_in_memory:
+            _, session = self._sessions.popitem(last=False)
+            # Shared sessions are already in the database
+            if self.shared or (self._db is not None and self._spill(session)):
+                self.counters["spilled"] += 1
+            else:
+                self.counters["dropped"] += 1
+    
+    def _spill(self, session: Dict[str, Any]) -> bool:
+        """Write a session to the spill database."""
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, created_at, updated_at, messages) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    session["session_id"],
+                    session["created_at"],
+                    session["updated_at"],
+                    json.dumps(session["messages"], ensure_ascii=False)
+                )
+            )
+            self._db.commit()
+            return True
+        except Exception as e:
+            print(f"Error spilling chat session {session['session_id']}: {str(e)}")
+            return False
+    
+    def _restore(self, session_id: str, cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Move a spilled session back into memory.
+        
+        In shared mode the row is kept, and the in-memory copy is only
+        replaced if the stored one is newer.
+        """
+        if self._db is None:
+            return cached
+        
+        try:
+            row = self._db.execute(
+                "SELECT created_at, updated_at, messages FROM chat_sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                # A shared session missing from the database was deleted by another process
+                if cached is not None and self.shared:
+                    del self._sessions[session_id]
+                return None if self.shared else cached
+            if cached is not None and cached["updated_at"] >= row[1]:
+                return cached
+            if not self.shared:
+                self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+        except Exception as e:
+            print(f"Error restoring chat session {session_id}: {str(e)}")
+            return cached
+        
+        session = {
+            "session_id": session_id,
+            "created_at": row[0],
+            "updated_at": row[1],
+            "messages": json.loads(row[2])
+        }
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self.counters["restored"] += 1
+        self._enforce_memory_limit()
+        
+        return session
+    
+    def _purge_expired(self):
+        """Periodically remove expired sessions from memory and the spill database."""
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        
+        expired = [session_id for session_id, session in self._sessions.items() if self._is_expired(session)]
+        for session_id in expired:
+            del self._sessions[session_id]
+        self.counters["expired"] += len(expired)
+        
+        if self._db is not None:
+            try:
+                cursor = self._db.execute(
+                    "DELETE FROM chat_sessions WHERE updated_at < ?",
+                    (now - self.ttl_seconds,)
+                )
+                self._db.commit()
+                self.counters["expired"] += max(cursor.rowcount, 0)
+            except Exception as e:
+                print(f"Error purging expired chat sessions: {str(e)}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode, so several processes can read while one writes."""
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+# Create a singleton instance
+session_store = SessionStore()
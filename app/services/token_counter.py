@@ -0,0 +1,31 @@
+from typing import Dict, List, Optional
+
+# tiktoken is optional at runtime; fall back to a character-based estimate
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception as e:
+    print(f"Warning: tiktoken unavailable, using approximate token counts: {str(e)}")
+    _ENCODING = None
+
+# Approximate per-message overhead of chat formatting (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """
+    Count the tokens in a piece of text.
+    
+    Groq's Llama models use their own tokenizer, so the cl100k_base count is an
+    estimate - close enough for budgeting and rate limiting.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Count the tokens in a list of {"role", "content"} chat messages."""
+    return sum(count_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
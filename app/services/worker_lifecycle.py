@@ -0,0 +1,181 @@
+import gc
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+from app.services.http_pool import llm_http_pool
+from app.services.index_service import index_service
+from app.services.llm_backends import llm_backend
+from app.services.llm_scheduler import llm_scheduler
+from app.services.document_catalog import document_catalog
+from app.services.quiz_catalog import quiz_catalog
+from app.services.quiz_analytics import quiz_analytics
+from app.services.question_bank import question_bank
+from app.services.result_store import result_store
+from app.services.session_service import session_store
+
+# Load environment variables
+load_dotenv()
+
+# Get worker lifecycle configuration from environment variables
+PRELOAD_INDICES = os.getenv("PRELOAD_INDICES", "true").lower() == "true"
+WORKER_MAX_MEMORY_MB = float(os.getenv("WORKER_MAX_MEMORY_MB", "1024"))
+WORKER_MEMORY_CHECK_SECONDS = float(os.getenv("WORKER_MEMORY_CHECK_SECONDS", "10"))
+
+
+def private_memory_mb() -> Optional[float]:
+    """
+    Memory used by this process alone, in MB.
+    
+    Pages still shared copy-on-write with the parent process are not
+    counted, so this grows only with what the worker itself allocates or
+    modifies. Returns None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            kilobytes = sum(
+                int(line.split()[1]) for line in f
+                if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+        return kilobytes / 1024
+    except OSError:
+        pass
+    
+    # Older kernels: resident minus shared pages
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident, shared = (int(value) for value in f.read().split()[1:3])
+        return (resident - shared) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+class WorkerLifecycle:
+    """
+    Hooks run by the production server around its worker processes.
+    
+    The server imports the application once in a parent process, which
+    loads the embedding model and the persisted indices, then forks its
+    workers. The workers share those pages copy-on-write for as long as
+    they are not written to. Each worker reopens its database connections
+    after the fork, takes its share of the upstream rate limits, and watches
+    its own private memory; a worker that grows
+    past the limit stops itself gracefully, finishing its in-flight
+    requests, and the server starts a fresh one in its place.
+    """
+    
+    def __init__(self,
+                 preload_indices: bool = PRELOAD_INDICES,
+                 max_memory_mb: float = WORKER_MAX_MEMORY_MB,
+                 check_seconds: float = WORKER_MEMORY_CHECK_SECONDS):
+        """Initialize the lifecycle settings; the watchdog starts in each worker."""
+        self.preload_indices = preload_indices
+        self.max_memory_mb = max_memory_mb
+        self.check_seconds = check_seconds
+        
+        self.started_at = time.time()
+        self._watchdog: Optional[threading.Thread] = None
+        self.counters = {
+            "indices_preloaded": 0,
+            "memory_checks": 0,
+            "last_private_memory_mb": None,
+            "recycle_reason": None
+        }
+    
+    def preload(self) -> Dict[str, Any]:
+        """
+        Prepare the parent process for forking workers.
+        
+        Loads every persisted index, then moves all objects allocated so far
+        out of the garbage collector's generations. Otherwise collections in
+        the workers would write to the shared pages holding these objects
+        and copy them into every worker.
+        
+        Returns:
+            The number of indices loaded and of objects frozen
+        """
+        if self.preload_indices:
+            self.counters["indices_preloaded"] = index_service.preload_indices()
+        
+        gc.collect()
+        gc.freeze()
+        
+        return {
+            "indices": self.counters["indices_preloaded"],
+            "frozen_objects": gc.get_freeze_count()
+        }
+    
+    def after_fork(self, workers: int = 1):
+        """
+        Prepare a newly forked worker.
+        
+        Reopens database connections and upstream clients, limits the worker
+        to its share of the upstream rate limits, and starts the memory
+        watchdog. SQLite connections must not be used across a fork; the
+        inherited ones are deliberately left open rather than closed, since
+        closing them could checkpoint or remove files the parent still uses.
+        
+        Args:
+            workers: Number of workers the server runs
+        """
+        for store in (document_catalog, quiz_catalog, quiz_analytics, question_bank, result_store, session_store):
+            store.reconnect()
+        
+        # The upstream clients were created in the parent; their connections and
+        # event-loop state must not be shared
+        llm_http_pool.reset()
+        llm_backend.reset_clients()
+        index_service.reset_llm()
+        
+        # Every worker schedules its own calls; together they must stay within the quota
+        llm_scheduler.share(workers)
+        
+        self.started_at = time.time()
+        self.counters["recycle_reason"] = None
+        if self.max_memory_mb > 0 and private_memory_mb() is not None:
+            self._watchdog = threading.Thread(target=self._watch, name="memory-watchdog", daemon=True)
+            self._watchdog.start()
+    
+    def before_exit(self):
+        """Save in-memory chat sessions so the replacement worker can resume them."""
+        spilled = session_store.spill_all()
+        if spilled:
+            print(f"Worker {os.getpid()} saved {spilled} chat sessions before exiting")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return process, memory and recycling information for this worker."""
+        return {
+            "pid": os.getpid(),
+            "parent_pid": os.getppid(),
+            "uptime_seconds": time.time() - self.started_at,
+            "private_memory_mb": private_memory_mb(),
+            "max_memory_mb": self.max_memory_mb,
+            "memory_watchdog": self._watchdog is not None and self._watchdog.is_alive(),
+            "frozen_objects": gc.get_freeze_count(),
+            **self.counters
+        }
+    
+    def _watch(self):
+        """Stop this worker gracefully once its private memory exceeds the limit."""
+        while True:
+            time.sleep(self.check_seconds)
+            memory = private_memory_mb()
+            self.counters["memory_checks"] += 1
+            self.counters["last_private_memory_mb"] = memory
+            
+            if memory is not None and memory > self.max_memory_mb:
+                self.counters["recycle_reason"] = f"private memory {memory:.0f} MB over {self.max_memory_mb:.0f} MB"
+                print(
+                    f"Worker {os.getpid()} is using {memory:.0f} MB of private memory "
+                    f"(limit {self.max_memory_mb:.0f} MB); restarting it gracefully"
+                )
+                # The server stops accepting connections, drains in-flight requests and exits;
+                # the master then starts a replacement
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+# Create a singleton instance
+worker_lifecycle = WorkerLifecycle()
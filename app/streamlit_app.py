@@ -12,6 +12,9 @@ load_dotenv()
 # API URL
 API_URL = "http://localhost:8000/api"
 
+# Number of GET responses kept for revalidation with their ETags
+CONDITIONAL_CACHE_SIZE = 50
+
 # Set page configuration
 st.set_page_config(
     page_title="Indian Law Tutor",
@@ -26,7 +29,22 @@ def api_request(endpoint, method="GET", data=None, files=None):
     
     try:
         if method == "GET":
-            response = requests.get(url, params=data)
+            # Revalidate a stored copy instead of downloading it again
+            cache = st.session_state.setdefault("conditional_cache", {})
+            key = (url, json.dumps(data, sort_keys=True))
+            cached = cache.get(key)
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            
+            response = requests.get(url, params=data, headers=headers)
+            
+            if response.status_code == 304 and cached:
+                return cached[1]
+            if response.status_code == 200 and response.headers.get("ETag"):
+                cache.pop(key, None)
+                cache[key] = (response.headers["ETag"], response.json())
+                while len(cache) > CONDITIONAL_CACHE_SIZE:
+                    cache.pop(next(iter(cache)))
+                return cache[key][1]
         elif method == "POST":
             if files:
                 response = requests.post(url, data=data, files=files)
@@ -44,9 +62,81 @@ def api_request(endpoint, method="GET", data=None, files=None):
         st.error(f"Request Error: {str(e)}")
         return None
 
+# Function to consume a server-sent event stream from the API
+def api_stream(endpoint, data=None):
+    """
+    Yield (event, payload) pairs from a streaming API endpoint.
+    
+    A failed request yields a single "error" event; for an HTTP error its
+    payload also carries the status code.
+    """
+    url = f"{API_URL}/{endpoint}"
+    
+    try:
+        with requests.post(url, json=data, stream=True) as response:
+            if response.status_code != 200:
+                yield "error", {
+                    "error": f"API Error: {response.status_code} - {response.text}",
+                    "status": response.status_code
+                }
+                return
+            
+            event = "message"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    # A blank line terminates the current event
+                    event = "message"
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    yield event, json.loads(line[len("data:"):].strip())
+    except Exception as e:
+        yield "error", {"error": f"Request Error: {str(e)}"}
+
+# Render a streamed answer incrementally and return the final answer (None on failure) and sources
+def render_stream(endpoint, data, prefix=""):
+    placeholder = st.empty()
+    answer = ""
+    sources = []
+    
+    for event, payload in api_stream(endpoint, data):
+        if event == "sources":
+            sources = payload.get("sources", [])
+        elif event == "token":
+            answer += payload.get("text", "")
+            placeholder.markdown(f"{prefix}{answer}▌")
+        elif event == "done":
+            answer = payload.get("answer", answer)
+        elif event == "error":
+            if payload.get("status") == 404 and data.get("session_id"):
+                # The server no longer has the chat session; the caller starts a new one
+                st.session_state.chat_session_id = None
+            else:
+                st.error(payload.get("error", "Unknown error"))
+            return None, sources
+    
+    placeholder.markdown(f"{prefix}{answer}")
+    return answer, sources
+
+# Build a chat request, starting a server-side chat session if there is none
+def chat_request(question):
+    if not st.session_state.chat_session_id:
+        session = api_request("qa/sessions", method="POST")
+        if session:
+            st.session_state.chat_session_id = session["session_id"]
+    
+    request_data = {"question": question}
+    if st.session_state.chat_session_id:
+        request_data["session_id"] = st.session_state.chat_session_id
+    else:
+        request_data["chat_history"] = st.session_state.chat_history[:-1]  # Exclude the current question
+    return request_data
+
 # Initialize session state
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = None
 if "documents" not in st.session_state:
     st.session_state.documents = []
 if "current_document" not in st.session_state:
@@ -63,10 +153,13 @@ st.sidebar.title("Indian Law Tutor")
 st.sidebar.image("https://cdn-icons-png.flaticon.com/512/1154/1154211.png", width=100)
 page = st.sidebar.radio("Navigation", ["Documents", "Quizzes", "Q&A", "Legal Concepts"])
 
+# Number of most recent documents and quizzes offered for selection
+LIST_PAGE_SIZE = 100
+
 # Load documents (if needed)
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_documents():
-    response = api_request("documents/list")
+    response = api_request(f"documents/list?limit={LIST_PAGE_SIZE}&fields=file_id")
     if response:
         return response.get("documents", [])
     return []
@@ -74,10 +167,12 @@ def load_documents():
 # Load quizzes (if needed)
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_quizzes(document_id=None):
+    # Only the fields shown in the quiz selector
+    query = f"limit={LIST_PAGE_SIZE}&fields=quiz_id,difficulty,num_questions"
     if document_id:
-        response = api_request(f"quizzes/list?document_id={document_id}")
+        response = api_request(f"quizzes/list?document_id={document_id}&{query}")
     else:
-        response = api_request("quizzes/list")
+        response = api_request(f"quizzes/list?{query}")
     
     if response:
         return response.get("quizzes", [])
@@ -221,7 +316,22 @@ elif page == "Quizzes":
                         "difficulty": difficulty
                     }
                     
-                    response = api_request("quizzes/generate", method="POST", data=quiz_data)
+                    # Show each question as soon as it has been generated
+                    progress = st.progress(0.0)
+                    preview = st.empty()
+                    generated = []
+                    response = None
+                    
+                    for event, payload in api_stream("quizzes/generate?stream=true", quiz_data):
+                        if event == "question":
+                            generated.append(payload["question"]["question"])
+                            progress.progress(min(len(generated) / num_questions, 1.0))
+                            preview.markdown("\n".join(f"{i + 1}. {text}" for i, text in enumerate(generated)))
+                        elif event == "done":
+                            progress.progress(1.0)
+                            response = payload
+                        elif event == "error":
+                            st.error(payload.get("error", "Unknown error"))
                     
                     if response and "quiz_id" in response:
                         st.success(f"Quiz generated successfully! Quiz ID: {response['quiz_id']}")
@@ -354,24 +464,30 @@ elif page == "Q&A":
             # Add question to chat history
             st.session_state.chat_history.append({"role": "user", "content": question})
             
-            with st.spinner("Generating answer..."):
-                # Prepare request data
-                request_data = {
-                    "question": question,
-                    "chat_history": st.session_state.chat_history[:-1]  # Exclude the current question
-                }
-                
-                # Send request
-                response = api_request("qa/chat", method="POST", data=request_data)
-                
-                if response:
-                    # Add response to chat history
-                    st.session_state.chat_history.append({"role": "assistant", "content": response["answer"]})
-                    st.rerun()
+            st.write(f"**You:** {question}")
+            
+            # The conversation is kept on the server, so only the new question is sent
+            request_data = chat_request(question)
+            
+            # Stream the answer into the page as it is generated
+            answer, _ = render_stream("qa/chat/stream", request_data, prefix="**AI:** ")
+            
+            if answer is None and "session_id" in request_data and not st.session_state.chat_session_id:
+                # The session expired on the server; ask again in a new one
+                st.warning("The chat session expired, so the conversation continues in a new session.")
+                answer, _ = render_stream("qa/chat/stream", chat_request(question), prefix="**AI:** ")
+            
+            if answer is not None:
+                # Add response to chat history
+                st.session_state.chat_history.append({"role": "assistant", "content": answer})
+                st.rerun()
         
         # Clear chat button
         if st.button("Clear Chat"):
+            if st.session_state.chat_session_id:
+                api_request(f"qa/sessions/{st.session_state.chat_session_id}", method="DELETE")
             st.session_state.chat_history = []
+            st.session_state.chat_session_id = None
             st.rerun()
     
     with qa_tab2:
@@ -395,20 +511,17 @@ elif page == "Q&A":
                 doc_question = st.text_input("Ask a question about this document:")
                 
                 if st.button("Ask") and doc_question:
-                    with st.spinner("Generating answer..."):
-                        question_data = {
-                            "question": doc_question,
-                            "document_id": selected_document
-                        }
-                        response = api_request("qa/ask", method="POST", data=question_data)
-                        if response:
-                            st.write("**Answer:**")
-                            st.write(response["answer"])
-                            
-                            if response.get("sources"):
-                                st.write("**Sources:**")
-                                for source in response["sources"]:
-                                    st.info(source["text"])
+                    question_data = {
+                        "question": doc_question,
+                        "document_id": selected_document
+                    }
+                    st.write("**Answer:**")
+                    answer, sources = render_stream("qa/ask/stream", question_data)
+                    
+                    if answer is not None and sources:
+                        st.write("**Sources:**")
+                        for source in sources:
+                            st.info(source["text"])
         else:
             st.info("No documents found. Upload a document to ask questions about it.")
 
@@ -452,6 +565,35 @@ elif page == "Legal Concepts":
                 if response:
                     st.subheader(response["concept"])
                     st.write(response["explanation"])
+    
+    # Glossary builder
+    st.subheader("Build a Glossary")
+    glossary_input = st.text_area("Enter legal concepts, one per line:")
+    
+    if st.button("Explain All"):
+        concepts = [line.strip() for line in glossary_input.splitlines() if line.strip()]
+        
+        if concepts:
+            progress = st.progress(0.0)
+            done_count = 0
+            
+            # Results arrive as each explanation completes, cached ones first
+            for event, payload in api_stream("explanations/batch", {"concepts": concepts}):
+                if event == "result":
+                    done_count += 1
+                    progress.progress(min(done_count / len(concepts), 1.0))
+                    with st.expander(payload["concept"]):
+                        if "error" in payload:
+                            st.error(payload["error"])
+                        else:
+                            st.write(payload["explanation"])
+                elif event == "done":
+                    progress.progress(1.0)
+                    st.success(f"Explained {payload['succeeded']} of {payload['total']} concepts ({payload['cached']} from cache)")
+                elif event == "error":
+                    st.error(payload.get("error", "Unknown error"))
+        else:
+            st.info("Enter at least one concept to build a glossary.")
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,81 @@
+"""
+Gunicorn configuration for running the API in production.
+
+The application is imported once in the master process (preload_app), so
+the embedding model and the document indices are loaded a single time and
+shared copy-on-write by every worker. Workers are recycled after a number
+of requests or when their private memory grows too large, and a HUP signal
+replaces all workers one by one without dropping in-flight requests.
+
+Usage:
+    gunicorn -c gunicorn_conf.py app.main:app
+
+Settings are read from environment variables (and the .env file).
+"""
+import os
+import multiprocessing
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set before the application is imported, so every service module sees them
+# Tokenizer thread pools created before the fork would deadlock in the workers
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+# Chat sessions must live in the database to be visible to every worker
+os.environ.setdefault("CHAT_SESSION_DB", os.path.join(os.getenv("OUTPUT_FOLDER", "data/outputs"), "chat_sessions.db"))
+os.environ.setdefault("CHAT_SESSION_SHARED", "true")
+
+# Server socket
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+backlog = int(os.getenv("GUNICORN_BACKLOG", "2048"))
+
+# Workers
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Load the application in the master, before forking, so workers share its memory
+preload_app = True
+
+# Recycle each worker after this many requests; the jitter keeps workers from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# A worker silent for longer than timeout is killed; stopping workers get graceful_timeout to finish requests
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# The pidfile lets run_production.py signal the master for reloads and restarts
+pidfile = os.getenv("GUNICORN_PIDFILE", "data/gunicorn.pid")
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Create required directories
+os.makedirs("data/uploads", exist_ok=True)
+os.makedirs("data/outputs", exist_ok=True)
+
+
+def when_ready(server):
+    """Load shared data in the master once the application is imported, before workers are forked."""
+    from app.services.worker_lifecycle import worker_lifecycle
+    
+    preloaded = worker_lifecycle.preload()
+    server.log.info(
+        f"Preloaded {preloaded['indices']} document indices; froze {preloaded['frozen_objects']} objects for sharing"
+    )
+
+
+def post_fork(server, worker):
+    """Give each new worker its own database connections, share of the LLM rate limits and memory watchdog."""
+    from app.services.worker_lifecycle import worker_lifecycle
+    
+    worker_lifecycle.after_fork(server.cfg.workers)
+
+
+def worker_exit(server, worker):
+    """Save the worker's in-memory state before it exits."""
+    from app.services.worker_lifecycle import worker_lifecycle
+    
+    worker_lifecycle.before_exit()
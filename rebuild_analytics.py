@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Recompute quiz and document analytics from the quiz results store.
+
+Reads every stored result once, in submission order, and replaces the
+aggregates in a single transaction. Run it with the API stopped, or results
+submitted while it runs may be left out of the new aggregates.
+
+Quizzes are read straight from their JSON files, so the rebuild does not
+load the LLM, document or index services.
+"""
+
+import os
+import sys
+import json
+import time
+from dotenv import load_dotenv
+
+from app.services.quiz_analytics import quiz_analytics
+from app.services.result_store import result_store
+
+# Load environment variables
+load_dotenv()
+
+OUTPUT_DIR = os.getenv("OUTPUT_FOLDER", "data/outputs")
+QUIZ_DIR = os.path.join(OUTPUT_DIR, "quizzes")
+
+def quiz_lookup():
+    """Return a lookup of (document_id, answer_key) by quiz ID, reading each quiz file once"""
+    quizzes = {}
+    
+    def lookup(quiz_id):
+        if quiz_id not in quizzes:
+            quiz_file = os.path.join(QUIZ_DIR, f"{quiz_id}.json")
+            if not os.path.exists(quiz_file):
+                quizzes[quiz_id] = None
+            else:
+                with open(quiz_file, "r", encoding="utf-8") as f:
+                    quiz = json.load(f)
+                quizzes[quiz_id] = (
+                    quiz.get("document_id"),
+                    tuple(question.get("correct_answer") for question in quiz.get("questions", []))
+                )
+        return quizzes[quiz_id]
+    
+    return lookup
+
+def main():
+    """Rebuild the analytics and report what was aggregated"""
+    print("Rebuilding quiz analytics from the results store...")
+    start = time.time()
+    
+    try:
+        counts = quiz_analytics.rebuild(result_store.iter_results(), quiz_lookup())
+    except Exception as e:
+        print(f"Error rebuilding quiz analytics: {str(e)}")
+        return 1
+    
+    print(f"Aggregated {counts['results']} results for {counts['quizzes']} quizzes "
+          f"and {counts['documents']} documents in {time.time() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -60,8 +60,12 @@ if __name__ == "__main__":
         print(f"{Colors.WARNING}Please edit the .env file with your API keys before continuing.{Colors.ENDC}")
         sys.exit(1)
     
-    # Run the backend
-    success = run_backend()
+    # Run the backend; --production starts the multi-worker server instead
+    if "--production" in sys.argv:
+        import run_production
+        success = run_production.start()
+    else:
+        success = run_backend()
     if not success:
         print(f"{Colors.FAIL}Failed to start the backend. Exiting...{Colors.ENDC}")
         sys.exit(1) 
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+import urllib.request
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PIDFILE = os.getenv("GUNICORN_PIDFILE", "data/gunicorn.pid")
+BIND = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# How long a new master may take to import the application and answer health checks
+HEALTH_TIMEOUT_SECONDS = float(os.getenv("GUNICORN_HEALTH_TIMEOUT", "180"))
+
+# Colors for console output
+class Colors:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+def health_url():
+    """The health check URL of the locally bound server."""
+    host, _, port = BIND.rpartition(":")
+    if host in ("", "0.0.0.0", "[::]"):
+        host = "127.0.0.1"
+    return f"http://{host}:{port}/health"
+
+def check_health():
+    """
+    Ask the server whether it is healthy.
+    
+    Returns:
+        The health response, or None if the server did not answer healthy
+    """
+    try:
+        with urllib.request.urlopen(health_url(), timeout=5) as response:
+            body = json.loads(response.read().decode("utf-8"))
+            return body if body.get("status") == "healthy" else None
+    except Exception:
+        return None
+
+def read_pid(path=PIDFILE):
+    """Read the master process ID from a pidfile, or None if it is not running."""
+    try:
+        with open(path, "r") as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+        return pid
+    except (OSError, ValueError):
+        return None
+
+def wait_until(condition, timeout):
+    """Poll a condition once a second until it returns a true value or the timeout passes."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(1)
+    return None
+
+def start():
+    """Run the API with preloaded, copy-on-write shared workers."""
+    if os.name == "nt":
+        print(f"{Colors.FAIL}The production server needs a Unix system (gunicorn does not run on Windows). Use run_api.py instead.{Colors.ENDC}")
+        return False
+    if read_pid():
+        print(f"{Colors.WARNING}The production server is already running (pid {read_pid()}){Colors.ENDC}")
+        return False
+    
+    try:
+        print(f"{Colors.HEADER}Starting production API server on {BIND}...{Colors.ENDC}")
+        print(f"{Colors.BLUE}Press Ctrl+C to stop the server{Colors.ENDC}")
+        subprocess.run(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "app.main:app"],
+        )
+        return True
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Shutting down production server...{Colors.ENDC}")
+        return True
+    except Exception as e:
+        print(f"{Colors.FAIL}Error starting production server: {str(e)}{Colors.ENDC}")
+        return False
+
+def reload():
+    """
+    Replace every worker without dropping requests.
+    
+    New workers are forked from the running master, so this applies
+    configuration changes and frees worker memory but keeps the loaded
+    code; use restart to deploy new code.
+    """
+    pid = read_pid()
+    if not pid:
+        print(f"{Colors.FAIL}The production server is not running{Colors.ENDC}")
+        return False
+    
+    print(f"{Colors.HEADER}Reloading workers of master {pid}...{Colors.ENDC}")
+    os.kill(pid, signal.SIGHUP)
+    if not wait_until(check_health, HEALTH_TIMEOUT_SECONDS):
+        print(f"{Colors.FAIL}The server did not report healthy after reloading{Colors.ENDC}")
+        return False
+    
+    print(f"{Colors.GREEN}Workers reloaded{Colors.ENDC}")
+    return True
+
+def restart():
+    """
+    Start a new master with the current code, then retire the old one once the new one is healthy.
+    
+    Both masters share the listening socket, so requests are served
+    throughout. If the new master does not answer health checks in time it
+    is stopped and the old one keeps serving.
+    """
+    old_pid = read_pid()
+    if not old_pid:
+        print(f"{Colors.FAIL}The production server is not running{Colors.ENDC}")
+        return False
+    
+    print(f"{Colors.HEADER}Starting a new master alongside {old_pid}...{Colors.ENDC}")
+    os.kill(old_pid, signal.SIGUSR2)
+    
+    def new_master():
+        pid = read_pid()
+        return pid if pid != old_pid else None
+    
+    # The new master writes the pidfile once it has started; the old one moves to PIDFILE.oldbin
+    new_pid = wait_until(new_master, HEALTH_TIMEOUT_SECONDS)
+    if not new_pid:
+        print(f"{Colors.FAIL}The new master did not start; the old one keeps serving{Colors.ENDC}")
+        return False
+    
+    # Answers come from old and new workers alike; wait for one from a worker of the new master
+    healthy = wait_until(
+        lambda: any((check_health() or {}).get("parent_pid") == new_pid for _ in range(10)),
+        HEALTH_TIMEOUT_SECONDS
+    )
+    if not healthy:
+        print(f"{Colors.FAIL}The new master {new_pid} did not report healthy; stopping it and keeping {old_pid}{Colors.ENDC}")
+        os.kill(new_pid, signal.SIGTERM)
+        return False
+    
+    # A graceful stop: the old workers finish their in-flight requests first
+    os.kill(old_pid, signal.SIGTERM)
+    print(f"{Colors.GREEN}Master {new_pid} is serving; {old_pid} is finishing its requests and stopping{Colors.ENDC}")
+    return True
+
+def stop():
+    """Stop the server gracefully, letting in-flight requests finish."""
+    pid = read_pid()
+    if not pid:
+        print(f"{Colors.WARNING}The production server is not running{Colors.ENDC}")
+        return True
+    
+    print(f"{Colors.HEADER}Stopping master {pid}...{Colors.ENDC}")
+    os.kill(pid, signal.SIGTERM)
+    return True
+
+def status():
+    """Report whether the server is running and healthy."""
+    pid = read_pid()
+    health = check_health()
+    if pid and health:
+        print(f"{Colors.GREEN}Running: master {pid}, healthy{Colors.ENDC}")
+    elif pid:
+        print(f"{Colors.WARNING}Running: master {pid}, not answering health checks{Colors.ENDC}")
+    else:
+        print(f"{Colors.WARNING}Not running{Colors.ENDC}")
+    return bool(pid and health)
+
+COMMANDS = {
+    "start": start,
+    "reload": reload,
+    "restart": restart,
+    "stop": stop,
+    "status": status
+}
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "start"
+    if command not in COMMANDS:
+        print(f"Usage: python run_production.py [{'|'.join(COMMANDS)}]")
+        sys.exit(2)
+    
+    print(f"{Colors.BOLD}===== Indian Law Tutor - Production API ====={Colors.ENDC}")
+    
+    if not COMMANDS[command]():
+        sys.exit(1)
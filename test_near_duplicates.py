@@ -0,0 +1,39 @@
+from app.services.near_duplicates import NearDuplicateIndex, question_signature
+
+def question(stem, answer):
+    """A multiple-choice question whose correct option is A."""
+    return {
+        "question": stem,
+        "options": [f"A. {answer}", "B. Right to property", "C. Right to vote", "D. None of these"],
+        "correct_answer": "A"
+    }
+
+def test_paraphrased_question_is_duplicate():
+    """A reworded stem with a reworded correct option is a near-duplicate"""
+    index = NearDuplicateIndex()
+    index.add("original", question_signature(question(
+        "Which article of the Constitution of India protects the right to life and personal liberty?",
+        "Right to life"
+    )))
+    
+    paraphrase = question_signature(question(
+        "Which article of the Indian Constitution protects the right to life and personal liberty?",
+        "The right to life and liberty"
+    ))
+    match = index.match(paraphrase)
+    assert match is not None and match[0] == "original", match
+    print(f"Paraphrase matched with estimated similarity {match[1]:.2f}")
+
+def test_templated_questions_are_distinct():
+    """Templated stems whose correct answers differ are kept apart"""
+    index = NearDuplicateIndex()
+    index.add("article-21", question_signature(question("Which right does Article 21 of the Constitution guarantee?", "Right to life")))
+    
+    templated = question_signature(question("Which right does Article 14 of the Constitution guarantee?", "Right to equality"))
+    assert index.match(templated) is None
+    print("Templated question kept")
+
+if __name__ == "__main__":
+    test_paraphrased_question_is_duplicate()
+    test_templated_questions_are_distinct()
+    print("\nTest completed successfully!")